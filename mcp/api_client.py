@@ -0,0 +1,284 @@
+# api_client.py
+"""
+Shared HTTP transport for the Social Toolkit API.
+
+Every tool in server.py sends its requests through one ApiClient, so
+connections to the API are pooled and kept alive across tool calls instead
+of paying a fresh TCP+TLS handshake on each call. The client is async, so a
+slow upload or generation request never blocks other tool calls served by
+the same event loop.
+
+Tuning is done through environment variables:
+- SOCIAL_TOOLKIT_API_URL: base URL of the API (default: production)
+- SOCIAL_TOOLKIT_MAX_CONNECTIONS: max open connections in the pool (default: 20)
+- SOCIAL_TOOLKIT_MAX_KEEPALIVE: max idle connections kept alive (default: 10)
+- SOCIAL_TOOLKIT_KEEPALIVE_EXPIRY: seconds an idle connection is kept (default: 60)
+- SOCIAL_TOOLKIT_HTTP2: "1" to negotiate HTTP/2 (needs the `h2` package)
+- SOCIAL_TOOLKIT_TIMEOUT: request timeout in seconds (default: 60)
+- SOCIAL_TOOLKIT_PREWARM: "0" to skip opening a connection when a session starts (default: on)
+- SOCIAL_TOOLKIT_COALESCE: "0" to send identical concurrent GETs separately (default: on)
+
+Identical GETs (same path, params and credentials) that overlap in time are
+coalesced: while one is in flight, later callers await its response instead
+of sending their own request, so parallel agents polling the same resource
+cost one upstream call and one unit of the tenant's rate limit. A write
+ends the sharing of GETs of the paths it invalidates (see cache.py), so a
+read sent after the write never gets the response of one sent before it.
+
+Transient failures are retried and repeated failures trip a circuit breaker,
+see resilience.py. With a scheduler, every attempt waits for admission by
+tenant and lane first, see scheduler.py.
+
+JSON bodies are encoded with the codec from codec.py and, with
+SOCIAL_TOOLKIT_REQUEST_COMPRESSION set, compressed once they are large
+enough. Responses are requested compressed; the bytes recorded as received
+in metrics are those that crossed the wire.
+"""
+import asyncio
+import importlib.util
+import logging
+import os
+import threading
+import time
+import uuid
+
+import httpx
+
+from codec import compress, dumps_bytes, request_compression
+from resilience import (IDEMPOTENT_METHODS, RETRY_STATUSES, CircuitBreaker, RetryPolicy,
+                        is_retryable_error)
+from scheduler import tenant_of
+
+DEFAULT_API_URL = "https://social-toolkit.ti.trilogy.com"
+
+logger = logging.getLogger("social_toolkit")
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.environ.get(name)
+    return float(value) if value else default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if not value:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+class ApiClient:
+    """
+    Pooled, keep-alive async HTTP client bound to the Social Toolkit API
+    The underlying httpx client is created on first use and reused afterwards
+    """
+
+    def __init__(self, base_url: str = None, max_connections: int = None,
+                 max_keepalive_connections: int = None, keepalive_expiry: float = None,
+                 http2: bool = None, timeout: float = None, metrics=None,
+                 retry_policy: RetryPolicy = None, breaker: CircuitBreaker = None, prewarm: bool = None,
+                 coalesce: bool = None, scheduler=None):
+        self.base_url = (base_url or os.environ.get("SOCIAL_TOOLKIT_API_URL") or DEFAULT_API_URL).rstrip("/")
+        self.max_connections = max_connections or _env_int("SOCIAL_TOOLKIT_MAX_CONNECTIONS", 20)
+        self.max_keepalive_connections = max_keepalive_connections or _env_int("SOCIAL_TOOLKIT_MAX_KEEPALIVE", 10)
+        self.keepalive_expiry = keepalive_expiry or _env_float("SOCIAL_TOOLKIT_KEEPALIVE_EXPIRY", 60.0)
+        self.timeout = timeout or _env_float("SOCIAL_TOOLKIT_TIMEOUT", 60.0)
+        self.http2 = _env_bool("SOCIAL_TOOLKIT_HTTP2", False) if http2 is None else http2
+        if self.http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("HTTP/2 requested but the h2 package is not installed, falling back to HTTP/1.1")
+            self.http2 = False
+        self.metrics = metrics
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        self.prewarm_enabled = _env_bool("SOCIAL_TOOLKIT_PREWARM", True) if prewarm is None else prewarm
+        self.coalesce = _env_bool("SOCIAL_TOOLKIT_COALESCE", True) if coalesce is None else coalesce
+        self.request_compression = request_compression()
+        self.compression_min_bytes = _env_int("SOCIAL_TOOLKIT_REQUEST_COMPRESSION_MIN_BYTES", 8192)
+        # FairScheduler admitting requests by tenant and lane, if any
+        self.scheduler = scheduler
+        # GETs currently in flight by request key, and how many callers shared one instead of sending their own
+        self._in_flight = {}
+        self.coalesced = 0
+        self._client = None
+        # prewarm() builds the client in a worker thread while the event loop may ask for it too
+        self._client_lock = threading.Lock()
+        self._prewarm_task = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = httpx.AsyncClient(
+                        base_url=self.base_url,
+                        limits=httpx.Limits(
+                            max_connections=self.max_connections,
+                            max_keepalive_connections=self.max_keepalive_connections,
+                            keepalive_expiry=self.keepalive_expiry,
+                        ),
+                        timeout=self.timeout,
+                        http2=self.http2,
+                    )
+        return self._client
+
+    def prewarm(self) -> None:
+        """
+        Start opening a pooled connection to the API in the background, so the DNS
+        lookup and TCP/TLS handshakes overlap with the MCP handshake instead of
+        delaying the first tool call. Only the first call does anything.
+        Must be called from the event loop
+        """
+        if self.prewarm_enabled and self._prewarm_task is None:
+            self._prewarm_task = asyncio.get_running_loop().create_task(self._prewarm())
+
+    async def _prewarm(self) -> None:
+        start = time.perf_counter()
+        try:
+            # Loading the CA bundle takes tens of milliseconds, keep it off the event loop
+            client = await asyncio.to_thread(lambda: self.client)
+            await client.head("/", timeout=10)
+            logger.debug("Connection to %s warmed up in %.0f ms", self.base_url, (time.perf_counter() - start) * 1000)
+        except Exception as e:
+            logger.debug("Connection warm-up to %s failed: %s", self.base_url, e)
+
+    async def request(self, method: str, path: str, api_key: str = None, headers: dict = None,
+                      retry: bool = None, priority: str = None, **kwargs) -> httpx.Response:
+        """
+        Send a request to the API over the shared connection pool
+        path is relative to base_url; api_key, when given, is sent as bearer token
+        retry: None retries idempotent methods only, True also retries a POST (sending an
+        Idempotency-Key header, reused across attempts), False never retries
+        Raises CircuitOpenError without sending anything while the API host is failing
+        Latency, status and bytes of every attempt are recorded in metrics, if set
+        A GET identical to one already in flight shares its response (the same Response object)
+        priority: scheduler lane, "interactive" or "bulk"; by default reads are interactive and
+        writes bulk
+        json= bodies are encoded here once, so retries resend the same (possibly compressed) bytes
+        """
+        headers = dict(headers or {})
+        if "json" in kwargs:
+            kwargs["content"] = self._encode_json(kwargs.pop("json"), headers)
+        if api_key:
+            headers["Authorization"] = f"Bearer {api_key}"
+        if retry is None:
+            retry = method in IDEMPOTENT_METHODS
+        if retry and method not in IDEMPOTENT_METHODS:
+            headers.setdefault("Idempotency-Key", str(uuid.uuid4()))
+        max_retries = self.retry_policy.max_retries if retry else 0
+        lane = priority or ("interactive" if method in ("GET", "HEAD") else "bulk")
+        if method != "GET" or not self.coalesce or set(kwargs) - {"params"}:
+            return await self._request(method, path, headers, max_retries, kwargs, lane)
+
+        params = tuple(sorted((name, str(value)) for name, value in (kwargs.get("params") or {}).items()))
+        key = (path, params, tuple(sorted(headers.items())), max_retries)
+        flight = self._in_flight.get(key)
+        if flight is not None:
+            self.coalesced += 1
+            if self.metrics is not None:
+                self.metrics.record_coalesced(method, path)
+        else:
+            flight = asyncio.ensure_future(self._request(method, path, headers, max_retries, kwargs, lane))
+            self._in_flight[key] = flight
+            flight.add_done_callback(lambda done: self._flight_done(key, done))
+        # A caller that is cancelled must not cancel the request the others are waiting on
+        return await asyncio.shield(flight)
+
+    def _encode_json(self, value, headers: dict) -> bytes:
+        body = dumps_bytes(value)
+        headers.setdefault("Content-Type", "application/json")
+        if self.request_compression and len(body) >= self.compression_min_bytes:
+            body = compress(body, self.request_compression)
+            headers["Content-Encoding"] = self.request_compression
+        return body
+
+    def forget(self, path: str, subtree: bool = False) -> None:
+        """
+        Stop sharing in-flight GETs of path (and below it with subtree=True), after a write to it
+        Their current callers still get their responses; later GETs send a request of their own
+        """
+        stale = [key for key in self._in_flight
+                 if key[0] == path or (subtree and key[0].startswith(path + "/"))]
+        for key in stale:
+            del self._in_flight[key]
+
+    def _flight_done(self, key: tuple, flight: asyncio.Future) -> None:
+        if self._in_flight.get(key) is flight:
+            del self._in_flight[key]
+        if not flight.cancelled():
+            # Marks the error as retrieved even if every caller was cancelled meanwhile
+            flight.exception()
+
+    async def _request(self, method: str, path: str, headers: dict, max_retries: int, kwargs: dict,
+                       lane: str = "interactive") -> httpx.Response:
+        if self._prewarm_task is not None and not self._prewarm_task.done():
+            # The connection being opened is closer to ready than a new one would be
+            await asyncio.shield(self._prewarm_task)
+        host = self.client.base_url.host
+
+        attempt = 0
+        while True:
+            self.breaker.before_request(host)
+            try:
+                if self.scheduler is not None:
+                    async with self.scheduler.admit(tenant_of(path), lane):
+                        response = await self._send(method, path, headers, kwargs)
+                else:
+                    response = await self._send(method, path, headers, kwargs)
+            except Exception as e:
+                # Only transport errors and timeouts say the host is failing; others are local
+                if not is_retryable_error(e):
+                    self.breaker.abandon(host)
+                    raise
+                self.breaker.record(host, failed=True)
+                if attempt >= max_retries:
+                    raise
+                response = None
+            else:
+                self.breaker.record(host, failed=response.status_code >= 500)
+                if attempt >= max_retries or response.status_code not in RETRY_STATUSES:
+                    return response
+            attempt += 1
+            if self.metrics is not None:
+                self.metrics.record_retry(method, path)
+            delay = self.retry_policy.delay(attempt, response)
+            logger.warning("Retrying %s %s in %.2fs (attempt %d of %d): %s", method, path, delay, attempt,
+                           max_retries, response.status_code if response is not None else "connection error")
+            await asyncio.sleep(delay)
+
+    async def _send(self, method: str, path: str, headers: dict, kwargs: dict) -> httpx.Response:
+        if self.metrics is None:
+            return await self.client.request(method, path, headers=headers, **kwargs)
+
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, path, headers=headers, **kwargs)
+        except Exception:
+            self.metrics.record_upstream(method, path, time.perf_counter() - start)
+            raise
+        self.metrics.record_upstream(
+            method, path, time.perf_counter() - start, response.status_code,
+            bytes_sent=int(response.request.headers.get("Content-Length") or 0),
+            bytes_received=response.num_bytes_downloaded,
+        )
+        return response
+
+    async def get(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", path, **kwargs)
+
+    async def put(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("PUT", path, **kwargs)
+
+    async def delete(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("DELETE", path, **kwargs)
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
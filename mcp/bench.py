@@ -0,0 +1,1083 @@
+# bench.py
+"""
+Local benchmarks for the MCP server, run against stub_api.py
+
+Usage:
+    python bench.py transport [--calls 200] [--latency 0.005] [--connect-latency 0.05]
+    python bench.py concurrency [--calls 20] [--latency 0.2]
+    python bench.py upload [--size-mb 2048] [--max-rss-mb 256]
+    python bench.py faults [--calls 200] [--fail-rate 0.3]
+    python bench.py payload [--sources 1000] [--calls 10]
+    python bench.py remote [--clients 50] [--calls 20] [--latency 0.02]
+    python bench.py startup [--runs 10] [--connect-latency 0.15] [--think 0.5]
+    python bench.py load [--calls 100] [--concurrency 10] [--api-url URL]
+    python bench.py coalesce [--callers 20] [--rounds 10] [--latency 0.1]
+    python bench.py chat [--conversations 10] [--messages 10] [--connect-latency 0.1]
+    python bench.py fairness [--burst 2000] [--calls 20] [--latency 0.05]
+    python bench.py codec [--items 2000] [--repeat 5] [--bandwidth-mbps 100]
+    python bench.py context [--calls 30]
+    python bench.py memory [--turns 100] [--budget 24000]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import requests
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.sse import sse_client
+from mcp.client.stdio import stdio_client
+
+import codec
+from api_client import ApiClient
+from metrics import Metrics
+from resilience import CircuitBreaker, CircuitOpenError, RetryPolicy
+from scheduler import FairScheduler
+from stub_api import start_stub
+
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "server.py")
+STUB_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stub_api.py")
+
+
+def _report(label: str, samples: list) -> None:
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{label:<28} mean {statistics.mean(samples) * 1000:8.2f} ms   "
+          f"p50 {statistics.median(samples) * 1000:8.2f} ms   p95 {p95 * 1000:8.2f} ms")
+
+
+def _percentile(samples: list, q: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _server_session(api_url: str, stack, env: dict = None) -> ClientSession:
+    """Start server.py over stdio, pointed at api_url, and return an initialized session"""
+    server_params = StdioServerParameters(
+        command=sys.executable,
+        args=[SERVER_SCRIPT],
+        env={**os.environ, "SOCIAL_TOOLKIT_API_URL": api_url, **(env or {})},
+    )
+    read, write = await stack.enter_async_context(stdio_client(server_params))
+    session = await stack.enter_async_context(ClientSession(read, write))
+    await session.initialize()
+    return session
+
+
+def bench_transport(args) -> None:
+    """
+    Per-call latency of a fresh connection per call (the old requests.get
+    pattern) versus the shared ApiClient pool
+    """
+    stub = start_stub(latency=args.latency, connect_latency=args.connect_latency)
+    path = "/tenant/t-bench/brand"
+    print(f"{args.calls} GET {path} against {stub.url} "
+          f"(latency {args.latency * 1000:.0f} ms, connect {args.connect_latency * 1000:.0f} ms)")
+
+    samples = []
+    for _ in range(args.calls):
+        start = time.perf_counter()
+        requests.get(f"{stub.url}{path}", headers={"Authorization": "Bearer sk-bench"}).raise_for_status()
+        samples.append(time.perf_counter() - start)
+    _report("new connection per call", samples)
+
+    async def pooled():
+        api = ApiClient(base_url=stub.url)
+        samples = []
+        for _ in range(args.calls):
+            start = time.perf_counter()
+            (await api.get(path, api_key="sk-bench")).raise_for_status()
+            samples.append(time.perf_counter() - start)
+        await api.close()
+        return samples
+
+    _report("pooled ApiClient", asyncio.run(pooled()))
+    stub.shutdown()
+
+
+def bench_concurrency(args) -> None:
+    """
+    Wall time of N get_generation tool calls issued one after another versus
+    all at once over a single MCP session
+    """
+    from contextlib import AsyncExitStack
+
+    stub = start_stub(latency=args.latency)
+    arguments = {"tenant_id": "t-bench", "api_key": "sk-bench", "brand_id": "b-bench",
+                 "worker_id": "w-bench", "generation_id": "g-bench"}
+
+    async def run():
+        async with AsyncExitStack() as stack:
+            session = await _server_session(stub.url, stack)
+            _tool_data(await session.call_tool("get_generation", arguments))
+
+            start = time.perf_counter()
+            results = [await session.call_tool("get_generation", arguments) for _ in range(args.calls)]
+            serial = time.perf_counter() - start
+            serial_errors = sum(_tool_error(result) is not None for result in results)
+
+            start = time.perf_counter()
+            results = await asyncio.gather(*[session.call_tool("get_generation", arguments) for _ in range(args.calls)])
+            parallel = time.perf_counter() - start
+            parallel_errors = sum(_tool_error(result) is not None for result in results)
+        return serial, serial_errors, parallel, parallel_errors
+
+    serial, serial_errors, parallel, parallel_errors = asyncio.run(run())
+    print(f"{args.calls} get_generation calls, upstream latency {args.latency * 1000:.0f} ms")
+    print(f"{'serial':<28} wall {serial * 1000:8.1f} ms   {serial_errors} errors")
+    print(f"{'parallel':<28} wall {parallel * 1000:8.1f} ms   {parallel_errors} errors")
+    stub.shutdown()
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def bench_upload(args) -> None:
+    """
+    Upload a large sparse file through create_source and check the process
+    peak RSS stays under a fixed bound whatever the file size
+    """
+    stub = start_stub()
+    os.environ["SOCIAL_TOOLKIT_API_URL"] = stub.url
+    import server
+
+    with tempfile.TemporaryDirectory() as tmp:
+        file_path = os.path.join(tmp, "bench.mp4")
+        with open(file_path, "wb") as f:
+            f.truncate(args.size_mb * 1024 * 1024)
+
+        baseline = _peak_rss_mb()
+        start = time.perf_counter()
+        result = asyncio.run(server.create_source(
+            "t-bench", "sk-bench", "b-bench", name="bench upload", source_type="SAMPLE",
+            file_path=file_path))
+        elapsed = time.perf_counter() - start
+        peak = _peak_rss_mb()
+
+    stub.shutdown()
+    received_mb = result.get("received_bytes", 0) / 1024 / 1024
+    print(f"uploaded {received_mb:.0f} MiB in {elapsed:.1f} s ({received_mb / elapsed:.0f} MiB/s)")
+    print(f"peak RSS {peak:.0f} MiB (baseline {baseline:.0f} MiB, bound {args.max_rss_mb} MiB)")
+    if peak > args.max_rss_mb or received_mb < args.size_mb:
+        sys.exit(1)
+
+
+def bench_faults(args) -> None:
+    """
+    Success rate of calls against a stub throttling a share of requests, with and
+    without retries, then behaviour during a full outage with the circuit breaker
+    """
+    # Every retry is logged as a warning; keep the report readable
+    logging.getLogger("social_toolkit").setLevel(logging.ERROR)
+    stub = start_stub(fail_rate=args.fail_rate, fail_status=429, retry_after=0.05)
+    path = "/tenant/t-bench/brand/b-bench"
+
+    async def run(api, method, **kwargs):
+        ok = 0
+        samples = []
+        for _ in range(args.calls):
+            start = time.perf_counter()
+            try:
+                response = await api.request(method, path, api_key="sk-bench", **kwargs)
+                ok += response.status_code < 400
+            except CircuitOpenError:
+                pass
+            samples.append(time.perf_counter() - start)
+        await api.close()
+        return ok, samples
+
+    print(f"{args.calls} calls, {args.fail_rate:.0%} answered 429 with Retry-After: 0.05")
+    for label, api, method, kwargs in [
+        ("GET without retries", ApiClient(base_url=stub.url, retry_policy=RetryPolicy(max_retries=0)), "GET", {}),
+        ("GET with retries", ApiClient(base_url=stub.url), "GET", {}),
+        ("POST with opt-in retries", ApiClient(base_url=stub.url), "POST", {"retry": True}),
+    ]:
+        ok, samples = asyncio.run(run(api, method, **kwargs))
+        _report(f"{label} ({ok / args.calls:.0%} ok)", samples)
+    duplicates = sum(1 for count in stub.idempotency_keys.values() if count > 1)
+    print(f"{len(stub.idempotency_keys)} distinct Idempotency-Keys, {duplicates} of them retried")
+    stub.shutdown()
+
+    stub = start_stub(fail_rate=1.0, fail_status=503)
+    api = ApiClient(base_url=stub.url, retry_policy=RetryPolicy(base_delay=0.01),
+                    breaker=CircuitBreaker(threshold=5, reset_timeout=30))
+    ok, samples = asyncio.run(run(api, "GET"))
+    print(f"outage: {args.calls} calls sent {stub.requests} requests upstream before the circuit opened")
+    _report("GET while upstream is down", samples)
+    stub.shutdown()
+
+
+def _fake_sources(count: int) -> list:
+    """Sources shaped like the API's, with an analysis blob of realistic size"""
+    statuses = ["COMPLETED"] * 8 + ["PROCESSING", "FAILED"]
+    return [{
+        "source_id": f"src-{index:06d}",
+        "name": f"Sample post {index}",
+        "description": "Post from the brand's social channels, imported for voice analysis",
+        "source_type": "SAMPLE",
+        "content_type": "TEXT",
+        "status": statuses[index % len(statuses)],
+        "created_at": "2025-02-14T15:49:44.120298+00:00",
+        "updated_at": "2025-02-14T15:52:10.004112+00:00",
+        "location": f"s3://bucket-name/sources/tenant=t-bench/brand=b-bench/{index:06d}_post.txt",
+        "analysis": "The post uses a warm, direct voice with short sentences and a clear call to action. " * 8,
+    } for index in range(count)]
+
+
+def bench_payload(args) -> None:
+    """
+    Size (approximate tokens) and end-to-end latency of list_sources on a brand with
+    many sources, returned raw versus with projection, summary and spilling
+    """
+    from contextlib import AsyncExitStack
+
+    path = "/tenant/t-bench/brand/b-bench/source"
+    stub = start_stub(routes={("GET", path): _fake_sources(args.sources)})
+    arguments = {"tenant_id": "t-bench", "api_key": "sk-bench", "brand_id": "b-bench"}
+    variants = [
+        ("raw", {"SOCIAL_TOOLKIT_MAX_RESULT_BYTES": "0"}, {}),
+        ("spilled (default)", {}, {}),
+        ("fields", {}, {"fields": ["source_id", "name", "status"]}),
+        ("summary", {}, {"summary": True}),
+        ("summary, max_items=20", {}, {"summary": True, "max_items": 20}),
+    ]
+
+    async def run(env, extra):
+        async with AsyncExitStack() as stack:
+            session = await _server_session(stub.url, stack, env)
+            result = await session.call_tool("list_sources", {**arguments, **extra})
+            _tool_data(result)
+            samples, errors = [], 0
+            for _ in range(args.calls):
+                start = time.perf_counter()
+                call = await session.call_tool("list_sources", {**arguments, **extra})
+                if _tool_error(call) is not None:
+                    errors += 1
+                    continue
+                samples.append(time.perf_counter() - start)
+        text = "".join(item.text for item in result.content)
+        return len(text), '"result_handle"' in text, samples, errors
+
+    print(f"list_sources on a brand with {args.sources} sources, tokens estimated at 4 characters each")
+    for label, env, extra in variants:
+        size, spilled, samples, errors = asyncio.run(run(env, extra))
+        p50 = f"{statistics.median(samples) * 1000:7.1f}" if samples else f"{'-':>7}"
+        print(f"{label:<24} {size:>9} chars  ~{size // 4:>7} tokens  "
+              f"p50 {p50} ms  {errors} errors{'  (spilled to a file)' if spilled else ''}")
+    stub.shutdown()
+
+
+def bench_remote(args) -> None:
+    """
+    Session setup time and tool call throughput of many clients sharing one
+    server process over SSE, versus starting a stdio server per session
+    """
+    from contextlib import AsyncExitStack
+
+    # The stub gets its own process so it doesn't compete with the clients for the GIL
+    stub_port = _free_port()
+    stub = subprocess.Popen([sys.executable, STUB_SCRIPT, "--port", str(stub_port), "--latency", str(args.latency)],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    stub_url = f"http://127.0.0.1:{stub_port}"
+    port = _free_port()
+    env = {**os.environ, "SOCIAL_TOOLKIT_API_URL": stub_url, "FASTMCP_LOG_LEVEL": "WARNING"}
+    server = subprocess.Popen([sys.executable, SERVER_SCRIPT, "--transport", "sse", "--port", str(port)],
+                              env=env, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while True:
+        try:
+            requests.get(f"{url}/healthz", timeout=1).raise_for_status()
+            break
+        except requests.RequestException:
+            if time.monotonic() > deadline:
+                server.kill()
+                sys.exit("server did not start")
+            time.sleep(0.1)
+
+    # api_key is left empty: the server takes it from the Authorization header
+    arguments = {"tenant_id": "t-bench", "api_key": "", "brand_id": "b-bench",
+                 "worker_id": "w-bench", "generation_id": "g-bench"}
+
+    async def client(setups, calls, errors):
+        start = time.perf_counter()
+        async with sse_client(f"{url}/sse", headers={"Authorization": "Bearer sk-bench"}) as streams:
+            async with ClientSession(*streams) as session:
+                await session.initialize()
+                setups.append(time.perf_counter() - start)
+                for _ in range(args.calls):
+                    call_start = time.perf_counter()
+                    result = await session.call_tool("get_generation", arguments)
+                    error = _tool_error(result)
+                    if error is not None:
+                        errors.append(error)
+                        continue
+                    calls.append(time.perf_counter() - call_start)
+
+    async def remote():
+        setups, calls, errors = [], [], []
+        start = time.perf_counter()
+        await asyncio.gather(*[client(setups, calls, errors) for _ in range(args.clients)])
+        wall = time.perf_counter() - start
+        # Setups one at a time, comparable with the stdio ones, then the server's own view of the calls
+        serial = []
+        for _ in range(args.stdio_sessions):
+            start = time.perf_counter()
+            async with sse_client(f"{url}/sse") as streams:
+                async with ClientSession(*streams) as session:
+                    await session.initialize()
+                    serial.append(time.perf_counter() - start)
+                    result = await session.call_tool("server_metrics", {})
+        server_side = json.loads(result.content[0].text)["tools"]["get_generation"]["latency"]
+        return setups, serial, calls, errors, server_side, wall
+
+    async def stdio_setups():
+        samples = []
+        for _ in range(args.stdio_sessions):
+            async with AsyncExitStack() as stack:
+                start = time.perf_counter()
+                await _server_session(stub_url, stack)
+                samples.append(time.perf_counter() - start)
+        return samples
+
+    try:
+        setups, serial, calls, errors, server_side, wall = asyncio.run(remote())
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+    stdio = asyncio.run(stdio_setups())
+    stub.terminate()
+
+    print(f"{args.clients} concurrent SSE clients x {args.calls} get_generation calls, "
+          f"upstream latency {args.latency * 1000:.0f} ms")
+    print(f"{'session setup (sse)':<28} p50 {statistics.median(setups) * 1000:8.1f} ms   "
+          f"p99 {_percentile(setups, 0.99) * 1000:8.1f} ms   ({args.clients} at once)")
+    print(f"{'session setup (sse)':<28} p50 {statistics.median(serial) * 1000:8.1f} ms   "
+          f"p99 {_percentile(serial, 0.99) * 1000:8.1f} ms   ({len(serial)} sessions, one at a time)")
+    print(f"{'session setup (stdio)':<28} p50 {statistics.median(stdio) * 1000:8.1f} ms   "
+          f"p99 {_percentile(stdio, 0.99) * 1000:8.1f} ms   ({len(stdio)} sessions, one process each)")
+    if calls:
+        print(f"{'tool call (sse)':<28} p50 {statistics.median(calls) * 1000:8.1f} ms   "
+              f"p99 {_percentile(calls, 0.99) * 1000:8.1f} ms   ({len(errors)} errors left out)")
+    if errors:
+        print(f"{len(errors)} calls failed, e.g. {errors[0]}")
+    print(f"{'tool call (server side)':<28} p50 {server_side['p50_ms']:8.1f} ms   p99 {server_side['p99_ms']:8.1f} ms")
+    print(f"throughput {len(calls) / wall:.0f} successful calls/s over {wall:.1f} s")
+
+
+def bench_startup(args) -> None:
+    """
+    Cold start of a stdio server: time from exec to the initialize response
+    and to the first tool result, with and without pre-warming the upstream connection
+    """
+    stub = start_stub(latency=args.latency, connect_latency=args.connect_latency)
+    arguments = {"tenant_id": "t-bench", "api_key": "sk-bench", "brand_id": "b-bench",
+                 "worker_id": "w-bench", "generation_id": "g-bench"}
+
+    async def cold_start(prewarm: bool) -> tuple:
+        server_params = StdioServerParameters(
+            command=sys.executable,
+            args=[SERVER_SCRIPT],
+            env={**os.environ, "SOCIAL_TOOLKIT_API_URL": stub.url, "SOCIAL_TOOLKIT_PREWARM": "1" if prewarm else "0",
+                 "FASTMCP_LOG_LEVEL": "WARNING"},
+        )
+        start = time.perf_counter()
+        async with stdio_client(server_params) as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                initialized = time.perf_counter() - start
+                # Stands in for the model turn between the handshake and its first tool call
+                await asyncio.sleep(args.think)
+                call_start = time.perf_counter()
+                _tool_data(await session.call_tool("get_generation", arguments))
+                return initialized, time.perf_counter() - call_start, time.perf_counter() - start
+
+    print(f"{args.runs} cold starts each, upstream connect latency {args.connect_latency * 1000:.0f} ms, "
+          f"{args.think * 1000:.0f} ms between initialize and the first call")
+    for prewarm in (False, True):
+        runs = [asyncio.run(cold_start(prewarm)) for _ in range(args.runs)]
+        label = "prewarm" if prewarm else "no prewarm"
+        print(f"{label:<12} exec -> initialize p50 {statistics.median(r[0] for r in runs) * 1000:7.1f} ms   "
+              f"first call p50 {statistics.median(r[1] for r in runs) * 1000:7.1f} ms   "
+              f"exec -> first result p50 {statistics.median(r[2] for r in runs) * 1000:7.1f} ms")
+    stub.shutdown()
+
+
+def bench_coalesce(args) -> None:
+    """
+    Upstream requests and latency of many callers reading the same generation
+    at the same moment, with and without single-flight coalescing
+    """
+    stub = start_stub(latency=args.latency)
+    path = "/tenant/t-bench/brand/b-bench/worker/w-bench/generation/g-bench"
+
+    async def burst(api: ApiClient) -> list:
+        samples = []
+
+        async def caller():
+            start = time.perf_counter()
+            (await api.get(path, api_key="sk-bench")).raise_for_status()
+            samples.append(time.perf_counter() - start)
+
+        for _ in range(args.rounds):
+            await asyncio.gather(*[caller() for _ in range(args.callers)])
+        await api.close()
+        return samples
+
+    print(f"{args.rounds} rounds of {args.callers} concurrent GET {path}, upstream latency {args.latency * 1000:.0f} ms")
+    for coalesce in (False, True):
+        before = stub.requests
+        samples = asyncio.run(burst(ApiClient(base_url=stub.url, coalesce=coalesce)))
+        _report(f"{'coalesced' if coalesce else 'separate'} ({stub.requests - before} upstream)", samples)
+    stub.shutdown()
+
+
+def _tool_error(result) -> str:
+    """Error reported by the tool or the API in a tool result, or None if the call succeeded"""
+    text = result.content[0].text if result.content else ""
+    if result.isError:
+        return text or "Tool error"
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return None
+    if isinstance(data, dict) and data.get("status") == "error":
+        return data.get("error") or data.get("message") or "Tool error"
+    return None
+
+
+def _tool_data(result):
+    """Decoded JSON of a tool result; raises if the tool or the API reported an error"""
+    error = _tool_error(result)
+    if error is not None:
+        raise RuntimeError(error)
+    return json.loads(result.content[0].text)
+
+
+def bench_load(args) -> None:
+    """
+    Throughput, p50/p99 latency and server memory per tool, driving server.py
+    through an MCP ClientSession against the stateful API stub
+    Each tool runs --calls times with --concurrency calls in flight, one tool after another
+    """
+    from contextlib import AsyncExitStack
+
+    stub = None
+    api_url = args.api_url
+    if not api_url:
+        stub_port = _free_port()
+        stub = subprocess.Popen(
+            [sys.executable, STUB_SCRIPT, "--stateful", "--port", str(stub_port), "--latency", str(args.latency),
+             "--queue-time", str(args.queue_time), "--process-time", str(args.process_time),
+             "--fail-rate", str(args.fail_rate), "--job-fail-rate", str(args.job_fail_rate)],
+            stdout=subprocess.PIPE, text=True,
+        )
+        # The stub prints its address once it is listening
+        stub.stdout.readline()
+        api_url = f"http://127.0.0.1:{stub_port}"
+
+    async def load():
+        async with AsyncExitStack() as stack:
+            session = await _server_session(api_url, stack, {"FASTMCP_LOG_LEVEL": "WARNING"})
+
+            async def call(name: str, arguments: dict):
+                return _tool_data(await session.call_tool(name, arguments))
+
+            tenant = await call("create_tenant", {"name": "Load test"})
+            auth = {"tenant_id": tenant["tenant_id"], "api_key": tenant["api_key"]}
+            brand = await call("create_brand", {**auth, "name": "Load test brand"})
+            scope = {**auth, "brand_id": brand["brand_id"]}
+            prompt = await call("create_prompt", {**auth, "name": "Voice", "content_type": "TEXT",
+                                                  "prompt_text": "Describe the brand voice"})
+            worker = await call("create_worker", {**auth, "output_type": "TEXT", "name": "Posts",
+                                                  "prompt": "Write a social media post"})
+            worker_scope = {**scope, "worker_id": worker["worker_id"]}
+            await call("trigger_brand_compass", scope)
+            sources, generations = [], []
+
+            # (tool, arguments of call i, list collecting the IDs it creates, ID field)
+            phases = [
+                ("create_source", lambda i: {**scope, "name": f"Source {i}", "source_type": "KNOWLEDGE",
+                                             "text": f"Brand fact number {i}"}, sources, "source_id"),
+                ("create_generation", lambda i: {**worker_scope, "context": f"Post {i}"}, generations,
+                 "generation_id"),
+                ("get_tenant", lambda i: auth, None, None),
+                ("get_brand", lambda i: scope, None, None),
+                ("list_brands", lambda i: auth, None, None),
+                ("get_prompt", lambda i: {**auth, "prompt_id": prompt["prompt_id"]}, None, None),
+                ("list_prompts", lambda i: auth, None, None),
+                ("get_worker", lambda i: {**auth, "worker_id": worker["worker_id"]}, None, None),
+                ("list_workers", lambda i: auth, None, None),
+                ("get_source", lambda i: {**scope, "source_id": sources[i % len(sources)]}, None, None),
+                ("list_sources", lambda i: {**scope, "summary": True}, None, None),
+                ("list_sources_page", lambda i: {**scope, "page_size": 20}, None, None),
+                ("get_generation", lambda i: {**worker_scope, "generation_id": generations[i % len(generations)]},
+                 None, None),
+                ("list_generations", lambda i: {**worker_scope, "summary": True}, None, None),
+                ("list_generations_page", lambda i: {**worker_scope, "page_size": 20}, None, None),
+                ("wait_for_generation",
+                 lambda i: {**worker_scope, "generation_id": generations[i % len(generations)], "timeout": 60},
+                 None, None),
+                ("get_brand_compass", lambda i: {**scope, "summary": True}, None, None),
+            ]
+
+            results = []
+            for name, arguments, created, id_field in phases:
+                latencies, errors = [], 0
+                pending = iter(range(args.calls))
+
+                async def run_calls():
+                    nonlocal errors
+                    for i in pending:
+                        start = time.perf_counter()
+                        try:
+                            data = await call(name, arguments(i))
+                        except Exception:
+                            errors += 1
+                            continue
+                        latencies.append(time.perf_counter() - start)
+                        if created is not None:
+                            created.append(data[id_field])
+
+                start = time.perf_counter()
+                await asyncio.gather(*[run_calls() for _ in range(args.concurrency)])
+                wall = time.perf_counter() - start
+                memory = (await call("server_metrics", {}))["process"]
+                results.append((name, latencies, errors, wall, memory))
+            return results
+
+    try:
+        results = asyncio.run(load())
+    finally:
+        if stub is not None:
+            stub.terminate()
+
+    print(f"{args.calls} calls per tool, {args.concurrency} in flight, against {args.api_url or 'the stateful stub'} "
+          f"(latency {args.latency * 1000:.0f} ms, fail rate {args.fail_rate:.0%})")
+    print(f"{'tool':<24} {'calls':>6} {'errors':>6} {'calls/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'rss MB':>7}")
+    for name, latencies, errors, wall, memory in results:
+        p50 = f"{statistics.median(latencies) * 1000:8.1f}" if latencies else f"{'-':>8}"
+        p99 = f"{_percentile(latencies, 0.99) * 1000:8.1f}" if latencies else f"{'-':>8}"
+        rss = f"{memory['rss_mb']:7.1f}" if memory["rss_mb"] is not None else f"{'-':>7}"
+        print(f"{name:<24} {len(latencies):>6} {errors:>6} {len(latencies) / wall:8.0f} {p50} {p99} {rss}")
+    print(f"server peak RSS {results[-1][4]['peak_rss_mb']} MB")
+
+
+def bench_chat(args) -> None:
+    """
+    Time to first chunk and messages per second of send_message, with the WebSocket of each
+    conversation kept open and with a new connection per message, against the chat stub
+    """
+    from contextlib import AsyncExitStack
+
+    stub_port, chat_port = _free_port(), _free_port()
+    stub = subprocess.Popen(
+        [sys.executable, STUB_SCRIPT, "--stateful", "--port", str(stub_port), "--chat-port", str(chat_port),
+         "--chat-first-chunk-delay", str(args.first_chunk_delay), "--chat-chunks", str(args.chunks),
+         "--chat-connect-latency", str(args.connect_latency)],
+        stdout=subprocess.PIPE, text=True,
+    )
+    # Both stubs print their address once they are listening
+    stub.stdout.readline()
+    stub.stdout.readline()
+    api_url = f"http://127.0.0.1:{stub_port}"
+
+    async def chat(pooled: bool):
+        env = {"FASTMCP_LOG_LEVEL": "WARNING", "SOCIAL_TOOLKIT_WS_URL": f"ws://127.0.0.1:{chat_port}/api/"}
+        if not pooled:
+            # Every connection has expired by the next message, so each one opens a new connection
+            env["SOCIAL_TOOLKIT_WS_IDLE_EXPIRY"] = "0"
+        async with AsyncExitStack() as stack:
+            session = await _server_session(api_url, stack, env)
+
+            async def call(name: str, arguments: dict):
+                return _tool_data(await session.call_tool(name, arguments))
+
+            tenant = await call("create_tenant", {"name": "Chat bench"})
+            auth = {"tenant_id": tenant["tenant_id"], "api_key": tenant["api_key"]}
+            brand = await call("create_brand", {**auth, "name": "Chat bench brand"})
+            scope = {**auth, "brand_id": brand["brand_id"]}
+            conversations = [await call("create_conversation", {**scope, "name": f"Chat {i}"})
+                             for i in range(args.conversations)]
+            first_chunks, latencies = [], []
+
+            async def converse(conversation):
+                for i in range(args.messages):
+                    start = time.perf_counter()
+                    reply = await call("send_message", {**scope, "conversation_id": conversation["conversation_id"],
+                                                        "message": f"Question {i}"})
+                    latencies.append(time.perf_counter() - start)
+                    first_chunks.append(reply["time_to_first_chunk_ms"] / 1000)
+
+            start = time.perf_counter()
+            await asyncio.gather(*[converse(conversation) for conversation in conversations])
+            wall = time.perf_counter() - start
+            return first_chunks, latencies, wall, (await call("server_metrics", {}))["chat"]
+
+    print(f"{args.conversations} conversations x {args.messages} messages in parallel, reply of {args.chunks} chunks "
+          f"after {args.first_chunk_delay * 1000:.0f} ms, {args.connect_latency * 1000:.0f} ms per new connection")
+    try:
+        for pooled in (False, True):
+            first_chunks, latencies, wall, stats = asyncio.run(chat(pooled))
+            label = "pooled" if pooled else "connection per message"
+            _report(f"{label} first chunk", first_chunks)
+            _report(f"{label} full reply", latencies)
+            print(f"{label:<28} {len(latencies) / wall:.1f} messages/s, {stats['opened']} connections opened, "
+                  f"{stats['reused']} reused")
+    finally:
+        stub.terminate()
+
+
+def bench_fairness(args) -> None:
+    """
+    Latency seen by a quiet tenant while another one bursts writes through the same
+    connection pool, first come first served versus the fair scheduler
+    """
+    stub = start_stub(latency=args.latency)
+
+    async def run(scheduler: FairScheduler) -> tuple:
+        api = ApiClient(base_url=stub.url, max_connections=args.max_connections, scheduler=scheduler)
+        reads, writes = [], []
+
+        async def burst():
+            async def post(i):
+                await api.post("/tenant/t-noisy/brand/b-1/worker/w-1/generation", json={"context": str(i)},
+                               api_key="sk-noisy")
+            await asyncio.gather(*[post(i) for i in range(args.burst)])
+
+        async def quiet():
+            for i in range(args.calls):
+                start = time.perf_counter()
+                await api.get("/tenant/t-quiet/brand/b-2", api_key="sk-quiet")
+                reads.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                await api.post("/tenant/t-quiet/brand/b-2/worker/w-2/generation", json={"context": str(i)},
+                               api_key="sk-quiet")
+                writes.append(time.perf_counter() - start)
+
+        noisy = asyncio.ensure_future(burst())
+        # Let the burst fill the pool first
+        await asyncio.sleep(args.latency)
+        await quiet()
+        start = time.perf_counter()
+        await noisy
+        await api.close()
+        return reads, writes, time.perf_counter() - start
+
+    print(f"Tenant t-noisy bursts {args.burst} POSTs while t-quiet makes {args.calls} GET+POST pairs, "
+          f"{args.max_connections} connections, upstream latency {args.latency * 1000:.0f} ms")
+    for label, max_in_flight in (("first come first served", 0), ("fair scheduler", args.max_connections)):
+        metrics = Metrics()
+        scheduler = FairScheduler(max_in_flight=max_in_flight, metrics=metrics)
+        reads, writes, tail = asyncio.run(run(scheduler))
+        _report(f"{label} quiet GET", reads)
+        _report(f"{label} quiet POST", writes)
+        waits = metrics.snapshot()["queue_wait"]
+        if waits:
+            noisy = waits.get("bulk", {}).get("t-noisy", {})
+            print(f"{'':<28} t-noisy bulk wait p50 {noisy.get('p50_ms')} ms, burst finished "
+                  f"{tail * 1000:.0f} ms after t-quiet")
+    stub.shutdown()
+
+
+_WORDS = ("season collection crafted people care link early access friday launch limited color fabric "
+          "organic cotton linen summer weekend story studio design team thank community new drop restock "
+          "size fit everyday classic bold soft light free shipping order today discover favorite").split()
+
+
+def _fake_text(seed: int, words: int) -> str:
+    rng = random.Random(seed)
+    return " ".join(rng.choice(_WORDS) for _ in range(words)).capitalize() + "."
+
+
+def _fake_generations(count: int) -> list:
+    """Generations shaped like the API's, with the prompt context and generated content they carry"""
+    statuses = ["COMPLETED"] * 8 + ["PROCESSING", "FAILED"]
+    return [{
+        "generation_id": f"gen-{index:06d}",
+        "worker_id": "w-bench",
+        "brand_id": "b-bench",
+        "tenant_id": "t-bench",
+        "status": statuses[index % len(statuses)],
+        "progress": 100 if index % 10 < 8 else 40,
+        "created_at": "2025-02-14T15:49:44.120298+00:00",
+        "completed_at": "2025-02-14T15:50:31.904112+00:00",
+        "context": f"Announce the spring collection, post {index}, for followers who bought last season",
+        "metadata": {"batch_id": "spring-launch", "index": index, "channel": ["instagram", "x", "linkedin"][index % 3]},
+        "result": {
+            "content": _fake_text(index, 180),
+            "hashtags": ["#spring", "#newcollection", "#madetolast"],
+            "scores": {"voice": 0.91, "clarity": 0.87, "engagement": 0.78},
+        },
+    } for index in range(count)]
+
+
+def bench_codec(args) -> None:
+    """
+    Decode and encode time and peak memory of a multi-MB list payload with each JSON codec,
+    then bytes on the wire and fetch time of the same list with and without response compression
+    """
+    import pydantic_core
+
+    items = _fake_generations(args.items)
+    body = json.dumps(items).encode()
+    backends = {"json": (json.loads, lambda value: json.dumps(value, separators=(",", ":")).encode())}
+    try:
+        import orjson
+        backends["orjson"] = (orjson.loads, orjson.dumps)
+    except ImportError:
+        print("orjson is not installed, measuring the stdlib codec only (pip install orjson)")
+
+    def timed(function, value) -> tuple:
+        samples = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            function(value)
+            samples.append(time.perf_counter() - start)
+        # Tracing slows allocations down several times, so peak memory is taken from a separate run
+        tracemalloc.start()
+        function(value)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return statistics.median(samples), peak
+
+    print(f"{args.items} generations, {len(body) / 2**20:.1f} MB of JSON, median of {args.repeat} runs")
+    seconds, peak = timed(lambda value: json.dumps(pydantic_core.to_jsonable_python(value)), items)
+    print(f"{'encode, FastMCP default':<28} {seconds * 1000:8.1f} ms   peak {peak / 2**20:7.1f} MB")
+    for name, (decode, encode) in backends.items():
+        seconds, peak = timed(decode, body)
+        print(f"{'decode, ' + name:<28} {seconds * 1000:8.1f} ms   peak {peak / 2**20:7.1f} MB")
+        seconds, peak = timed(encode, items)
+        print(f"{'encode, ' + name:<28} {seconds * 1000:8.1f} ms   peak {peak / 2**20:7.1f} MB")
+
+    path = "/tenant/t-bench/brand/b-bench/worker/w-bench/generation"
+    print(f"GET of the list through ApiClient with the {codec.BACKEND} codec, accepting "
+          f"{', '.join(codec.accepted_encodings())}; wire time estimated at {args.bandwidth_mbps:g} Mbit/s")
+    for label, compress in (("uncompressed", False), ("compressed", True)):
+        stub = start_stub(routes={("GET", path): items}, compress=compress)
+
+        async def fetch() -> tuple:
+            api = ApiClient(base_url=stub.url)
+            samples = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                response = await api.get(path, api_key="sk-bench")
+                codec.response_json(response)
+                samples.append(time.perf_counter() - start)
+            await api.close()
+            return samples, response.num_bytes_downloaded, response.headers.get("Content-Encoding") or "identity"
+
+        samples, received, encoding = asyncio.run(fetch())
+        wire = received * 8 / (args.bandwidth_mbps * 1e6)
+        print(f"{label + ' (' + encoding + ')':<28} {received / 2**20:8.2f} MB   fetch+decode p50 "
+              f"{statistics.median(samples) * 1000:7.1f} ms   wire ~{wire * 1000:7.1f} ms")
+        stub.shutdown()
+
+
+def _tokens(value) -> float:
+    # Same 4 characters per token estimate as the payload benchmark
+    return len(json.dumps(value)) / 4
+
+
+def bench_context(args) -> None:
+    """
+    Average tool_use input tokens of a typical agent workflow against the stateful stub,
+    passing tenant_id/api_key/brand_id on every call versus selecting them once with
+    use_tenant, and with the key held by the server
+    """
+    from contextlib import AsyncExitStack
+
+    stub_port = _free_port()
+    stub = subprocess.Popen([sys.executable, STUB_SCRIPT, "--stateful", "--port", str(stub_port),
+                             "--queue-time", "0.01", "--process-time", "0.01"], stdout=subprocess.PIPE, text=True)
+    stub.stdout.readline()
+    api_url = f"http://127.0.0.1:{stub_port}"
+    env = {"FASTMCP_LOG_LEVEL": "WARNING"}
+
+    async def setup() -> dict:
+        async with AsyncExitStack() as stack:
+            session = await _server_session(api_url, stack, env)
+            tenant = _tool_data(await session.call_tool("create_tenant", {"name": "Context bench"}))
+            auth = {"tenant_id": tenant["tenant_id"], "api_key": tenant["api_key"]}
+            brand = _tool_data(await session.call_tool("create_brand", {**auth, "name": "Context brand"}))
+            worker = _tool_data(await session.call_tool("create_worker", {
+                **auth, "output_type": "TEXT", "name": "Posts", "prompt": "Write a social media post"}))
+            return {**auth, "brand_id": brand["brand_id"], "worker_id": worker["worker_id"]}
+
+    ids = asyncio.run(setup())
+
+    def workflow(scope: dict) -> list:
+        """(tool, arguments) of a session reading a brand and generating posts; scope holds the IDs it passes"""
+        worker = {**scope, "worker_id": ids["worker_id"]}
+        calls = [("get_brand", scope), ("get_brand_compass", {**scope, "summary": True}),
+                 ("list_sources", {**scope, "summary": True}), ("list_workers", {
+                     key: value for key, value in scope.items() if key != "brand_id"})]
+        for i in range(args.calls):
+            calls.append(("create_generation", {**worker, "context": f"Spring launch post {i}"}))
+        calls.append(("list_generations", {**worker, "summary": True, "max_items": args.calls}))
+        return calls
+
+    variants = [
+        ("explicit arguments", {}, [], {key: ids[key] for key in ("tenant_id", "api_key", "brand_id")}),
+        ("use_tenant with api_key", {}, [("use_tenant", {key: ids[key] for key in ("tenant_id", "api_key", "brand_id")})], {}),
+        ("key held by the server", {"SOCIAL_TOOLKIT_API_KEYS": f"{ids['tenant_id']}={ids['api_key']}"},
+         [("use_brand", {"brand_id": ids["brand_id"]})], {}),
+    ]
+
+    async def run(extra_env: dict, prelude: list, scope: dict) -> tuple:
+        async with AsyncExitStack() as stack:
+            session = await _server_session(api_url, stack, {**env, **extra_env})
+            calls = prelude + workflow(scope)
+            for name, arguments in calls:
+                result = await session.call_tool(name, arguments)
+                # An empty list comes back as no content at all
+                if result.content:
+                    _tool_data(result)
+        inputs = [_tokens(arguments) for _, arguments in calls]
+        return statistics.mean(inputs), sum(inputs), len(calls)
+
+    try:
+        print(f"{args.calls} create_generation calls plus 5 reads, tool_use input tokens estimated at 4 characters each")
+        for label, extra_env, prelude, scope in variants:
+            mean, total, count = asyncio.run(run(extra_env, prelude, scope))
+            print(f"{label:<28} {count:>3} calls   mean {mean:6.1f} tokens   total {total:7.0f} tokens")
+    finally:
+        stub.terminate()
+
+
+class _Block:
+    """Stands in for a content block of an Anthropic message"""
+
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+    def model_dump(self, exclude_none: bool = False) -> dict:
+        return dict(self.__dict__)
+
+
+class _ScriptedModel:
+    """
+    Plays the model for bench_memory: each turn calls a few read tools, now and then a
+    write or a recall of a compacted result, then answers
+    """
+
+    def __init__(self, worker_id: str):
+        self.worker_id = worker_id
+        self.turn = 0
+        self.calls = 0
+        self.request_tokens = []
+
+    def _tool_uses(self, messages: list) -> list:
+        reads = [("list_sources", {}), ("get_brand", {}), ("list_generations", {"worker_id": self.worker_id}),
+                 ("get_brand_compass", {}), ("list_workers", {})]
+        uses = [reads[self.turn % len(reads)], reads[(self.turn + 2) % len(reads)]]
+        if self.turn % 4 == 3:
+            uses.append(("create_generation", {"worker_id": self.worker_id, "context": f"Post for turn {self.turn}"}))
+        if self.turn % 10 == 9:
+            refs = [word for message in messages if isinstance(message["content"], list)
+                    for block in message["content"] if isinstance(block.get("content"), str)
+                    for word in block["content"].split() if word.startswith("ref-")]
+            if refs:
+                uses.append(("recall_result", {"ref": refs[0].rstrip(";")}))
+        return uses
+
+    def respond(self, messages: list):
+        from memory import estimate_tokens
+
+        self.request_tokens.append(estimate_tokens(messages))
+        usage = _Block(input_tokens=estimate_tokens(messages), output_tokens=0, cache_read_input_tokens=0,
+                       cache_creation_input_tokens=0)
+        if isinstance(messages[-1]["content"], str):
+            content = []
+            for name, arguments in self._tool_uses(messages):
+                self.calls += 1
+                content.append(_Block(type="tool_use", id=f"toolu_{self.calls:06d}", name=name, input=arguments))
+            return _Block(content=content, stop_reason="tool_use", usage=usage)
+        self.turn += 1
+        answer = f"Turn {self.turn}: the brand has the sources and generations listed above. " * 4
+        return _Block(content=[_Block(type="text", text=answer)], stop_reason="end_turn", usage=usage)
+
+
+def bench_memory(args) -> None:
+    """
+    History size per turn of a long MCPClient session with bounded memory, against the
+    stateful stub, with a scripted model in place of Claude
+    """
+    from contextlib import AsyncExitStack
+
+    from client import MCPClient
+    from memory import ConversationMemory, ToolResultStore, estimate_tokens
+
+    stub = start_stub(stateful=True, queue_time=0.01, process_time=0.01)
+
+    class BenchClient(MCPClient):
+        def __init__(self, model):
+            # Everything but the Anthropic client
+            self.session = None
+            self.last_query_stats = {}
+            self._tools = None
+            self.memory = ConversationMemory(budget_tokens=args.budget, store=ToolResultStore())
+            self.model = model
+
+        async def _stream_turn(self, messages, available_tools, on_first_token):
+            on_first_token()
+            message = self.model.respond(messages)
+            tool_uses = [block for block in message.content if block.type == "tool_use"]
+            return message, await asyncio.gather(*[self._call_tool(tool_use) for tool_use in tool_uses])
+
+    async def run():
+        async with AsyncExitStack() as stack:
+            session = await _server_session(stub.url, stack, {"FASTMCP_LOG_LEVEL": "WARNING"})
+            tenant = _tool_data(await session.call_tool("create_tenant", {"name": "Memory bench"}))
+            auth = {"tenant_id": tenant["tenant_id"], "api_key": tenant["api_key"]}
+            brand = _tool_data(await session.call_tool("create_brand", {**auth, "name": "Memory brand"}))
+            await session.call_tool("create_sources_batch", {
+                **auth, "brand_id": brand["brand_id"], "source_type": "KNOWLEDGE",
+                "texts": [_fake_text(index, 120) for index in range(args.sources)]})
+            worker = _tool_data(await session.call_tool("create_worker", {
+                **auth, "output_type": "TEXT", "name": "Posts", "prompt": "Write a social media post"}))
+            await session.call_tool("use_tenant", {**auth, "brand_id": brand["brand_id"]})
+
+            model = _ScriptedModel(worker["worker_id"])
+            client = BenchClient(model)
+            client.session = session
+            rows, naive = [], 0
+            for turn in range(1, args.turns + 1):
+                await client.process_query(f"Question {turn}: how are the brand's sources and generations doing?")
+                stats = client.last_query_stats
+                naive += estimate_tokens(client.memory.turns[-1]) if client.memory.turns else 0
+                rows.append((turn, model.request_tokens[-2], stats["context"], naive))
+            return rows, client
+
+    rows, client = asyncio.run(run())
+    stub.shutdown()
+    print(f"{args.turns} turns, history budget {args.budget} tokens, {client.memory.recent_turns} recent turns "
+          f"kept verbatim, tokens estimated at 4 characters each")
+    print(f"{'turn':>5} {'request':>9} {'history':>9} {'unbounded':>10} {'local':>6} {'recalled':>9}")
+    served = recalled = 0
+    for turn, request, context, naive in rows:
+        served += context["served_locally"]
+        recalled += context["recalled"]
+        if turn % max(1, args.turns // 10) == 0 or turn == 1:
+            print(f"{turn:>5} {request:>9} {context['history_tokens']:>9} {naive:>10} {served:>6} {recalled:>9}")
+    memory = client.memory
+    print(f"largest request ~{max(row[1] for row in rows)} tokens; {memory.compacted_results} results replaced "
+          f"by references, {memory.collapsed_turns} turns collapsed, {memory.dropped_turns} dropped; "
+          f"{served} tool calls served locally, {recalled} recalled")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Social Toolkit MCP benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    transport = subparsers.add_parser("transport", help="per-call latency with and without connection pooling")
+    transport.add_argument("--calls", type=int, default=200)
+    transport.add_argument("--latency", type=float, default=0.005)
+    transport.add_argument("--connect-latency", type=float, default=0.05)
+    transport.set_defaults(func=bench_transport)
+
+    concurrency = subparsers.add_parser("concurrency", help="serial versus parallel tool calls over one session")
+    concurrency.add_argument("--calls", type=int, default=20)
+    concurrency.add_argument("--latency", type=float, default=0.2)
+    concurrency.set_defaults(func=bench_concurrency)
+
+    upload = subparsers.add_parser("upload", help="peak memory of a large streamed create_source upload")
+    upload.add_argument("--size-mb", type=int, default=2048)
+    upload.add_argument("--max-rss-mb", type=int, default=256)
+    upload.set_defaults(func=bench_upload)
+
+    faults = subparsers.add_parser("faults", help="retries and circuit breaking against a fault-injecting stub")
+    faults.add_argument("--calls", type=int, default=200)
+    faults.add_argument("--fail-rate", type=float, default=0.3)
+    faults.set_defaults(func=bench_faults)
+
+    payload = subparsers.add_parser("payload", help="size and latency of list_sources with result compaction")
+    payload.add_argument("--sources", type=int, default=1000)
+    payload.add_argument("--calls", type=int, default=10)
+    payload.set_defaults(func=bench_payload)
+
+    remote = subparsers.add_parser("remote", help="many clients sharing one server over SSE")
+    remote.add_argument("--clients", type=int, default=50)
+    remote.add_argument("--calls", type=int, default=20)
+    remote.add_argument("--latency", type=float, default=0.02)
+    remote.add_argument("--stdio-sessions", type=int, default=5)
+    remote.set_defaults(func=bench_remote)
+
+    startup = subparsers.add_parser("startup", help="exec to initialize and to first tool result of a stdio server")
+    startup.add_argument("--runs", type=int, default=10)
+    startup.add_argument("--latency", type=float, default=0.02)
+    startup.add_argument("--connect-latency", type=float, default=0.15)
+    startup.add_argument("--think", type=float, default=0.5)
+    startup.set_defaults(func=bench_startup)
+
+    coalesce = subparsers.add_parser("coalesce", help="identical concurrent GETs with and without coalescing")
+    coalesce.add_argument("--callers", type=int, default=20)
+    coalesce.add_argument("--rounds", type=int, default=10)
+    coalesce.add_argument("--latency", type=float, default=0.1)
+    coalesce.set_defaults(func=bench_coalesce)
+
+    load = subparsers.add_parser("load", help="throughput, latency and memory per tool against the stateful stub")
+    load.add_argument("--calls", type=int, default=100)
+    load.add_argument("--concurrency", type=int, default=10)
+    load.add_argument("--latency", type=float, default=0.02)
+    load.add_argument("--queue-time", type=float, default=0.2)
+    load.add_argument("--process-time", type=float, default=1.0)
+    load.add_argument("--fail-rate", type=float, default=0.0)
+    load.add_argument("--job-fail-rate", type=float, default=0.05)
+    load.add_argument("--api-url", help="run against this API instead of starting the stateful stub")
+    load.set_defaults(func=bench_load)
+
+    chat = subparsers.add_parser("chat", help="send_message over pooled versus per-message WebSocket connections")
+    chat.add_argument("--conversations", type=int, default=10)
+    chat.add_argument("--messages", type=int, default=10)
+    chat.add_argument("--chunks", type=int, default=20)
+    chat.add_argument("--first-chunk-delay", type=float, default=0.1)
+    chat.add_argument("--connect-latency", type=float, default=0.1)
+    chat.set_defaults(func=bench_chat)
+
+    fairness = subparsers.add_parser("fairness", help="a quiet tenant's latency during another tenant's burst")
+    fairness.add_argument("--burst", type=int, default=2000)
+    fairness.add_argument("--calls", type=int, default=20)
+    fairness.add_argument("--latency", type=float, default=0.05)
+    fairness.add_argument("--max-connections", type=int, default=20)
+    fairness.set_defaults(func=bench_fairness)
+
+    codec_bench = subparsers.add_parser("codec", help="JSON decode/encode cost and compressed transfer of large lists")
+    codec_bench.add_argument("--items", type=int, default=2000)
+    codec_bench.add_argument("--repeat", type=int, default=5)
+    codec_bench.add_argument("--bandwidth-mbps", type=float, default=100)
+    codec_bench.set_defaults(func=bench_codec)
+
+    context = subparsers.add_parser("context", help="tool_use input tokens with and without a session tenant context")
+    context.add_argument("--calls", type=int, default=30)
+    context.set_defaults(func=bench_context)
+
+    memory = subparsers.add_parser("memory", help="history size per turn of a long MCPClient session")
+    memory.add_argument("--turns", type=int, default=100)
+    memory.add_argument("--budget", type=int, default=24000)
+    memory.add_argument("--sources", type=int, default=40)
+    memory.set_defaults(func=bench_memory)
+
+    args = parser.parse_args()
+    args.func(args)
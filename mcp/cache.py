@@ -0,0 +1,166 @@
+# cache.py
+"""
+In-process read-through cache for slowly changing API resources.
+
+Entries are keyed by (api_key hash, tenant_id, path, params), expire after a
+per-resource TTL and are evicted least-recently-used once the cache is full.
+Write tools invalidate the paths they touch, so a write is never followed by
+a stale read from this process. Invalidation also reaches the persistent
+store behind the cache, if one is attached (see result_store.py), and drops
+the API client's in-flight GETs of those paths, so a read sent after the
+write is not coalesced onto one sent before it.
+
+A read that started before a write may finish after its invalidation. Each
+invalidation therefore advances a generation counter: readers take
+generation() before fetching and don't cache their result if changed_since()
+reports an invalidation of their path in between.
+
+Size can be tuned with SOCIAL_TOOLKIT_CACHE_SIZE (entries, default 1024; 0 disables the cache).
+"""
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+
+# Invalidated paths remembered for changed_since; a fetch older than the forgotten ones is never cached
+INVALIDATION_HISTORY = 4096
+
+# Seconds each kind of resource is served from the cache
+DEFAULT_TTLS = {
+    "tenant": 300,
+    "brand": 120,
+    "brands": 60,
+    "compass": 30,
+    "prompt": 300,
+    "prompts": 120,
+    "worker": 300,
+    "workers": 120,
+    # Pages walked by list_sources_page / list_generations_page, kept so a cursor resumes on the same data
+    "source_pages": 60,
+    "generation_pages": 60,
+    # Chat tokens of conversations, valid for 30 days on the API side
+    "conversation_token": 3600,
+}
+
+MISSING = object()
+
+
+def _key_hash(api_key: str) -> str:
+    return hashlib.sha256((api_key or "").encode()).hexdigest()[:16]
+
+
+class ResponseCache:
+    """
+    TTL + LRU cache of decoded API responses, with hit/miss counters per resource
+    """
+
+    def __init__(self, max_size: int = None, ttls: dict = None, store=None, api=None):
+        # Persistent ResultStore whose entries are invalidated along with the cache's
+        self.store = store
+        # ApiClient whose in-flight GETs of invalidated paths are no longer shared
+        self.api = api
+        if max_size is None:
+            max_size = int(os.environ.get("SOCIAL_TOOLKIT_CACHE_SIZE") or 1024)
+        self.max_size = max_size
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self._entries = OrderedDict()
+        self._counters = {}
+        self.evictions = 0
+        self.invalidations = 0
+        # Generation of the latest invalidation of each (tenant_id, path), and of each subtree
+        self._generation = 0
+        self._forgotten = 0
+        self._invalidated = {}
+        self._invalidated_subtrees = {}
+
+    def _key(self, api_key: str, tenant_id: str, path: str, params: dict = None) -> tuple:
+        return (_key_hash(api_key), tenant_id, path, tuple(sorted((params or {}).items())))
+
+    def _count(self, resource: str, outcome: str) -> None:
+        counters = self._counters.setdefault(resource, {"hits": 0, "misses": 0})
+        counters[outcome] += 1
+
+    def get(self, resource: str, api_key: str, tenant_id: str, path: str, params: dict = None):
+        """Return the cached value, or MISSING if absent or expired"""
+        key = self._key(api_key, tenant_id, path, params)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self._entries.move_to_end(key)
+            self._count(resource, "hits")
+            return entry[1]
+        if entry is not None:
+            del self._entries[key]
+        self._count(resource, "misses")
+        return MISSING
+
+    def set(self, resource: str, api_key: str, tenant_id: str, path: str, params: dict, value, ttl: float = None) -> None:
+        if self.max_size <= 0:
+            return
+        ttl = self.ttls.get(resource, 0) if ttl is None else ttl
+        if ttl <= 0:
+            return
+        key = self._key(api_key, tenant_id, path, params)
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def generation(self) -> int:
+        """Current invalidation generation, to pass to changed_since once a fetch is done"""
+        return self._generation
+
+    def changed_since(self, tenant_id: str, path: str, generation: int) -> bool:
+        """Whether path was invalidated, on its own or with a subtree above it, after generation"""
+        if generation < self._forgotten or self._invalidated.get((tenant_id, path), 0) > generation:
+            return True
+        prefix = path
+        while prefix:
+            if self._invalidated_subtrees.get((tenant_id, prefix), 0) > generation:
+                return True
+            prefix = prefix.rpartition("/")[0]
+        return False
+
+    def _record_invalidation(self, tenant_id: str, path: str, subtree: bool) -> None:
+        self._generation += 1
+        (self._invalidated_subtrees if subtree else self._invalidated)[(tenant_id, path)] = self._generation
+        if len(self._invalidated) + len(self._invalidated_subtrees) > INVALIDATION_HISTORY:
+            # Forget the older half; changed_since then answers True for fetches that old
+            self._forgotten = self._generation - INVALIDATION_HISTORY // 2
+            for recorded in (self._invalidated, self._invalidated_subtrees):
+                for key in [key for key, generation in recorded.items() if generation <= self._forgotten]:
+                    del recorded[key]
+
+    async def invalidate(self, tenant_id: str, path: str, subtree: bool = False) -> None:
+        """
+        Drop every entry for path, whatever the api_key or params
+        With subtree=True, entries for paths below it are dropped as well
+        The persistent store is updated in a thread, as its SQLite writes may wait on other processes
+        """
+        stale = [
+            key for key in self._entries
+            if key[1] == tenant_id and (key[2] == path or (subtree and key[2].startswith(path + "/")))
+        ]
+        for key in stale:
+            del self._entries[key]
+        self.invalidations += len(stale)
+        self._record_invalidation(tenant_id, path, subtree)
+        if self.api is not None:
+            self.api.forget(path, subtree)
+        if self.store is not None:
+            await asyncio.to_thread(self.store.invalidate, tenant_id, path, subtree)
+
+    def stats(self) -> dict:
+        hits = sum(counters["hits"] for counters in self._counters.values())
+        misses = sum(counters["misses"] for counters in self._counters.values())
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 4) if hits + misses else None,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "by_resource": {resource: dict(counters) for resource, counters in sorted(self._counters.items())},
+        }
@@ -0,0 +1,247 @@
+# chat.py
+"""
+Pooled WebSocket connections for brand conversations.
+
+A brand conversation is chatted with over the API's WebSocket endpoint,
+authenticated with the conversation's token. Opening a connection costs a
+TCP+TLS handshake and a WebSocket upgrade, so ChatPool keeps one open
+connection per conversation token and reuses it for every message of that
+conversation:
+- each connection is pinged every ping_interval seconds (heartbeat) and
+  dropped if the pong doesn't arrive within ping_timeout
+- a connection found closed, by the API's inactivity timeout or otherwise,
+  is reopened with backoff before the message is sent
+- connections unused for idle_expiry seconds are closed, and the least
+  recently used one is closed once max_connections are open
+
+Messages of one conversation are sent one at a time, since their replies
+would otherwise interleave on the connection.
+
+A reply arrives as a sequence of {"type": "chat_stream", "message": ...}
+chunks. It ends with the first message of any other type, one flagged
+done/final, or once no chunk has arrived for end_idle seconds. A reply that
+ended by silence or by its timeout may still have chunks on the way, so its
+connection is closed rather than reused; the next message opens a new one.
+
+Tuning is done through environment variables:
+- SOCIAL_TOOLKIT_WS_URL: WebSocket endpoint (default: production)
+- SOCIAL_TOOLKIT_WS_PING_INTERVAL: seconds between heartbeat pings (default: 20)
+- SOCIAL_TOOLKIT_WS_IDLE_EXPIRY: seconds an unused connection is kept open (default: 300)
+- SOCIAL_TOOLKIT_WS_MAX_CONNECTIONS: max open connections (default: 64)
+- SOCIAL_TOOLKIT_CHAT_END_IDLE: seconds of silence that end a reply (default: 5)
+
+Needs the `websockets` package (pip install websockets).
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+
+from api_client import _env_float, _env_int
+from codec import dumps, loads
+
+DEFAULT_WS_URL = "wss://fksqfi5loe.execute-api.us-east-1.amazonaws.com/api/"
+
+STREAM_TYPE = "chat_stream"
+
+# Flags that mark the last message of a reply
+_FINAL_FLAGS = ("done", "final", "is_final")
+
+logger = logging.getLogger("social_toolkit")
+
+
+class ChatError(Exception):
+    """The API answered a message with an error"""
+
+
+class _Connection:
+    def __init__(self):
+        self.websocket = None
+        # Held for a whole message exchange, so replies never interleave
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+
+
+def _connect_function():
+    try:
+        from websockets.asyncio.client import connect
+    except ImportError:
+        raise RuntimeError("Conversations need the websockets package: pip install websockets") from None
+    return connect
+
+
+def _is_open(websocket) -> bool:
+    if websocket is None:
+        return False
+    from websockets.protocol import State
+    return websocket.state is State.OPEN
+
+
+class ChatPool:
+    """
+    Open WebSocket connections to the chat endpoint, one per conversation token
+    """
+
+    def __init__(self, url: str = None, ping_interval: float = None, ping_timeout: float = None,
+                 idle_expiry: float = None, max_connections: int = None, end_idle: float = None,
+                 max_reconnects: int = 3):
+        self.url = url or os.environ.get("SOCIAL_TOOLKIT_WS_URL") or DEFAULT_WS_URL
+        self.ping_interval = _env_float("SOCIAL_TOOLKIT_WS_PING_INTERVAL", 20) if ping_interval is None else ping_interval
+        self.ping_timeout = self.ping_interval if ping_timeout is None else ping_timeout
+        self.idle_expiry = _env_float("SOCIAL_TOOLKIT_WS_IDLE_EXPIRY", 300) if idle_expiry is None else idle_expiry
+        self.max_connections = (_env_int("SOCIAL_TOOLKIT_WS_MAX_CONNECTIONS", 64)
+                                if max_connections is None else max_connections)
+        self.end_idle = _env_float("SOCIAL_TOOLKIT_CHAT_END_IDLE", 5) if end_idle is None else end_idle
+        self.max_reconnects = max_reconnects
+        self._connections = OrderedDict()
+        self.opened = 0
+        self.reused = 0
+        self.reconnects = 0
+        self.messages = 0
+        self.errors = 0
+
+    def _prune(self) -> None:
+        """Close connections past idle_expiry, and the least recently used ones beyond max_connections"""
+        now = time.monotonic()
+        for token, connection in list(self._connections.items()):
+            expired = now - connection.last_used > self.idle_expiry
+            if (expired or len(self._connections) > self.max_connections) and not connection.lock.locked():
+                del self._connections[token]
+                if connection.websocket is not None:
+                    asyncio.ensure_future(connection.websocket.close())
+
+    async def _open(self, token: str, connection: _Connection) -> None:
+        connect = _connect_function()
+        delay = 0.5
+        for attempt in range(self.max_reconnects + 1):
+            try:
+                connection.websocket = await connect(
+                    self.url, additional_headers={"Authorization": token},
+                    ping_interval=self.ping_interval or None, ping_timeout=self.ping_timeout or None,
+                    open_timeout=10, max_size=None,
+                )
+                self.opened += 1
+                return
+            except (OSError, asyncio.TimeoutError) as e:
+                if attempt == self.max_reconnects:
+                    raise
+                logger.warning("Chat connection failed, retrying in %.1fs: %s", delay, e)
+                await asyncio.sleep(delay)
+                delay *= 2
+
+    async def _send(self, token: str, connection: _Connection, text: str) -> None:
+        """Send on the pooled connection, reopening it if it was closed"""
+        from websockets.exceptions import ConnectionClosed
+
+        for attempt in range(self.max_reconnects + 1):
+            if not _is_open(connection.websocket):
+                if connection.websocket is not None:
+                    self.reconnects += 1
+                await self._open(token, connection)
+            elif attempt == 0:
+                self.reused += 1
+            try:
+                await connection.websocket.send(text)
+                return
+            except ConnectionClosed:
+                # Closed before the message left; nothing was delivered, so sending again is safe
+                if attempt == self.max_reconnects:
+                    raise
+                connection.websocket = None
+                self.reconnects += 1
+
+    @staticmethod
+    async def _discard(connection: _Connection) -> None:
+        """Close the connection's socket, so the rest of an unfinished reply is never read"""
+        if connection.websocket is not None:
+            websocket, connection.websocket = connection.websocket, None
+            await websocket.close()
+
+    async def send(self, token: str, payload: dict, on_chunk=None, timeout: float = 120) -> dict:
+        """
+        Send one message and collect the streamed reply
+        on_chunk, when given, is awaited with (chunk number, text) for every chat_stream chunk.
+        Raises ChatError when the API reports an error, TimeoutError when no reply arrives within timeout
+        """
+        self._prune()
+        connection = self._connections.get(token)
+        if connection is None:
+            connection = self._connections[token] = _Connection()
+        self._connections.move_to_end(token)
+
+        async with connection.lock:
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            deadline = start + timeout
+            chunks = []
+            first_chunk = None
+            ended_by = "idle"
+            self.messages += 1
+            try:
+                await self._send(token, connection, dumps(payload))
+                while True:
+                    remaining = deadline - loop.time()
+                    wait = remaining if not chunks else min(self.end_idle, remaining)
+                    if wait <= 0:
+                        if not chunks:
+                            raise TimeoutError(f"No reply within {timeout}s")
+                        ended_by = "timeout"
+                        break
+                    try:
+                        raw = await asyncio.wait_for(connection.websocket.recv(), wait)
+                    except asyncio.TimeoutError:
+                        if not chunks:
+                            raise TimeoutError(f"No reply within {timeout}s") from None
+                        if deadline - loop.time() <= 0:
+                            ended_by = "timeout"
+                        break
+                    message = loads(raw)
+                    if not isinstance(message, dict):
+                        continue
+                    if message.get("status") == "error":
+                        raise ChatError(message.get("message") or message.get("error") or "Chat error")
+                    if message.get("type") == STREAM_TYPE:
+                        if first_chunk is None:
+                            first_chunk = loop.time() - start
+                        text = message.get("message") or ""
+                        chunks.append(text)
+                        if on_chunk is not None:
+                            await on_chunk(len(chunks), text)
+                        if not any(message.get(flag) for flag in _FINAL_FLAGS):
+                            continue
+                    ended_by = "end_message"
+                    break
+                if ended_by != "end_message":
+                    # No end frame was seen: late chunks would be read as the reply to the next message
+                    await self._discard(connection)
+            except Exception:
+                self.errors += 1
+                await self._discard(connection)
+                raise
+            finally:
+                connection.last_used = time.monotonic()
+        return {
+            "reply": "".join(chunks),
+            "chunks": len(chunks),
+            "ended_by": ended_by,
+            "time_to_first_chunk_ms": round(first_chunk * 1000, 1) if first_chunk is not None else None,
+            "duration_ms": round((loop.time() - start) * 1000, 1),
+        }
+
+    def stats(self) -> dict:
+        return {
+            "open_connections": sum(1 for connection in self._connections.values() if _is_open(connection.websocket)),
+            "opened": self.opened,
+            "reused": self.reused,
+            "reconnects": self.reconnects,
+            "messages": self.messages,
+            "errors": self.errors,
+        }
+
+    async def close(self) -> None:
+        connections = list(self._connections.values())
+        self._connections.clear()
+        for connection in connections:
+            if connection.websocket is not None:
+                await connection.websocket.close()
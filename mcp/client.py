@@ -1,19 +1,50 @@
 import asyncio
+import time
 from typing import Optional
 from contextlib import AsyncExitStack
 
-from mcp import ClientSession, StdioServerParameters
+from mcp import ClientSession, StdioServerParameters, types
 from mcp.client.stdio import stdio_client
 
+from memory import RECALL_TOOL, ConversationMemory
+
+# Kept byte-for-byte identical across requests so it can be served from the prompt cache
+SYSTEM_PROMPT = (
+    "You are an assistant for the Social Toolkit API. Use the available tools to manage tenants, "
+    "brands, sources, prompts, workers and generations on the user's behalf. Select the tenant "
+    "with use_tenant and the brand with use_brand once, then leave tenant_id, api_key and brand_id "
+    "out of other tool calls. Leave api_key empty: the server supplies it, and only if use_tenant "
+    "reports that no key is known should you ask the user for one. When several tool calls do not "
+    "depend on each other, make them in the same turn so they run in parallel."
+)
+
+def _results_for(message, tool_results: list) -> list:
+    """One tool_result block per tool_use block of message, in order
+
+    A tool_use that was never started (e.g. cut off by max_tokens) gets an error
+    result, so the model is told and the history stays valid for the API
+    """
+    by_id = {result["tool_use_id"]: result for result in tool_results}
+    return [by_id.get(block.id) or {"type": "tool_result", "tool_use_id": block.id,
+                                    "content": "Not run: the tool call was cut off", "is_error": True}
+            for block in message.content if block.type == "tool_use"]
+
 class MCPClient:
     def __init__(self):
         # Initialize session and client objects
         self.session: Optional[ClientSession] = None
         self.exit_stack = AsyncExitStack()
+        # Timings and token usage of the last query, see process_query
+        self.last_query_stats = {}
+        # Tool definitions for the model, fetched once per session; see _get_tools
+        self._tools = None
+        self._notification_task = None
+        # Earlier turns of the conversation, kept under a token budget, and every tool result
+        self.memory = ConversationMemory()
         
         # Initialize Anthropic client
-        from anthropic import Anthropic
-        self.anthropic = Anthropic()  # Requires ANTHROPIC_API_KEY environment variable
+        from anthropic import AsyncAnthropic
+        self.anthropic = AsyncAnthropic()  # Requires ANTHROPIC_API_KEY environment variable
     
     async def connect_to_server(self, server_script_path: str):
         """Connect to an MCP server
@@ -38,75 +69,200 @@ class MCPClient:
         self.session = await self.exit_stack.enter_async_context(ClientSession(self.stdio, self.write))
         
         await self.session.initialize()
+        self._notification_task = asyncio.create_task(self._watch_notifications())
         
         # List available tools
-        response = await self.session.list_tools()
-        tools = response.tools
-        print("\nConnected to server with tools:", [tool.name for tool in tools])
+        tools = await self._get_tools()
+        print("\nConnected to server with tools:", [tool["name"] for tool in tools])
+
+    async def _watch_notifications(self):
+        """Drop the cached tool list whenever the server says its tools changed
+
+        Also keeps the session's incoming message stream drained, which the
+        session needs to keep receiving responses
+        """
+        async for message in self.session.incoming_messages:
+            if isinstance(message, types.ServerNotification) and isinstance(message.root, types.ToolListChangedNotification):
+                self._tools = None
+
+    async def _get_tools(self) -> list:
+        """Tool definitions in the Anthropic format, listed from the server once and then reused
 
+        The last definition carries a cache breakpoint, so the whole tool list is
+        served from the prompt cache on later requests. recall_result, answered by
+        the client itself, comes last
+        """
+        if self._tools is None:
+            response = await self.session.list_tools()
+            tools = [{
+                "name": tool.name,
+                "description": tool.description,
+                "input_schema": tool.inputSchema
+            } for tool in response.tools]
+            tools.append(dict(RECALL_TOOL))
+            tools[-1]["cache_control"] = {"type": "ephemeral"}
+            self._tools = tools
+        return self._tools
+
+
+    async def _call_tool(self, tool_use) -> dict:
+        """Run the tool requested by a tool_use block and return the matching tool_result block
+
+        recall_result and repeated read calls are answered from the local result store
+        """
+        store = self.memory.store
+        if tool_use.name == RECALL_TOOL["name"]:
+            stored = store.recall(tool_use.id, tool_use.input.get("ref"))
+            if stored is None:
+                return {"type": "tool_result", "tool_use_id": tool_use.id, "content": "Unknown or expired ref",
+                        "is_error": True}
+        else:
+            stored = store.lookup(tool_use.id, tool_use.name, tool_use.input)
+        if stored is not None:
+            return {"type": "tool_result", "tool_use_id": tool_use.id, "content": stored.content,
+                    "is_error": stored.is_error}
+        try:
+            result = await self.session.call_tool(tool_use.name, tool_use.input)
+        except Exception as e:
+            return {"type": "tool_result", "tool_use_id": tool_use.id, "content": str(e), "is_error": True}
+        content = [{"type": "text", "text": item.text} for item in result.content if item.type == "text"]
+        store.put(tool_use.id, tool_use.name, tool_use.input, content, bool(result.isError))
+        return {
+            "type": "tool_result",
+            "tool_use_id": tool_use.id,
+            "content": content,
+            "is_error": bool(result.isError),
+        }
+
+    async def _stream_turn(self, messages: list, available_tools: list, on_first_token) -> tuple:
+        """Stream one assistant turn to stdout, starting each tool call as soon as its input is complete
+
+        Calls start before the turn's stop_reason is known, so they may have side
+        effects even when the turn then stops for another reason (e.g. max_tokens).
+        Their results are always awaited and returned: the final message and one
+        tool_result block per tool_use block in it. If the stream fails, the calls
+        still running are cancelled and waited for before the error is raised
+        """
+        tool_tasks = []
+        try:
+            async with self.anthropic.messages.stream(
+                model="claude-3-5-sonnet-20241022",
+                max_tokens=1000,
+                system=[{"type": "text", "text": SYSTEM_PROMPT, "cache_control": {"type": "ephemeral"}}],
+                messages=messages,
+                tools=available_tools
+            ) as stream:
+                async for event in stream:
+                    if event.type in ("text", "input_json"):
+                        on_first_token()
+                    if event.type == "text":
+                        print(event.text, end="", flush=True)
+                    elif event.type == "content_block_stop" and event.content_block.type == "tool_use":
+                        tool_use = event.content_block
+                        print(f"\n[Calling tool {tool_use.name} with args {tool_use.input}]", flush=True)
+                        tool_tasks.append(asyncio.create_task(self._call_tool(tool_use)))
+                message = await stream.get_final_message()
+        except BaseException:
+            for task in tool_tasks:
+                task.cancel()
+            await asyncio.gather(*tool_tasks, return_exceptions=True)
+            raise
+        return message, _results_for(message, await asyncio.gather(*tool_tasks))
 
     async def process_query(self, query: str) -> str:
-        """Process a query using Claude and available tools"""
-        messages = [
+        """Process a query using Claude and available tools
+
+        Claude's answer is streamed to stdout as it is generated. Each tool call
+        starts as soon as its tool_use block is complete, so tools of one turn run
+        concurrently, and all their results go back to Claude in a single message.
+        This repeats until Claude stops asking for tools. Time to first token,
+        total latency and the input tokens of each model call, split into cached
+        and uncached, are kept in last_query_stats.
+
+        Earlier turns of the session are sent along from self.memory, which keeps
+        them under its token budget. The size of the history after this turn and
+        the tool calls served locally are kept in last_query_stats["context"].
+        """
+        start = time.perf_counter()
+        stats = self.last_query_stats = {"ttft": None, "total": None, "model_calls": 0, "usage": []}
+        store = self.memory.store
+        hits, recalls = store.hits, store.recalls
+
+        def on_first_token():
+            if stats["ttft"] is None:
+                stats["ttft"] = time.perf_counter() - start
+
+        history = self.memory.messages()
+        messages = history + [
             {
                 "role": "user",
                 "content": query
             }
         ]
 
-        response = await self.session.list_tools()
-        available_tools = [{ 
-            "name": tool.name,
-            "description": tool.description,
-            "input_schema": tool.inputSchema
-        } for tool in response.tools]
-
-        # Initial Claude API call
-        response = self.anthropic.messages.create(
-            model="claude-3-5-sonnet-20241022",
-            max_tokens=1000,
-            messages=messages,
-            tools=available_tools
-        )
-
-        # Process response and handle tool calls
-        tool_results = []
         final_text = []
 
-        for content in response.content:
-            if content.type == 'text':
-                final_text.append(content.text)
-            elif content.type == 'tool_use':
-                tool_name = content.name
-                tool_args = content.input
-                
-                # Execute tool call
-                result = await self.session.call_tool(tool_name, tool_args)
-                tool_results.append({"call": tool_name, "result": result})
-                final_text.append(f"[Calling tool {tool_name} with args {tool_args}]")
-
-                # Continue conversation with tool results
-                if hasattr(content, 'text') and content.text:
-                    messages.append({
-                    "role": "assistant",
-                    "content": content.text
-                    })
+        while True:
+            available_tools = await self._get_tools()
+            response, tool_results = await self._stream_turn(messages, available_tools, on_first_token)
+            stats["model_calls"] += 1
+            usage = response.usage
+            stats["usage"].append({
+                "cache_read_input_tokens": usage.cache_read_input_tokens or 0,
+                "cache_creation_input_tokens": usage.cache_creation_input_tokens or 0,
+                "input_tokens": usage.input_tokens,
+                "output_tokens": usage.output_tokens,
+            })
+
+            for content in response.content:
+                if content.type == 'text':
+                    final_text.append(content.text)
+                elif content.type == 'tool_use':
+                    final_text.append(f"[Calling tool {content.name} with args {content.input}]")
+
+            # Plain dicts, so the memory can measure and rewrite them later
+            content = [block.model_dump(exclude_none=True) for block in response.content]
+            # A tool_use must be answered by a tool_result even when the turn stopped for another
+            # reason (e.g. max_tokens), or the history kept in memory breaks every later request
+            if not tool_results:
                 messages.append({
-                    "role": "user", 
-                    "content": result.content
+                    "role": "assistant",
+                    "content": content or [{"type": "text", "text": "(no answer)"}]
                 })
+                break
 
-                # Get next response from Claude
-                response = self.anthropic.messages.create(
-                    model="claude-3-5-sonnet-20241022",
-                    max_tokens=1000,
-                    messages=messages,
-                )
-
-                final_text.append(response.content[0].text)
+            messages.append({
+                "role": "assistant",
+                "content": content
+            })
+            messages.append({
+                "role": "user",
+                "content": list(tool_results)
+            })
 
+        stats["context"] = {
+            **self.memory.record(messages[len(history):]),
+            "served_locally": store.hits - hits,
+            "recalled": store.recalls - recalls,
+        }
+        stats["total"] = time.perf_counter() - start
         return "\n".join(final_text)
 
+    def _format_query_stats(self) -> str:
+        stats = self.last_query_stats
+        ttft = f"{stats['ttft']:.2f}s" if stats.get("ttft") is not None else "n/a"
+        lines = [f"[time to first token {ttft}, total {stats['total']:.2f}s, {stats['model_calls']} model calls]"]
+        for turn, usage in enumerate(stats["usage"], start=1):
+            lines.append(f"[call {turn}: input tokens {usage['cache_read_input_tokens']} cached, "
+                         f"{usage['cache_creation_input_tokens']} written to cache, "
+                         f"{usage['input_tokens']} uncached; {usage['output_tokens']} output]")
+        context = stats.get("context")
+        if context:
+            lines.append(f"[history ~{context['history_tokens']} tokens in {context['turns']} turns "
+                         f"(~{context['before_compaction']} before compaction, budget {context['budget_tokens']}); "
+                         f"{context['served_locally']} tool calls served locally, {context['recalled']} recalled]")
+        return "\n".join(lines)
+
     async def chat_loop(self):
         """Run an interactive chat loop"""
         print("\nMCP Client Started!")
@@ -114,19 +270,23 @@ class MCPClient:
         
         while True:
             try:
-                query = input("\nQuery: ").strip()
+                # Read input off the event loop so it stays free between queries
+                query = (await asyncio.to_thread(input, "\nQuery: ")).strip()
                 
                 if query.lower() == 'quit':
                     break
                     
-                response = await self.process_query(query)
-                print("\n" + response)
+                # The answer is printed as it streams in
+                await self.process_query(query)
+                print("\n" + self._format_query_stats())
                     
             except Exception as e:
                 print(f"\nError: {str(e)}")
 
     async def cleanup(self):
         """Clean up resources"""
+        if self._notification_task is not None:
+            self._notification_task.cancel()
         await self.exit_stack.aclose()
 
 async def main():
@@ -0,0 +1,235 @@
+# compaction.py
+"""
+Shrinking tool results before they reach the model's context.
+
+List and get tools return raw API JSON, with full prompts, analysis and
+generation results. Every byte of it is paid for in input tokens on each
+later model call. This module lets tools cut that down:
+- fields: keep only the named fields of each item (dotted paths reach into
+  nested objects, e.g. "result.status")
+- max_items: return only the first N items of a list, along with the total
+- summary: keep identifying fields only and truncate long text
+
+Any result still larger than SOCIAL_TOOLKIT_MAX_RESULT_BYTES (default
+32768, 0 disables the limit) is spilled: the full payload is written to a
+file under SOCIAL_TOOLKIT_SPILL_DIR and the model gets a result handle and
+a compact summary instead. The read_result tool pages through it later.
+Spilled files are removed after SOCIAL_TOOLKIT_SPILL_TTL seconds (default 86400),
+by a sweep that runs at most once every SPILL_PRUNE_INTERVAL seconds.
+Spilling encodes and writes the whole result, so callers on an event loop
+should run it in a thread.
+"""
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+
+from codec import dumps_bytes, loads
+
+# Fields that identify an item and tell its state, kept by summary mode
+SUMMARY_FIELDS = (
+    "tenant_id", "brand_id", "source_id", "prompt_id", "worker_id", "generation_id", "version_id",
+    "conversation_id", "name", "status", "source_type", "content_type", "output_type",
+    "created_at", "updated_at", "triggered_at", "completed_at", "progress",
+)
+
+# Characters kept of a long string in summary mode
+SUMMARY_TEXT_LENGTH = 200
+
+# Items shown next to the handle of a spilled list
+SPILL_PREVIEW_ITEMS = 5
+
+# Seconds between sweeps of expired spilled files
+SPILL_PRUNE_INTERVAL = 300
+
+_HANDLE_PATTERN = re.compile(r"^res-[0-9a-f]{32}$")
+
+_prune_lock = threading.Lock()
+_last_prune = None
+
+
+def _max_result_bytes() -> int:
+    return int(os.environ.get("SOCIAL_TOOLKIT_MAX_RESULT_BYTES") or 32768)
+
+
+def fits_result_limit(value) -> bool:
+    limit = _max_result_bytes()
+    return limit <= 0 or len(dumps_bytes(value)) <= limit
+
+
+def _spill_dir() -> str:
+    return os.environ.get("SOCIAL_TOOLKIT_SPILL_DIR") or os.path.join(tempfile.gettempdir(), "social-toolkit-results")
+
+
+def parse_fields(fields) -> list:
+    """Accept a list of field names or a comma-separated string"""
+    if fields is None:
+        return None
+    if isinstance(fields, str):
+        fields = fields.split(",")
+    return [field.strip() for field in fields if field and field.strip()]
+
+
+def _project_item(item, fields: list):
+    if not isinstance(item, dict):
+        return item
+    projected = {}
+    nested = {}
+    for field in fields:
+        head, _, rest = field.partition(".")
+        if head not in item:
+            continue
+        if rest:
+            nested.setdefault(head, []).append(rest)
+        else:
+            projected[head] = item[head]
+    for head, rests in nested.items():
+        if head not in projected:
+            projected[head] = project(item[head], rests)
+    return projected
+
+
+def project(value, fields: list):
+    """Keep only fields of a dict, or of every dict in a list"""
+    if isinstance(value, list):
+        return [_project_item(item, fields) for item in value]
+    return _project_item(value, fields)
+
+
+def _summarize_item(item):
+    """Identifying fields of an item plus the status of its result, if any"""
+    if not isinstance(item, dict):
+        return _summarize(item)
+    summary = {field: item[field] for field in SUMMARY_FIELDS if field in item}
+    if isinstance(item.get("result"), dict) and "status" in item["result"]:
+        summary["result_status"] = item["result"]["status"]
+    return summary or {key: _summarize(value) for key, value in item.items()}
+
+
+def _summarize(value):
+    if isinstance(value, str) and len(value) > SUMMARY_TEXT_LENGTH:
+        return value[:SUMMARY_TEXT_LENGTH] + f"... [{len(value) - SUMMARY_TEXT_LENGTH} more characters]"
+    if isinstance(value, list):
+        return [_summarize_item(item) for item in value]
+    if isinstance(value, dict):
+        if any(field.endswith("_id") for field in value):
+            return _summarize_item(value)
+        # A container such as the brand compass: summarize what it holds
+        return {key: _summarize(item) for key, item in value.items()}
+    return value
+
+
+def status_counts(items: list) -> dict:
+    return dict(Counter(item.get("status") for item in items if isinstance(item, dict) and "status" in item))
+
+
+def _limit(value, max_items: int):
+    if isinstance(value, list) and len(value) > max_items:
+        return {
+            "total": len(value),
+            "returned": max_items,
+            "by_status": status_counts(value),
+            "items": value[:max_items],
+        }
+    if isinstance(value, dict):
+        limited = {}
+        for key, item in value.items():
+            if isinstance(item, list) and len(item) > max_items:
+                limited[key] = item[:max_items]
+                limited[f"{key}_total"] = len(item)
+            else:
+                limited[key] = item
+        return limited
+    return value
+
+
+def compact(value, fields=None, max_items: int = None, summary: bool = False):
+    """
+    Apply fields projection, summary mode and max_items, in that order
+    The input is never modified, so cached responses can be passed in
+    """
+    fields = parse_fields(fields)
+    if fields:
+        value = project(value, fields)
+    if summary:
+        value = _summarize(value)
+    if max_items is not None and max_items >= 0:
+        value = _limit(value, max_items)
+    return value
+
+
+def _prune_due() -> bool:
+    """Whether this spill should sweep the directory; at most one does per SPILL_PRUNE_INTERVAL"""
+    global _last_prune
+    now = time.monotonic()
+    with _prune_lock:
+        if _last_prune is not None and now - _last_prune < SPILL_PRUNE_INTERVAL:
+            return False
+        _last_prune = now
+        return True
+
+
+def _prune_spilled(directory: str) -> None:
+    ttl = float(os.environ.get("SOCIAL_TOOLKIT_SPILL_TTL") or 86400)
+    cutoff = time.time() - ttl
+    for entry in os.scandir(directory):
+        try:
+            if entry.name.startswith("res-") and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except OSError:
+            pass
+
+
+def spill_if_oversized(value, tool_name: str = None):
+    """
+    Return value unchanged if it fits in SOCIAL_TOOLKIT_MAX_RESULT_BYTES, otherwise write
+    it to the spill directory and return a handle with a compact summary
+    """
+    limit = _max_result_bytes()
+    if limit <= 0 or isinstance(value, (str, bytes)) or value is None:
+        return value
+    encoded = dumps_bytes(value)
+    if len(encoded) <= limit:
+        return value
+
+    directory = _spill_dir()
+    os.makedirs(directory, exist_ok=True)
+    if _prune_due():
+        _prune_spilled(directory)
+    handle = f"res-{uuid.uuid4().hex}"
+    # Results hold tenant data, keep them readable by this user only
+    fd = os.open(os.path.join(directory, f"{handle}.json"), os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(encoded)
+
+    spilled = {
+        "status": "spilled",
+        "message": (f"Result of {len(encoded)} bytes is too large to return in full. "
+                    "Use read_result with this handle, fields and max_items to read it in parts."),
+        "result_handle": handle,
+        "bytes": len(encoded),
+    }
+    if tool_name:
+        spilled["tool"] = tool_name
+    if isinstance(value, list):
+        spilled["total"] = len(value)
+        spilled["by_status"] = status_counts(value)
+        spilled["preview"] = _summarize(value[:SPILL_PREVIEW_ITEMS])
+    elif isinstance(value, dict):
+        spilled["keys"] = list(value)
+        spilled["preview"] = _limit(_summarize(value), SPILL_PREVIEW_ITEMS)
+    return spilled
+
+
+def load_spilled(handle: str):
+    """Load the full payload behind a result handle returned by spill_if_oversized"""
+    if not _HANDLE_PATTERN.match(handle or ""):
+        raise ValueError(f"Invalid result handle: {handle}")
+    path = os.path.join(_spill_dir(), f"{handle}.json")
+    if not os.path.exists(path):
+        raise ValueError(f"Result {handle} not found or expired")
+    with open(path, "rb") as f:
+        return loads(f.read())
@@ -0,0 +1,196 @@
+# credentials.py
+"""
+Tenant credentials known to the server, and the tenant/brand context of each client session.
+
+Every tenant tool takes tenant_id and api_key, and most take a brand_id. Left
+to the model, they are repeated in every tool_use, costing input tokens on
+each call and copying the key into every transcript. Instead the server can
+hold the keys itself, and each session can select a tenant and brand once
+with the use_tenant/use_brand tools. Calls that leave those arguments out are
+then filled in from:
+1. the session's context, for calls to its tenant
+2. the bearer token the client connected with (HTTP transports)
+3. the registry below
+
+The registry is read once at startup from:
+- SOCIAL_TOOLKIT_TENANT_ID, SOCIAL_TOOLKIT_API_KEY and SOCIAL_TOOLKIT_BRAND_ID:
+  one tenant, selected by default in every session
+- SOCIAL_TOOLKIT_API_KEYS: more tenants, e.g. "t-abc=sk-...,t-def=sk-..."
+- SOCIAL_TOOLKIT_CREDENTIALS_FILE: a JSON file mapping tenant IDs to an API key,
+  or to {"api_key": ..., "brand_id": ...}
+- SOCIAL_TOOLKIT_ADMIN_TOKEN: admin token for list_tenants
+
+A registry holding exactly one tenant selects it by default too.
+
+Over stdio the only client is the local process that started the server, and
+it may use every key the registry holds. Over the network transports anyone
+who reaches the port can connect, so the registry keys, the admin token and
+the default tenant are only used for sessions that connected with
+`Authorization: Bearer <token>`, token being SOCIAL_TOOLKIT_SERVER_TOKEN
+(unset by default, so never). Other sessions only use the keys they pass
+themselves, to use_tenant or as their bearer token.
+"""
+import hmac
+import json
+import logging
+import os
+import weakref
+
+logger = logging.getLogger("social_toolkit")
+
+
+class TenantCredentials:
+    def __init__(self, tenant_id: str, api_key: str, brand_id: str = None):
+        self.tenant_id = tenant_id
+        self.api_key = api_key
+        # Brand selected by default for this tenant
+        self.brand_id = brand_id
+
+
+def _parse_keys(value: str) -> dict:
+    keys = {}
+    for item in (value or "").split(","):
+        tenant_id, _, api_key = item.partition("=")
+        if tenant_id.strip() and api_key.strip():
+            keys[tenant_id.strip()] = api_key.strip()
+    return keys
+
+
+class CredentialRegistry:
+    """
+    API keys by tenant, loaded from environment variables and an optional credentials file
+    """
+
+    def __init__(self, tenants: dict = None, default_tenant: str = None, admin_token: str = None,
+                 server_token: str = None):
+        self._tenants = {}
+        self.default_tenant = default_tenant
+        self.admin_token = admin_token
+        self.server_token = server_token
+        for tenant_id, entry in (tenants or {}).items():
+            self.add(tenant_id, entry)
+
+    @classmethod
+    def from_env(cls) -> "CredentialRegistry":
+        registry = cls(admin_token=os.environ.get("SOCIAL_TOOLKIT_ADMIN_TOKEN") or None,
+                       server_token=os.environ.get("SOCIAL_TOOLKIT_SERVER_TOKEN") or None)
+        path = os.environ.get("SOCIAL_TOOLKIT_CREDENTIALS_FILE")
+        if path:
+            try:
+                with open(os.path.expanduser(path), "r", encoding="utf-8") as f:
+                    entries = json.load(f)
+                for tenant_id, entry in entries.items():
+                    registry.add(tenant_id, entry)
+            except (OSError, ValueError, AttributeError) as e:
+                logger.error("Could not read credentials file %s: %s", path, e)
+        for tenant_id, api_key in _parse_keys(os.environ.get("SOCIAL_TOOLKIT_API_KEYS")).items():
+            registry.add(tenant_id, api_key)
+        tenant_id = os.environ.get("SOCIAL_TOOLKIT_TENANT_ID")
+        if tenant_id:
+            registry.add(tenant_id, {"api_key": os.environ.get("SOCIAL_TOOLKIT_API_KEY"),
+                                     "brand_id": os.environ.get("SOCIAL_TOOLKIT_BRAND_ID")})
+            registry.default_tenant = tenant_id
+        elif len(registry._tenants) == 1:
+            registry.default_tenant = next(iter(registry._tenants))
+        return registry
+
+    def add(self, tenant_id: str, entry) -> None:
+        """Register a tenant from an API key or a {"api_key", "brand_id"} dict; missing fields keep earlier values"""
+        if isinstance(entry, str):
+            entry = {"api_key": entry}
+        previous = self._tenants.get(tenant_id)
+        self._tenants[tenant_id] = TenantCredentials(
+            tenant_id,
+            entry.get("api_key") or (previous.api_key if previous else None),
+            entry.get("brand_id") or (previous.brand_id if previous else None),
+        )
+
+    def get(self, tenant_id: str) -> TenantCredentials:
+        return self._tenants.get(tenant_id)
+
+    def api_key(self, tenant_id: str) -> str:
+        credentials = self._tenants.get(tenant_id)
+        return credentials.api_key if credentials else None
+
+    def tenant_ids(self) -> list:
+        return sorted(self._tenants)
+
+    def __len__(self) -> int:
+        return len(self._tenants)
+
+
+class SessionContext:
+    """Tenant and brand a client session works with"""
+
+    def __init__(self, tenant_id: str = None, api_key: str = None, brand_id: str = None):
+        self.tenant_id = tenant_id
+        self.api_key = api_key
+        self.brand_id = brand_id
+
+
+class SessionContexts:
+    """
+    Context of each open client session
+    Keyed by the session object, so a context goes away with its session
+    """
+
+    def __init__(self, registry: CredentialRegistry, remote: bool = False):
+        self.registry = registry
+        # Serving a network transport, where clients must authenticate to use the registry
+        self.remote = remote
+        self._contexts = weakref.WeakKeyDictionary()
+
+    def authenticated(self, forwarded: str = None) -> bool:
+        """Whether a session with this bearer token may use the registry's keys and admin token"""
+        if not self.remote:
+            return True
+        token = self.registry.server_token
+        return bool(token and forwarded) and hmac.compare_digest(forwarded.encode(), token.encode())
+
+    def _client_key(self, forwarded: str) -> str:
+        # The server token only unlocks the registry, it is not an API key
+        return None if self.remote and self.authenticated(forwarded) else forwarded
+
+    def get(self, session, forwarded: str = None) -> SessionContext:
+        """The session's context, starting from the registry's default tenant for authenticated sessions"""
+        context = self._contexts.get(session)
+        if context is None:
+            default = None
+            if self.registry.default_tenant and self.authenticated(forwarded):
+                default = self.registry.get(self.registry.default_tenant)
+            # The key itself is looked up per call, so a client's bearer token still takes precedence
+            context = SessionContext(default.tenant_id, None, default.brand_id) if default else SessionContext()
+            self._contexts[session] = context
+        return context
+
+    def default_tenant(self, forwarded: str = None) -> str:
+        return self.registry.default_tenant if self.authenticated(forwarded) else None
+
+    def api_key(self, context: SessionContext, tenant_id: str, forwarded: str = None) -> str:
+        """
+        Key for a call to tenant_id: the one given to use_tenant for that tenant, else the
+        client's bearer token, else the registry's if the session may use it
+        """
+        if context.api_key and tenant_id == context.tenant_id:
+            return context.api_key
+        key = self._client_key(forwarded)
+        if key or not self.authenticated(forwarded):
+            return key
+        return self.registry.api_key(tenant_id)
+
+    def admin_token(self, forwarded: str = None) -> str:
+        """The client's bearer token, else the registry's admin token if the session may use it"""
+        token = self._client_key(forwarded)
+        if token or not self.authenticated(forwarded):
+            return token
+        return self.registry.admin_token
+
+    def brand_id(self, context: SessionContext, tenant_id: str, forwarded: str = None) -> str:
+        """Brand selected for tenant_id: the session's if it works with that tenant, else the registry's"""
+        if tenant_id == context.tenant_id:
+            return context.brand_id
+        credentials = self.registry.get(tenant_id) if self.authenticated(forwarded) else None
+        return credentials.brand_id if credentials else None
+
+    def __len__(self) -> int:
+        return len(self._contexts)
@@ -0,0 +1,210 @@
+# limits.py
+"""
+Client-side concurrency bound per tenant and content type.
+
+Each tenant carries `concurrency_limits` (TEXT/IMAGE/VIDEO/AUDIO) that the
+API enforces server-side. TenantLimiter mirrors them locally so tool calls
+that start backend processing wait for a free slot instead of piling up
+against the API.
+
+A start request returns as soon as the job is queued, so a slot taken only
+for the request would bound start requests, not running jobs. Instead the
+caller acquires a Lease before starting a job and hands it to hold() with
+an awaitable that finishes when the job leaves the pending statuses; the
+slot is given back then, or after SOCIAL_TOOLKIT_JOB_SLOT_TIMEOUT seconds
+(default 3600) if the job is never seen to finish.
+
+Each tenant and content type also has a token bucket holding as many tokens
+as its limit, refilled at limit tokens per SOCIAL_TOOLKIT_RATE_PERIOD
+seconds (default 1, 0 disables the buckets). Every start takes a token
+first, which spreads the starts of a burst over time.
+
+snapshot() reports slots in use (jobs running), calls waiting and tokens
+left per tenant and content type; the time each call waited is recorded in
+metrics.
+"""
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+
+logger = logging.getLogger("social_toolkit")
+
+# System defaults documented for tenants created without concurrency_limits
+DEFAULT_CONCURRENCY_LIMITS = {"TEXT": 10, "IMAGE": 5, "VIDEO": 3, "AUDIO": 3}
+
+
+class TokenBucket:
+    """
+    capacity tokens, refilled continuously at rate tokens per second
+    Takers are served in arrival order: a token may be reserved before it exists,
+    and the taker sleeps until it does
+    """
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def take(self) -> None:
+        self._refill()
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return
+        try:
+            await asyncio.sleep(-self.tokens / self.rate)
+        except asyncio.CancelledError:
+            self.tokens += 1
+            raise
+
+    def available(self) -> float:
+        self._refill()
+        return round(self.tokens, 2)
+
+
+class _Slots:
+    def __init__(self, limit: int, rate_period: float):
+        self.limit = limit
+        self.semaphore = asyncio.Semaphore(limit)
+        self.bucket = TokenBucket(limit, limit / rate_period) if rate_period > 0 else None
+        self.in_use = 0
+        self.waiting = 0
+
+
+class Lease:
+    """One slot of a tenant's limit for a content type; release() gives it back, once"""
+
+    def __init__(self, slots: _Slots):
+        self._slots = slots
+        self.released = False
+
+    def release(self) -> None:
+        if not self.released:
+            self.released = True
+            self._slots.in_use -= 1
+            self._slots.semaphore.release()
+
+
+class TenantLimiter:
+    """
+    Semaphores keyed by (tenant_id, content_type), sized from the tenant's concurrency_limits
+    loader is an async callable (tenant_id, api_key) -> concurrency_limits dict, used
+    the first time a tenant is seen without its limits having been recorded
+    """
+
+    def __init__(self, loader=None, rate_period: float = None, metrics=None, hold_timeout: float = None):
+        if rate_period is None:
+            rate_period = float(os.environ.get("SOCIAL_TOOLKIT_RATE_PERIOD") or 1.0)
+        if hold_timeout is None:
+            hold_timeout = float(os.environ.get("SOCIAL_TOOLKIT_JOB_SLOT_TIMEOUT") or 3600)
+        self._loader = loader
+        self.rate_period = rate_period
+        self.hold_timeout = hold_timeout
+        self.metrics = metrics
+        self._limits = {}
+        self._slots = {}
+        self._load_locks = {}
+        # Tasks holding a slot until their job finishes
+        self._holds = set()
+
+    def set_limits(self, tenant_id: str, concurrency_limits: dict = None) -> None:
+        """
+        Record a tenant's limits, e.g. from a create/get/update tenant response
+        Missing content types fall back to the documented defaults
+        """
+        if not tenant_id:
+            return
+        limits = {**DEFAULT_CONCURRENCY_LIMITS, **(concurrency_limits or {})}
+        if self._limits.get(tenant_id) == limits:
+            return
+        self._limits[tenant_id] = limits
+        # Calls already holding a slot release it on the old semaphore, new calls use the new size
+        for key in [key for key in self._slots if key[0] == tenant_id]:
+            del self._slots[key]
+
+    def get_limits(self, tenant_id: str) -> dict:
+        return self._limits.get(tenant_id)
+
+    async def _ensure_limits(self, tenant_id: str, api_key: str) -> dict:
+        if tenant_id in self._limits:
+            return self._limits[tenant_id]
+        lock = self._load_locks.setdefault(tenant_id, asyncio.Lock())
+        async with lock:
+            if tenant_id not in self._limits:
+                limits = None
+                if self._loader is not None:
+                    try:
+                        limits = await self._loader(tenant_id, api_key)
+                    except Exception:
+                        limits = None
+                self.set_limits(tenant_id, limits)
+        return self._limits[tenant_id]
+
+    async def acquire(self, tenant_id: str, api_key: str, content_type: str = "TEXT") -> Lease:
+        """Wait for a token and one of the tenant's slots for content_type"""
+        limits = await self._ensure_limits(tenant_id, api_key)
+        content_type = (content_type or "TEXT").upper()
+        key = (tenant_id, content_type)
+        slots = self._slots.get(key)
+        if slots is None:
+            limit = max(1, int(limits.get(content_type, DEFAULT_CONCURRENCY_LIMITS["TEXT"])))
+            slots = self._slots[key] = _Slots(limit, self.rate_period)
+        start = time.perf_counter()
+        slots.waiting += 1
+        try:
+            if slots.bucket is not None:
+                await slots.bucket.take()
+            await slots.semaphore.acquire()
+        finally:
+            slots.waiting -= 1
+        if self.metrics is not None:
+            self.metrics.record_wait(content_type, tenant_id, time.perf_counter() - start)
+        slots.in_use += 1
+        return Lease(slots)
+
+    @asynccontextmanager
+    async def slot(self, tenant_id: str, api_key: str, content_type: str = "TEXT"):
+        """Hold one of the tenant's slots for content_type for the duration of the block"""
+        lease = await self.acquire(tenant_id, api_key, content_type)
+        try:
+            yield lease
+        finally:
+            lease.release()
+
+    def hold(self, lease: Lease, until) -> None:
+        """
+        Keep lease until the awaitable until finishes (or fails), at most hold_timeout seconds,
+        without blocking the caller
+        """
+        async def run():
+            try:
+                await asyncio.wait_for(until, self.hold_timeout)
+            except asyncio.TimeoutError:
+                logger.warning("Job not seen to finish after %.0fs, releasing its slot", self.hold_timeout)
+            except Exception as e:
+                logger.warning("Could not follow a job to its end, releasing its slot: %s", e)
+            finally:
+                lease.release()
+
+        task = asyncio.get_running_loop().create_task(run())
+        self._holds.add(task)
+        task.add_done_callback(self._holds.discard)
+
+    def snapshot(self) -> dict:
+        """Per tenant and content type: limit, slots in use, calls waiting and tokens left"""
+        tenants = {}
+        for (tenant_id, content_type), slots in sorted(self._slots.items()):
+            tenants.setdefault(tenant_id, {})[content_type] = {
+                "limit": slots.limit,
+                "in_use": slots.in_use,
+                "waiting": slots.waiting,
+                "tokens": slots.bucket.available() if slots.bucket is not None else None,
+            }
+        return {"rate_period": self.rate_period, "tenants": tenants}
@@ -0,0 +1,53 @@
+# logs.py
+"""
+Logging setup for the MCP server.
+
+On the stdio transport stdout carries the MCP protocol stream, so the server
+must never print there. All server logs go to stderr through the
+"social_toolkit" logger instead.
+
+- SOCIAL_TOOLKIT_LOG_LEVEL: DEBUG, INFO (default), WARNING or ERROR
+- SOCIAL_TOOLKIT_LOG_FORMAT: "json" for one JSON object per line, plain text otherwise
+"""
+import json
+import logging
+import os
+import sys
+
+# Attributes every LogRecord has; anything else was passed through `extra=`
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats each record as a single JSON line, including fields passed through extra="""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging() -> logging.Logger:
+    """Send the server's logs to stderr and return its logger"""
+    logger = logging.getLogger("social_toolkit")
+    if not logger.handlers:
+        handler = logging.StreamHandler(sys.stderr)
+        if os.environ.get("SOCIAL_TOOLKIT_LOG_FORMAT", "").lower() == "json":
+            handler.setFormatter(JsonFormatter())
+        else:
+            handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        logger.addHandler(handler)
+        logger.propagate = False
+    logger.setLevel(os.environ.get("SOCIAL_TOOLKIT_LOG_LEVEL", "INFO").upper())
+    # httpx logs every request at INFO; request metrics cover that
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    return logger
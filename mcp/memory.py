@@ -0,0 +1,280 @@
+# memory.py
+"""
+Bounded multi-turn memory for MCPClient.
+
+Each query used to start from an empty message list, so a follow-up question
+fetched everything again. Keeping the raw history instead would send every
+earlier tool result (a list_sources result can be tens of KB) with every
+later model call, growing without limit. ConversationMemory keeps the
+history within a token budget:
+- the last recent_turns turns are kept verbatim
+- once the history is over budget, tool results of older turns are replaced
+  by a reference and a short summary; the full result stays in a local
+  ToolResultStore, and the model can read it again with the client-side
+  recall_result tool without calling the server
+- if that is not enough, the oldest turns are collapsed to the question and
+  the final answer, and then dropped
+
+Compaction happens only when the budget is exceeded, and then goes down to a
+lower mark, so the history prefix stays byte-identical (and cacheable)
+between compactions.
+
+The store also re-serves results of read tools (get_*, list_*) called again
+with the same arguments within result_ttl seconds. Any other tool call may
+change what they return, so it clears them, and results of jobs that are
+still pending are not re-served at all. Once the stored results add up to
+more than max_bytes, the least recently used ones are evicted; a compacted
+result that was evicted can no longer be recalled.
+
+Token counts are estimated at 4 characters per token.
+
+Configured with:
+- SOCIAL_TOOLKIT_CLIENT_CONTEXT_TOKENS: history budget in tokens (default 24000)
+- SOCIAL_TOOLKIT_CLIENT_RECENT_TURNS: turns always kept verbatim (default 2)
+- SOCIAL_TOOLKIT_CLIENT_RESULT_TTL: seconds a read tool result is re-served (default 300, 0 disables)
+- SOCIAL_TOOLKIT_CLIENT_RESULT_STORE_BYTES: characters of tool results kept for recall (default 8388608)
+"""
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+
+from compaction import compact
+from waiters import PENDING_STATUSES
+
+# Prefixes of tools that only read, whose results can be re-served
+READ_TOOL_PREFIXES = ("get_", "list_")
+
+# Results mentioning these are about to change and are not re-served
+PENDING_MARKERS = tuple(f'"{status}"' for status in sorted(PENDING_STATUSES))
+
+RECALL_TOOL = {
+    "name": "recall_result",
+    "description": "Read again, in full, an earlier tool result that was replaced by a reference "
+                   "(ref-...) to save context. Served from the client's local store without calling "
+                   "the server; it shows the result as it was when first fetched.",
+    "input_schema": {
+        "type": "object",
+        "properties": {"ref": {"type": "string", "description": "Reference given in place of the result"}},
+        "required": ["ref"],
+    },
+}
+
+# Characters of the summary left in place of a compacted tool result
+REFERENCE_PREVIEW_CHARS = 600
+
+# Characters of the final answer kept when a turn is collapsed
+COLLAPSED_ANSWER_CHARS = 1000
+
+# Compaction goes down to this share of the budget
+LOW_WATER = 0.6
+
+
+def estimate_tokens(value) -> int:
+    return len(json.dumps(value, default=str)) // 4
+
+
+def _block_text(content) -> str:
+    if isinstance(content, str):
+        return content
+    return "\n".join(block.get("text", "") for block in content if isinstance(block, dict))
+
+
+def _summary(name: str, content) -> str:
+    """Short description of a tool result: counts and identifying fields, cut to REFERENCE_PREVIEW_CHARS"""
+    texts = [content] if isinstance(content, str) else [block.get("text", "") for block in content
+                                                         if isinstance(block, dict)]
+    try:
+        values = [json.loads(text) for text in texts]
+        # List tools return one content block per item
+        value = values[0] if len(values) == 1 else values
+        preview = json.dumps(compact(value, summary=True, max_items=3), separators=(",", ":"))
+    except ValueError:
+        preview = " ".join(texts)
+    if len(preview) > REFERENCE_PREVIEW_CHARS:
+        preview = preview[:REFERENCE_PREVIEW_CHARS] + "..."
+    return preview
+
+
+class StoredResult:
+    def __init__(self, ref: str, name: str, arguments: dict, content, is_error: bool):
+        self.ref = ref
+        self.name = name
+        self.arguments = arguments
+        self.content = content
+        self.is_error = is_error
+        self.fetched = time.monotonic()
+        self.size = len(_block_text(content))
+
+
+class ToolResultStore:
+    """
+    Every tool result of the session by reference, and the reusable ones by tool and arguments
+    """
+
+    def __init__(self, result_ttl: float = None, max_bytes: int = None):
+        if result_ttl is None:
+            result_ttl = float(os.environ.get("SOCIAL_TOOLKIT_CLIENT_RESULT_TTL") or 300)
+        if max_bytes is None:
+            max_bytes = int(os.environ.get("SOCIAL_TOOLKIT_CLIENT_RESULT_STORE_BYTES") or 8 * 1024 * 1024)
+        self.result_ttl = result_ttl
+        self.max_bytes = max_bytes
+        # By ref, least recently used first
+        self._results = OrderedDict()
+        self._by_tool_use = {}
+        self._fresh = {}
+        self.size = 0
+        self.hits = 0
+        self.recalls = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(name: str, arguments: dict) -> str:
+        return json.dumps([name, arguments], sort_keys=True, default=str)
+
+    @staticmethod
+    def is_read(name: str) -> bool:
+        return name.startswith(READ_TOOL_PREFIXES)
+
+    def put(self, tool_use_id: str, name: str, arguments: dict, content, is_error: bool) -> str:
+        """Keep a result the server returned; a write clears every reusable result"""
+        ref = f"ref-{uuid.uuid4().hex[:12]}"
+        result = self._results[ref] = StoredResult(ref, name, arguments, content, is_error)
+        self.size += result.size
+        self._by_tool_use[tool_use_id] = ref
+        if not self.is_read(name):
+            self._fresh.clear()
+        elif self.result_ttl > 0 and not is_error:
+            text = _block_text(content)
+            if '"status":"error"' not in text and not any(marker in text for marker in PENDING_MARKERS):
+                self._fresh[self._key(name, arguments)] = result
+        self._evict()
+        return ref
+
+    def _evict(self) -> None:
+        """Drop least recently used results until the store fits max_bytes, always keeping the newest"""
+        evicted = set()
+        while self.size > self.max_bytes and len(self._results) > 1:
+            ref, result = self._results.popitem(last=False)
+            self.size -= result.size
+            evicted.add(ref)
+        if not evicted:
+            return
+        self.evictions += len(evicted)
+        self._by_tool_use = {tool_use_id: ref for tool_use_id, ref in self._by_tool_use.items() if ref not in evicted}
+        self._fresh = {key: result for key, result in self._fresh.items() if result.ref not in evicted}
+
+    def lookup(self, tool_use_id: str, name: str, arguments: dict) -> StoredResult:
+        """A result of the same read call still within result_ttl, or None"""
+        if not self.is_read(name):
+            return None
+        result = self._fresh.get(self._key(name, arguments))
+        if result is None or time.monotonic() - result.fetched > self.result_ttl:
+            return None
+        self._results.move_to_end(result.ref)
+        self.hits += 1
+        self._by_tool_use[tool_use_id] = result.ref
+        return result
+
+    def get(self, ref: str) -> StoredResult:
+        return self._results.get(ref)
+
+    def recall(self, tool_use_id: str, ref: str) -> StoredResult:
+        result = self._results.get(ref)
+        if result is not None:
+            self._results.move_to_end(ref)
+            self.recalls += 1
+            self._by_tool_use[tool_use_id] = ref
+        return result
+
+    def ref_for(self, tool_use_id: str) -> str:
+        return self._by_tool_use.get(tool_use_id)
+
+
+class ConversationMemory:
+    """
+    Messages of earlier turns, kept under a token budget
+    A turn is the user's query and every message up to and including the final answer
+    """
+
+    def __init__(self, budget_tokens: int = None, recent_turns: int = None, store: ToolResultStore = None):
+        if budget_tokens is None:
+            budget_tokens = int(os.environ.get("SOCIAL_TOOLKIT_CLIENT_CONTEXT_TOKENS") or 24000)
+        if recent_turns is None:
+            recent_turns = int(os.environ.get("SOCIAL_TOOLKIT_CLIENT_RECENT_TURNS") or 2)
+        self.budget_tokens = budget_tokens
+        self.recent_turns = recent_turns
+        self.store = store or ToolResultStore()
+        self.turns = []
+        # tool_use IDs whose results were replaced by a reference
+        self._compacted = set()
+        # Turns collapsed or dropped so far, and tool results replaced by references
+        self.compacted_results = 0
+        self.collapsed_turns = 0
+        self.dropped_turns = 0
+
+    def messages(self) -> list:
+        """History to send before the next query"""
+        return [message for turn in self.turns for message in turn]
+
+    def tokens(self) -> int:
+        return estimate_tokens(self.messages())
+
+    def record(self, turn: list) -> dict:
+        """Add a finished turn, compacting older ones if the history went over budget"""
+        self.turns.append(turn)
+        before = self.tokens()
+        if before > self.budget_tokens:
+            self._compact(int(self.budget_tokens * LOW_WATER))
+        return {"history_tokens": self.tokens(), "before_compaction": before, "turns": len(self.turns),
+                "budget_tokens": self.budget_tokens}
+
+    def _compact(self, target: int) -> None:
+        old = max(0, len(self.turns) - self.recent_turns)
+        for index in range(old):
+            self.turns[index] = [self._compact_message(message) for message in self.turns[index]]
+        if self.tokens() <= target:
+            return
+        for index in range(old):
+            if self.tokens() <= target:
+                return
+            if len(self.turns[index]) > 2:
+                self.turns[index] = self._collapse(self.turns[index])
+                self.collapsed_turns += 1
+        while old and self.tokens() > target:
+            self.turns.pop(0)
+            self.dropped_turns += 1
+            old -= 1
+
+    def _compact_message(self, message: dict) -> dict:
+        if message["role"] != "user" or isinstance(message["content"], str):
+            return message
+        content = []
+        for block in message["content"]:
+            if block.get("type") == "tool_result" and block["tool_use_id"] not in self._compacted:
+                block = self._reference(block)
+            content.append(block)
+        return {**message, "content": content}
+
+    def _reference(self, block: dict) -> dict:
+        ref = self.store.ref_for(block["tool_use_id"])
+        result = self.store.get(ref) if ref else None
+        if result is None or result.size <= REFERENCE_PREVIEW_CHARS:
+            return block
+        self._compacted.add(block["tool_use_id"])
+        self.compacted_results += 1
+        text = (f"[{result.name} result of {result.size} characters, kept locally as {ref}; "
+                f"call recall_result with this ref to read it in full. Summary: {_summary(result.name, result.content)}]")
+        return {"type": "tool_result", "tool_use_id": block["tool_use_id"], "content": text,
+                "is_error": block.get("is_error", False)}
+
+    @staticmethod
+    def _collapse(turn: list) -> list:
+        """The turn's question and final answer only"""
+        question, answer = turn[0], turn[-1]
+        text = _block_text(answer["content"]) or "(no text answer)"
+        if len(text) > COLLAPSED_ANSWER_CHARS:
+            text = text[:COLLAPSED_ANSWER_CHARS] + "..."
+        return [question, {"role": "assistant", "content": [{"type": "text", "text": text}]}]
+
@@ -0,0 +1,307 @@
+# metrics.py
+"""
+Built-in latency and error metrics for the MCP server.
+
+Records, per tool and per upstream API route:
+- call counts and errors
+- latency histograms with p50/p95/p99 estimates
+- bytes sent and received, HTTP status breakdown, retries and coalesced
+  requests (upstream only)
+
+plus the current and peak resident memory of the server process, and the
+time calls waited in each admission queue (scheduler lanes and tenant
+content-type slots) per tenant.
+
+Snapshots are exposed through the server_metrics tool. They can also be
+exported in Prometheus text format, either written to a file at a fixed
+interval or served on a local port:
+- SOCIAL_TOOLKIT_METRICS_FILE: path rewritten every SOCIAL_TOOLKIT_METRICS_INTERVAL seconds (default 15)
+- SOCIAL_TOOLKIT_METRICS_PORT: serve http://127.0.0.1:<port>/metrics
+"""
+import logging
+import os
+import sys
+import threading
+import time
+
+# Upper bounds of the latency buckets, in milliseconds
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+# Path segments that are followed by an ID, used to turn paths into low-cardinality routes
+_COLLECTIONS = {"tenant", "brand", "source", "prompt", "worker", "generation", "version", "conversation"}
+
+logger = logging.getLogger("social_toolkit")
+
+
+def route_template(path: str) -> str:
+    """/tenant/t-1/brand/b-2/compass -> /tenant/{id}/brand/{id}/compass"""
+    segments = path.split("?", 1)[0].strip("/").split("/")
+    route = []
+    for index, segment in enumerate(segments):
+        if index > 0 and segments[index - 1] in _COLLECTIONS and segment not in _COLLECTIONS:
+            segment = "{id}"
+        route.append(segment)
+    return "/" + "/".join(route)
+
+
+def process_memory() -> dict:
+    """Current (Linux only) and peak resident memory of this process, in MB"""
+    memory = {"rss_mb": None, "peak_rss_mb": None}
+    try:
+        with open("/proc/self/statm") as f:
+            memory["rss_mb"] = round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20, 1)
+    except (OSError, ValueError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return memory
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    memory["peak_rss_mb"] = round(peak / (2**20 if sys.platform == "darwin" else 2**10), 1)
+    return memory
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram; quantiles are estimated by interpolating inside the matching bucket
+    and capped at the largest value observed
+    """
+
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                return
+        self.counts[-1] += 1
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[index - 1] if index > 0 else 0
+                upper = self.buckets[index] if index < len(self.buckets) else self.buckets[-1]
+                return round(min(lower + (upper - lower) * (rank - seen) / count, self.max), 2)
+            seen += count
+        return round(self.max, 2)
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.sum / self.count, 2) if self.count else None,
+            "p50_ms": self.quantile(0.50),
+            "p95_ms": self.quantile(0.95),
+            "p99_ms": self.quantile(0.99),
+            "max_ms": round(self.max, 2) if self.count else None,
+        }
+
+
+class _Stats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.latency = Histogram()
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.statuses = {}
+        self.retries = 0
+        self.coalesced = 0
+
+
+class Metrics:
+    """
+    Thread-safe registry of tool and upstream request metrics
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tools = {}
+        self._upstream = {}
+        self._waits = {}
+        # Callables returning [(labels, value)] for gauges read at export time, by metric name
+        self.gauges = {}
+        self.started_at = time.time()
+
+    def record_tool(self, name: str, seconds: float, error: bool = False) -> None:
+        with self._lock:
+            stats = self._tools.setdefault(name, _Stats())
+            stats.calls += 1
+            stats.errors += int(error)
+            stats.latency.observe(seconds * 1000)
+
+    def record_upstream(self, method: str, path: str, seconds: float, status=None,
+                        bytes_sent: int = 0, bytes_received: int = 0) -> None:
+        """status is the HTTP status code, or None when the request failed without a response"""
+        key = f"{method} {route_template(path)}"
+        with self._lock:
+            stats = self._upstream.setdefault(key, _Stats())
+            stats.calls += 1
+            stats.errors += int(status is None or status >= 400)
+            stats.latency.observe(seconds * 1000)
+            stats.bytes_sent += bytes_sent
+            stats.bytes_received += bytes_received
+            status_key = str(status) if status is not None else "error"
+            stats.statuses[status_key] = stats.statuses.get(status_key, 0) + 1
+
+    def record_retry(self, method: str, path: str) -> None:
+        key = f"{method} {route_template(path)}"
+        with self._lock:
+            self._upstream.setdefault(key, _Stats()).retries += 1
+
+    def record_coalesced(self, method: str, path: str) -> None:
+        """Count a request answered by an identical one already in flight, without going upstream"""
+        key = f"{method} {route_template(path)}"
+        with self._lock:
+            self._upstream.setdefault(key, _Stats()).coalesced += 1
+
+    def record_wait(self, queue: str, tenant_id: str, seconds: float) -> None:
+        """Time a call spent waiting for admission in queue (a scheduler lane or a content type)"""
+        with self._lock:
+            self._waits.setdefault((queue, tenant_id), Histogram()).observe(seconds * 1000)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "uptime_seconds": round(time.time() - self.started_at, 1),
+                "process": process_memory(),
+                "tools": {
+                    name: {"calls": stats.calls, "errors": stats.errors, "latency": stats.latency.snapshot()}
+                    for name, stats in sorted(self._tools.items())
+                },
+                "upstream": {
+                    route: {
+                        "calls": stats.calls,
+                        "errors": stats.errors,
+                        "retries": stats.retries,
+                        "coalesced": stats.coalesced,
+                        "bytes_sent": stats.bytes_sent,
+                        "bytes_received": stats.bytes_received,
+                        "statuses": dict(sorted(stats.statuses.items())),
+                        "latency": stats.latency.snapshot(),
+                    }
+                    for route, stats in sorted(self._upstream.items())
+                },
+                "queue_wait": self._wait_snapshot(),
+            }
+
+    def _wait_snapshot(self) -> dict:
+        waits = {}
+        for (queue, tenant_id), hist in sorted(self._waits.items()):
+            waits.setdefault(queue, {})[tenant_id or "-"] = hist.snapshot()
+        return waits
+
+    def prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = []
+
+        def family(name: str, kind: str, samples: list):
+            # Every sample of a metric family has to follow its TYPE line as one group
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{{{labels}}} {value}")
+
+        def histogram(name: str, series: list):
+            lines.append(f"# TYPE {name} histogram")
+            for labels, hist in series:
+                cumulative = 0
+                for bound, count in zip(hist.buckets, hist.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{labels},le="{bound / 1000}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {hist.count}')
+                lines.append(f"{name}_sum{{{labels}}} {hist.sum / 1000}")
+                lines.append(f"{name}_count{{{labels}}} {hist.count}")
+
+        memory = process_memory()
+        for name, value in (("resident", memory["rss_mb"]), ("peak_resident", memory["peak_rss_mb"])):
+            if value is not None:
+                lines.append(f"# TYPE social_toolkit_process_{name}_memory_bytes gauge")
+                lines.append(f"social_toolkit_process_{name}_memory_bytes {int(value * 2**20)}")
+
+        with self._lock:
+            tools = [(f'tool="{name}"', stats) for name, stats in sorted(self._tools.items())]
+            family("social_toolkit_tool_calls_total", "counter", [(labels, stats.calls) for labels, stats in tools])
+            family("social_toolkit_tool_errors_total", "counter", [(labels, stats.errors) for labels, stats in tools])
+            histogram("social_toolkit_tool_duration_seconds", [(labels, stats.latency) for labels, stats in tools])
+
+            upstream = []
+            for route, stats in sorted(self._upstream.items()):
+                method, path = route.split(" ", 1)
+                upstream.append((f'method="{method}",route="{path}"', stats))
+            family("social_toolkit_upstream_requests_total", "counter", [
+                (f'{labels},status="{status}"', count)
+                for labels, stats in upstream for status, count in sorted(stats.statuses.items())
+            ])
+            family("social_toolkit_upstream_retries_total", "counter",
+                   [(labels, stats.retries) for labels, stats in upstream])
+            family("social_toolkit_upstream_coalesced_total", "counter",
+                   [(labels, stats.coalesced) for labels, stats in upstream])
+            family("social_toolkit_upstream_sent_bytes_total", "counter",
+                   [(labels, stats.bytes_sent) for labels, stats in upstream])
+            family("social_toolkit_upstream_received_bytes_total", "counter",
+                   [(labels, stats.bytes_received) for labels, stats in upstream])
+            histogram("social_toolkit_upstream_duration_seconds", [(labels, stats.latency) for labels, stats in upstream])
+            histogram("social_toolkit_queue_wait_seconds", [
+                (f'queue="{queue}",tenant="{tenant_id}"', hist) for (queue, tenant_id), hist in sorted(self._waits.items())
+            ])
+        for name, samples in sorted(self.gauges.items()):
+            family(name, "gauge", samples())
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str) -> None:
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.prometheus())
+        os.replace(tmp_path, path)
+
+    def _write_loop(self, path: str, interval: float, stop: threading.Event) -> None:
+        """Rewrite path every interval seconds until stop is set; a failed write is logged and retried"""
+        while not stop.wait(interval):
+            try:
+                self.write_prometheus(path)
+            except Exception:
+                # e.g. a full disk or a removed directory; the next interval may succeed
+                logger.exception("Failed to write metrics to %s", path)
+
+    def start_exporters(self) -> None:
+        """Start the file and/or port Prometheus exporters configured through the environment"""
+        file_path = os.environ.get("SOCIAL_TOOLKIT_METRICS_FILE")
+        if file_path:
+            interval = float(os.environ.get("SOCIAL_TOOLKIT_METRICS_INTERVAL") or 15)
+            threading.Thread(target=self._write_loop, args=(file_path, interval, threading.Event()),
+                             daemon=True).start()
+
+        port = os.environ.get("SOCIAL_TOOLKIT_METRICS_PORT")
+        if port:
+            # Only needed for the port exporter, so not imported at startup
+            from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+            metrics = self
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    found = self.path == "/metrics"
+                    body = metrics.prometheus().encode() if found else b"Not Found\n"
+                    self.send_response(200 if found else 404)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, format, *args):
+                    pass
+
+            httpd = ThreadingHTTPServer(("127.0.0.1", int(port)), Handler)
+            threading.Thread(target=httpd.serve_forever, daemon=True).start()
@@ -0,0 +1,163 @@
+# pagination.py
+"""
+Cursor-based iteration over large API collections.
+
+list_sources and list_generations return whole collections, which for busy
+workers means tens of thousands of items in one response. iter_items walks a
+collection lazily, one API page at a time, and yields each matching item
+together with the position right after it. A page tool stops after N items
+and turns that position into an opaque continuation token. A batch tool
+keeps iterating and never holds more than one API page.
+
+API pages are requested with `limit` and `cursor` query parameters. A body
+of the form {"items": [...], "next_cursor": ...} is followed page by page.
+A plain list is taken as the whole collection and paged through locally.
+"""
+import base64
+import json
+from datetime import datetime, timezone
+
+# Items requested from the API per page
+API_PAGE_SIZE = 100
+
+# Keys under which a paginated API response may carry its items and next cursor
+_ITEM_KEYS = ("items", "data", "results")
+_CURSOR_KEYS = ("next_cursor", "cursor", "last_evaluated_key", "next")
+
+
+def _parse_time(value) -> datetime:
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _item_time(item: dict) -> datetime:
+    """created_at of an API item, or None if it is missing or not a timestamp"""
+    try:
+        return _parse_time(item.get("created_at"))
+    except ValueError:
+        return None
+
+
+def make_filters(status=None, created_after: str = None, created_before: str = None, **extra) -> dict:
+    """
+    Normalise filter arguments; status may be a single status, a list or a comma-separated string
+    Raises ValueError for unparseable timestamps, so bad input fails before any request is made
+    """
+    if isinstance(status, str):
+        status = status.split(",")
+    filters = {key: value for key, value in extra.items() if value}
+    if status:
+        filters["status"] = sorted(s.strip().upper() for s in status if s.strip())
+    for key, value in (("created_after", created_after), ("created_before", created_before)):
+        if value:
+            filters[key] = _parse_time(value).isoformat()
+    return filters
+
+
+def matches(item, filters: dict) -> bool:
+    if not isinstance(item, dict):
+        return True
+    for key, value in filters.items():
+        if key == "status":
+            if item.get("status") not in value:
+                return False
+        elif key in ("created_after", "created_before"):
+            # An item without a readable timestamp can't be shown to fall inside the range
+            created = _item_time(item)
+            if created is None:
+                return False
+            if key == "created_after" and created < _parse_time(value):
+                return False
+            if key == "created_before" and created >= _parse_time(value):
+                return False
+        elif item.get(key) != value:
+            return False
+    return True
+
+
+def _split_page(body) -> tuple:
+    """(items, next API cursor) of one API response"""
+    if isinstance(body, list):
+        return body, None
+    if isinstance(body, dict):
+        for key in _ITEM_KEYS:
+            if isinstance(body.get(key), list):
+                return body[key], next((body[k] for k in _CURSOR_KEYS if body.get(k)), None)
+    raise ValueError("Unexpected list response from the API")
+
+
+def _api_params(filters: dict, api_filters: tuple) -> dict:
+    """Filters the API can apply itself; they are still re-checked locally"""
+    params = {}
+    for key in api_filters:
+        value = filters.get(key)
+        if key == "status" and value and len(value) == 1:
+            params[key] = value[0]
+        elif key != "status" and value:
+            params[key] = value
+    return params
+
+
+async def iter_items(fetch, filters: dict = None, position: dict = None, api_filters: tuple = (),
+                     api_page_size: int = API_PAGE_SIZE):
+    """
+    Yield (item, position) for every item matching filters
+    fetch is an async callable taking query params and returning one decoded API response.
+    api_filters names the filters also sent to the API as query params.
+    position is where to resume, as yielded with an earlier item: {"api_cursor", "index"}
+    """
+    filters = filters or {}
+    api_cursor = (position or {}).get("api_cursor")
+    index = (position or {}).get("index", 0)
+    while True:
+        params = {**_api_params(filters, api_filters), "limit": api_page_size}
+        if api_cursor:
+            params["cursor"] = api_cursor
+        items, next_api_cursor = _split_page(await fetch(params))
+        for offset in range(index, len(items)):
+            if matches(items[offset], filters):
+                yield items[offset], {"api_cursor": api_cursor, "index": offset + 1}
+        if not next_api_cursor or not items:
+            return
+        api_cursor, index = next_api_cursor, 0
+
+
+def encode_cursor(filters: dict, position: dict) -> str:
+    state = json.dumps({"f": filters, "p": position}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(state.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """(filters, position) stored in a continuation token"""
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return state["f"], state["p"]
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor, start again without one") from None
+
+
+async def read_page(fetch, filters: dict, page_size: int, cursor: str = None, api_filters: tuple = ()) -> dict:
+    """
+    Collect one page of page_size matching items
+    With a cursor, filters stored in it are used and the filters argument is ignored.
+    next_cursor is None once the collection is exhausted
+    """
+    position = None
+    if cursor:
+        filters, position = decode_cursor(cursor)
+    items = []
+    next_cursor = None
+    iterator = iter_items(fetch, filters, position, api_filters)
+    try:
+        async for item, item_position in iterator:
+            if len(items) == page_size:
+                # One item past the page proves there is more; resume right before it
+                next_cursor = encode_cursor(filters, position)
+                break
+            items.append(item)
+            position = item_position
+    finally:
+        await iterator.aclose()
+    return {"items": items, "returned": len(items), "next_cursor": next_cursor, "filters": filters}
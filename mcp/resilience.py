@@ -0,0 +1,156 @@
+# resilience.py
+"""
+Retry and circuit-breaking policy for upstream API requests.
+
+ApiClient retries requests that failed for transient reasons: 429, 502, 503
+and 504 responses, plus connection errors and timeouts. Delays grow
+exponentially with full jitter, and a Retry-After header sent by the API
+takes precedence. GET, PUT and DELETE are retried automatically. POST is
+retried only when the caller opts in, and then an Idempotency-Key header is
+sent so the API can deduplicate a request that reached it more than once.
+
+A per-host circuit breaker stops sending requests to a host after several
+consecutive failures. Calls fail fast with CircuitOpenError until
+reset_timeout has passed, then a single trial request decides whether the
+circuit closes again.
+
+Tuning is done through environment variables:
+- SOCIAL_TOOLKIT_MAX_RETRIES: retries after the first attempt (default: 3, 0 disables retries)
+- SOCIAL_TOOLKIT_RETRY_BASE_DELAY: seconds before the first retry (default: 0.5)
+- SOCIAL_TOOLKIT_RETRY_MAX_DELAY: cap on any single delay, Retry-After included (default: 30)
+- SOCIAL_TOOLKIT_BREAKER_THRESHOLD: consecutive failures that open the circuit (default: 5, 0 disables it)
+- SOCIAL_TOOLKIT_BREAKER_RESET: seconds the circuit stays open (default: 30)
+"""
+import email.utils
+import os
+import random
+import threading
+import time
+
+import httpx
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+# Statuses worth retrying; other 5xx are more likely bugs than transient faults
+RETRY_STATUSES = {429, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request while the circuit for its host is open"""
+
+    def __init__(self, host: str, retry_in: float):
+        super().__init__(f"Circuit open for {host} after repeated failures, retry in {retry_in:.0f}s")
+        self.host = host
+        self.retry_in = retry_in
+
+
+def retry_after_seconds(response: httpx.Response) -> float:
+    """Seconds requested by a Retry-After header (delta-seconds or HTTP date), or None"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(when.timestamp() - time.time(), 0.0)
+
+
+def is_retryable_error(error: Exception) -> bool:
+    return isinstance(error, (httpx.TransportError, httpx.TimeoutException))
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter, bounded by max_retries and max_delay
+    """
+
+    def __init__(self, max_retries: int = None, base_delay: float = None, max_delay: float = None):
+        if max_retries is None:
+            max_retries = int(os.environ.get("SOCIAL_TOOLKIT_MAX_RETRIES") or 3)
+        self.max_retries = max_retries
+        self.base_delay = base_delay or float(os.environ.get("SOCIAL_TOOLKIT_RETRY_BASE_DELAY") or 0.5)
+        self.max_delay = max_delay or float(os.environ.get("SOCIAL_TOOLKIT_RETRY_MAX_DELAY") or 30)
+
+    def delay(self, attempt: int, response: httpx.Response = None) -> float:
+        """Seconds to wait before retry number attempt (1-based)"""
+        if response is not None:
+            retry_after = retry_after_seconds(response)
+            if retry_after is not None:
+                return min(retry_after, self.max_delay)
+        return random.uniform(0, min(self.base_delay * 2 ** (attempt - 1), self.max_delay))
+
+
+class _Circuit:
+    def __init__(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_started_at = None
+
+
+class CircuitBreaker:
+    """
+    Per-host circuit breaker counting consecutive failures
+    Only outages count as failures (connection errors, timeouts, 5xx); 429 is throttling, not an outage
+    """
+
+    def __init__(self, threshold: int = None, reset_timeout: float = None):
+        if threshold is None:
+            threshold = int(os.environ.get("SOCIAL_TOOLKIT_BREAKER_THRESHOLD") or 5)
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout or float(os.environ.get("SOCIAL_TOOLKIT_BREAKER_RESET") or 30)
+        self._circuits = {}
+        self._lock = threading.Lock()
+
+    def before_request(self, host: str) -> None:
+        """Raise CircuitOpenError if requests to host should not be sent right now"""
+        if self.threshold <= 0:
+            return
+        with self._lock:
+            circuit = self._circuits.get(host)
+            if circuit is None or circuit.opened_at is None:
+                return
+            now = time.monotonic()
+            retry_in = circuit.opened_at + self.reset_timeout - now
+            # A trial that never reported back (e.g. cancelled) is given up on after reset_timeout
+            trial_running = circuit.trial_started_at is not None and now - circuit.trial_started_at < self.reset_timeout
+            if retry_in > 0 or trial_running:
+                raise CircuitOpenError(host, max(retry_in, 0))
+            # Half-open: let this one request through as a trial
+            circuit.trial_started_at = now
+
+    def record(self, host: str, failed: bool) -> None:
+        if self.threshold <= 0:
+            return
+        with self._lock:
+            circuit = self._circuits.setdefault(host, _Circuit())
+            circuit.trial_started_at = None
+            if not failed:
+                circuit.failures = 0
+                circuit.opened_at = None
+                return
+            circuit.failures += 1
+            if circuit.failures >= self.threshold:
+                circuit.opened_at = time.monotonic()
+
+    def abandon(self, host: str) -> None:
+        """End a request that says nothing about the host's health (a local error) without counting it"""
+        if self.threshold <= 0:
+            return
+        with self._lock:
+            circuit = self._circuits.get(host)
+            if circuit is not None:
+                circuit.trial_started_at = None
+
+    def state(self, host: str) -> str:
+        with self._lock:
+            circuit = self._circuits.get(host)
+            if circuit is None or circuit.opened_at is None:
+                return "closed"
+            if time.monotonic() - circuit.opened_at < self.reset_timeout:
+                return "open"
+            return "half_open"
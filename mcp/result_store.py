@@ -0,0 +1,213 @@
+# result_store.py
+"""
+Persistent on-disk store of API responses that outlive the process.
+
+The in-process ResponseCache starts empty on every restart, and get_generation
+bypasses it altogether. A completed generation version never changes, a
+finished generation only when feedback adds a version, and a finished brand
+compass only when it is triggered again, yet all were downloaded again on
+every read. This store keeps them in SQLite:
+- immutable entries (COMPLETED generation versions, keyed by their
+  /version/{version_id} path) are served with no request at all
+- other entries are served until their max age, then revalidated
+- entries saved with an ETag or Last-Modified header are revalidated with
+  If-None-Match / If-Modified-Since, so an unchanged resource costs a 304
+  and no body
+
+Entries are keyed by (api_key hash, path, params), like the response cache,
+and write tools drop them through ResponseCache.invalidate. Once the bodies
+add up to more than the size limit, least recently used entries are evicted.
+
+Configured with:
+- SOCIAL_TOOLKIT_STORE_PATH: database file (default ~/.cache/social-toolkit/results.sqlite3)
+- SOCIAL_TOOLKIT_STORE_MAX_BYTES: size limit of the stored bodies (default 268435456, 0 disables the store)
+- SOCIAL_TOOLKIT_STORE_MAX_AGE: seconds a finished generation or compass is served without revalidation (default 3600)
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from cache import _key_hash
+from codec import loads
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    tenant_id TEXT,
+    path TEXT NOT NULL,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    expires REAL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_path ON entries (tenant_id, path);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+"""
+
+# Bumped when stored entries must be dropped; 1: generations were kept for good under their latest-version path
+_SCHEMA_VERSION = 1
+
+
+def _default_path() -> str:
+    return os.path.join(os.path.expanduser("~"), ".cache", "social-toolkit", "results.sqlite3")
+
+
+class StoredEntry:
+    def __init__(self, body: bytes, etag: str, last_modified: str, expires: float):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        # Wall-clock time after which the entry must be revalidated, None if it never changes
+        self.expires = expires
+
+    @property
+    def fresh(self) -> bool:
+        return self.expires is None or self.expires > time.time()
+
+    @property
+    def value(self):
+        return loads(self.body)
+
+    def conditional_headers(self) -> dict:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ResultStore:
+    """
+    SQLite-backed response store, safe to share between threads and between server processes
+    Methods block on disk I/O; call them through asyncio.to_thread from the event loop
+    """
+
+    def __init__(self, path: str = None, max_bytes: int = None, max_age: float = None):
+        if max_bytes is None:
+            max_bytes = int(os.environ.get("SOCIAL_TOOLKIT_STORE_MAX_BYTES") or 256 * 1024 * 1024)
+        if max_age is None:
+            max_age = float(os.environ.get("SOCIAL_TOOLKIT_STORE_MAX_AGE") or 3600)
+        self.path = path or os.environ.get("SOCIAL_TOOLKIT_STORE_PATH") or _default_path()
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._db = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        # Opened on first use, so a server that never reads a stored resource never touches the disk
+        if self._db is None:
+            # Entries hold tenant data, keep them readable by this user only; SQLite gives its
+            # -wal and -shm files the database file's permissions
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), mode=0o700, exist_ok=True)
+            os.close(os.open(self.path, os.O_WRONLY | os.O_CREAT, 0o600))
+            db = sqlite3.connect(self.path, timeout=10, check_same_thread=False, isolation_level=None)
+            # WAL lets the stdio server processes of several clients read and write concurrently
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.executescript(_SCHEMA)
+            if db.execute("PRAGMA user_version").fetchone()[0] < _SCHEMA_VERSION:
+                db.execute("DELETE FROM entries WHERE expires IS NULL AND path NOT LIKE '%/version/%'")
+                db.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+            self._db = db
+        return self._db
+
+    def _key(self, api_key: str, path: str, params: dict = None) -> str:
+        return json.dumps([_key_hash(api_key), path, sorted((params or {}).items())], separators=(",", ":"))
+
+    def get(self, api_key: str, path: str, params: dict = None) -> StoredEntry:
+        """The stored entry for path, fresh or not, or None"""
+        if not self.enabled:
+            return None
+        key = self._key(api_key, path, params)
+        with self._lock:
+            row = self.db.execute("SELECT body, etag, last_modified, expires FROM entries WHERE key = ?",
+                                  (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.db.execute("UPDATE entries SET accessed = ? WHERE key = ?", (time.time(), key))
+        entry = StoredEntry(*row)
+        if entry.fresh:
+            self.hits += 1
+        return entry
+
+    def put(self, tenant_id: str, api_key: str, path: str, params: dict, body: bytes, etag: str = None,
+            last_modified: str = None, max_age: float = None) -> None:
+        """Store body for path; max_age None means it never changes, 0 that it is revalidated on every read"""
+        if not self.enabled or len(body) > self.max_bytes:
+            return
+        now = time.time()
+        expires = None if max_age is None else now + max_age
+        with self._lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO entries (key, tenant_id, path, body, size, etag, last_modified, expires, accessed)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (self._key(api_key, path, params), tenant_id, path, body, len(body), etag, last_modified, expires, now),
+            )
+            self._evict()
+
+    def refresh(self, api_key: str, path: str, params: dict = None, max_age: float = 0) -> None:
+        """Record that a stored entry was revalidated (the API answered 304 Not Modified)"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.db.execute("UPDATE entries SET expires = ? WHERE key = ?",
+                            (time.time() + max_age, self._key(api_key, path, params)))
+        self.revalidated += 1
+
+    def _evict(self) -> None:
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Evict down to 90% of the limit so the next few writes don't each scan again
+        target = total - int(self.max_bytes * 0.9)
+        freed = 0
+        stale = []
+        for key, size in self.db.execute("SELECT key, size FROM entries ORDER BY accessed"):
+            if freed >= target:
+                break
+            stale.append((key,))
+            freed += size
+        self.db.executemany("DELETE FROM entries WHERE key = ?", stale)
+        self.evictions += len(stale)
+
+    def invalidate(self, tenant_id: str, path: str, subtree: bool = False) -> None:
+        """Drop every entry for path, whatever the api_key or params, and below it with subtree=True"""
+        if not self.enabled or self._db is None and not os.path.exists(self.path):
+            return
+        with self._lock:
+            if subtree:
+                prefix = path.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "/%"
+                self.db.execute("DELETE FROM entries WHERE tenant_id = ? AND (path = ? OR path LIKE ? ESCAPE '\\')",
+                                (tenant_id, path, prefix))
+            else:
+                self.db.execute("DELETE FROM entries WHERE tenant_id = ? AND path = ?", (tenant_id, path))
+
+    def stats(self) -> dict:
+        stats = {
+            "path": self.path,
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "max_bytes": self.max_bytes,
+        }
+        if self.enabled and self._db is not None:
+            with self._lock:
+                stats["entries"], stats["bytes"] = self.db.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return stats
@@ -0,0 +1,170 @@
+# scheduler.py
+"""
+Fair admission of upstream requests across tenants.
+
+One server process serves many tenants over a single connection pool. Left
+to the pool, requests go out first come, first served, so one tenant's burst
+of uploads or generations queues every other tenant behind it. The
+FairScheduler admits at most max_in_flight requests at a time and decides
+who goes next:
+- lanes: interactive requests (reads by default) always go before bulk ones
+  (writes, and reads made by batch tools), and `reserve` slots are kept free
+  of bulk requests so a read never waits for a long upload to finish
+- within a lane, tenants are served by start-time fair queuing: each tenant
+  gets a share of the slots proportional to its weight, whatever the number
+  of requests it has queued
+
+Weights default to 1 and are set with SOCIAL_TOOLKIT_TENANT_WEIGHTS, e.g.
+"t-abc=2,t-def=0.5". Requests outside any tenant (creating or listing
+tenants) share the weight of an unnamed tenant.
+
+Configured with:
+- SOCIAL_TOOLKIT_SCHEDULER_MAX_IN_FLIGHT: requests admitted at once (default:
+  SOCIAL_TOOLKIT_MAX_CONNECTIONS, 20; 0 disables the scheduler)
+- SOCIAL_TOOLKIT_SCHEDULER_RESERVE: slots only interactive requests may use (default 2)
+
+Queue depth per lane and tenant is reported by snapshot(), and the time each
+request waited is recorded in metrics.
+"""
+import asyncio
+import heapq
+import itertools
+import os
+import re
+import time
+from contextlib import asynccontextmanager
+
+LANES = ("interactive", "bulk")
+
+_TENANT_PATH = re.compile(r"^/tenant/([^/?]+)")
+
+
+def tenant_of(path: str) -> str:
+    """Tenant a request path belongs to, "" for the tenant collection itself"""
+    match = _TENANT_PATH.match(path)
+    return match.group(1) if match else ""
+
+
+def _parse_weights(value: str) -> dict:
+    weights = {}
+    for item in (value or "").split(","):
+        tenant_id, _, weight = item.partition("=")
+        if tenant_id.strip() and weight.strip():
+            weights[tenant_id.strip()] = float(weight)
+    return weights
+
+
+class _Lane:
+    def __init__(self):
+        self.queue = []
+        # Start tag of the request admitted last, the lane's virtual time
+        self.virtual_time = 0.0
+        # Finish tag of each tenant's latest request
+        self.finish = {}
+        self.in_flight = 0
+
+
+class FairScheduler:
+    """
+    Bounds requests in flight and admits queued ones by lane priority, then weighted fair share per tenant
+    """
+
+    def __init__(self, max_in_flight: int = None, reserve: int = None, weights: dict = None, metrics=None):
+        if max_in_flight is None:
+            max_in_flight = int(os.environ.get("SOCIAL_TOOLKIT_SCHEDULER_MAX_IN_FLIGHT")
+                                or os.environ.get("SOCIAL_TOOLKIT_MAX_CONNECTIONS") or 20)
+        if reserve is None:
+            reserve = int(os.environ.get("SOCIAL_TOOLKIT_SCHEDULER_RESERVE") or 2)
+        self.max_in_flight = max_in_flight
+        self.reserve = min(reserve, max(0, max_in_flight - 1))
+        self.weights = weights if weights is not None else _parse_weights(os.environ.get("SOCIAL_TOOLKIT_TENANT_WEIGHTS"))
+        self.metrics = metrics
+        self._lanes = {lane: _Lane() for lane in LANES}
+        self._sequence = itertools.count()
+        self.admitted = 0
+        self.queued = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_in_flight > 0
+
+    @property
+    def in_flight(self) -> int:
+        return sum(lane.in_flight for lane in self._lanes.values())
+
+    def _has_room(self, lane: str) -> bool:
+        limit = self.max_in_flight if lane == "interactive" else self.max_in_flight - self.reserve
+        return self.in_flight < self.max_in_flight and (lane == "interactive" or self._lanes["bulk"].in_flight < limit)
+
+    def _enqueue(self, lane_name: str, tenant_id: str) -> asyncio.Future:
+        lane = self._lanes[lane_name]
+        start = max(lane.virtual_time, lane.finish.get(tenant_id, 0.0))
+        lane.finish[tenant_id] = start + 1.0 / max(self.weights.get(tenant_id, 1.0), 1e-6)
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(lane.queue, (start, next(self._sequence), tenant_id, future))
+        return future
+
+    def _dispatch(self) -> None:
+        """Admit queued requests while there is room, interactive lane first"""
+        for lane_name in LANES:
+            lane = self._lanes[lane_name]
+            while lane.queue and self._has_room(lane_name):
+                start, _, _, future = heapq.heappop(lane.queue)
+                if future.done():
+                    # Its caller was cancelled while waiting
+                    continue
+                lane.virtual_time = start
+                lane.in_flight += 1
+                future.set_result(None)
+
+    @asynccontextmanager
+    async def admit(self, tenant_id: str, lane: str = "interactive"):
+        """Hold one upstream slot for the block, waiting for the tenant's turn if all are taken"""
+        if not self.enabled:
+            yield
+            return
+        lane = lane if lane in self._lanes else "interactive"
+        state = self._lanes[lane]
+        start = time.perf_counter()
+        if self._has_room(lane) and not state.queue:
+            state.in_flight += 1
+        else:
+            self.queued += 1
+            future = self._enqueue(lane, tenant_id)
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    # Admitted just as the caller was cancelled; hand the slot on
+                    state.in_flight -= 1
+                    self._dispatch()
+                raise
+        self.admitted += 1
+        if self.metrics is not None:
+            self.metrics.record_wait(lane, tenant_id, time.perf_counter() - start)
+        try:
+            yield
+        finally:
+            state.in_flight -= 1
+            self._dispatch()
+
+    def queue_depths(self) -> dict:
+        """Requests waiting per lane and tenant"""
+        depths = {}
+        for lane_name, lane in self._lanes.items():
+            waiting = {}
+            for _, _, tenant_id, future in lane.queue:
+                if not future.done():
+                    waiting[tenant_id] = waiting.get(tenant_id, 0) + 1
+            depths[lane_name] = waiting
+        return depths
+
+    def snapshot(self) -> dict:
+        return {
+            "max_in_flight": self.max_in_flight,
+            "reserve": self.reserve,
+            "in_flight": {lane_name: lane.in_flight for lane_name, lane in self._lanes.items()},
+            "queued": self.queue_depths(),
+            "admitted": self.admitted,
+            "waited": self.queued,
+        }
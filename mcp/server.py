@@ -1,14 +1,340 @@
 # server.py
-import requests
-from mcp.server.fastmcp import FastMCP
+import argparse
+import asyncio
+import inspect
+import math
+import os
+import random
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+from mcp.server.fastmcp import Context, FastMCP
+from mcp.server.fastmcp.server import _convert_to_content
+from mcp.types import TextContent
+
+from api_client import ApiClient
+from cache import MISSING, ResponseCache
+from chat import ChatPool
+from codec import dumps, response_json
+from credentials import CredentialRegistry, SessionContexts
+from compaction import compact, fits_result_limit, load_spilled, spill_if_oversized
+from limits import TenantLimiter
+from logs import configure_logging
+from metrics import Metrics
+from pagination import iter_items, make_filters, read_page
+from result_store import ResultStore
+from scheduler import FairScheduler
+from sync import hash_files, load_manifest, manifest_path, plan_sync, save_manifest, scan_directory
+from transport import TRANSPORTS, request_token, run_http
+from uploads import MultipartFileUpload, content_type_for
+from waiters import Waiter, is_pending
+
+# Logs go to stderr, stdout is reserved for the MCP protocol
+logger = configure_logging()
+
+# Per-tool and per-upstream-route latency, error and traffic metrics
+metrics = Metrics()
+
+# Tool arguments that may be left out, and are then filled from the session's context,
+# the client's Authorization header or the credential registry
+CONTEXT_ARGUMENTS = ("tenant_id", "api_key", "admin_token", "brand_id")
+
+# Tools that select the context themselves
+CONTEXT_TOOLS = ("use_tenant", "use_brand")
+
+# API keys the server holds, so they never pass through the model
+credentials = CredentialRegistry.from_env()
+
+# Tenant and brand selected by each client session
+contexts = SessionContexts(credentials)
+
+class SocialToolkitMCP(FastMCP):
+    """
+    FastMCP server that records the latency and outcome of every tool call
+    and fills in tenant credentials and IDs the call left out
+    """
+
+    async def list_tools(self):
+        tools = await super().list_tools()
+        for tool in tools:
+            if tool.name in CONTEXT_TOOLS:
+                continue
+            # Advertised as optional, so the model can leave them to the session's context
+            required = [arg for arg in tool.inputSchema.get("required", []) if arg not in CONTEXT_ARGUMENTS]
+            tool.inputSchema = {**tool.inputSchema, "required": required}
+        return tools
+
+    def _with_context(self, name: str, arguments: dict, context: Context) -> tuple:
+        """
+        Fill empty tenant_id, api_key, admin_token and brand_id arguments from the session's
+        context, the client's bearer token and the credential registry
+        Returns (arguments, context arguments that are required but could not be filled)
+        """
+        tool = self._tool_manager.get_tool(name)
+        if tool is None or name in CONTEXT_TOOLS:
+            return arguments, []
+        properties = tool.parameters.get("properties", {})
+        required = tool.parameters.get("required", [])
+        empty = [arg for arg in CONTEXT_ARGUMENTS if arg in properties and not arguments.get(arg)]
+        if not empty:
+            return arguments, []
+        arguments = dict(arguments)
+        forwarded = request_token(context)
+        session = contexts.get(context.request_context.session, forwarded)
+        if "tenant_id" in empty and session.tenant_id:
+            arguments["tenant_id"] = session.tenant_id
+        tenant_id = arguments.get("tenant_id")
+        if "api_key" in empty:
+            arguments["api_key"] = contexts.api_key(session, tenant_id, forwarded)
+        if "admin_token" in empty:
+            arguments["admin_token"] = contexts.admin_token(forwarded)
+        # An optional brand_id means "any brand" to the tools that take one; only required ones are filled
+        if "brand_id" in empty and "brand_id" in required:
+            arguments["brand_id"] = contexts.brand_id(session, tenant_id, forwarded)
+        return arguments, [arg for arg in empty if arg in required and not arguments.get(arg)]
+
+    async def call_tool(self, name: str, arguments: dict):
+        start = time.perf_counter()
+        error = True
+        try:
+            context = self.get_context()
+            arguments, missing = self._with_context(name, arguments, context)
+            if missing:
+                result = {"status": "error", "message": f"Missing {', '.join(missing)}",
+                          "error": "Not passed and not set for the session, select a tenant and brand with use_tenant/use_brand"}
+            else:
+                result = await self._tool_manager.call_tool(name, arguments, context=context)
+            error = isinstance(result, dict) and result.get("status") == "error"
+            if name != "read_result":
+                # Oversized results go to a file; the model gets a handle for read_result.
+                # Encoding and writing a large result would stall other sessions, so it runs in a thread
+                result = await asyncio.to_thread(spill_if_oversized, result, name)
+        finally:
+            metrics.record_tool(name, time.perf_counter() - start, error)
+        return _to_content(result)
+
+def _to_content(result) -> list:
+    """
+    Like FastMCP's _convert_to_content, but JSON results are encoded in one pass
+    by the codec instead of being converted to plain Python and then dumped
+    """
+    if isinstance(result, dict):
+        return [TextContent(type="text", text=dumps(result))]
+    if isinstance(result, (list, tuple)):
+        return [content for item in result for content in _to_content(item)]
+    return _convert_to_content(result)
+
+@asynccontextmanager
+async def session_lifespan(server: FastMCP):
+    """Runs as each client session starts, before it sends initialize"""
+    # Open the API connection while the client completes the handshake and picks its first tool
+    api.prewarm()
+    yield {}
 
 # Create an MCP server
-mcp = FastMCP("Demo")
+mcp = SocialToolkitMCP("Demo", lifespan=session_lifespan)
+
+# Admits upstream requests by lane priority, then weighted fair share per tenant
+scheduler = FairScheduler(metrics=metrics)
+metrics.gauges["social_toolkit_queue_depth"] = lambda: [
+    (f'lane="{lane}",tenant="{tenant_id}"', depth)
+    for lane, tenants in scheduler.queue_depths().items() for tenant_id, depth in sorted(tenants.items())
+]
+
+# Shared, pooled transport used by every tool
+api = ApiClient(metrics=metrics, scheduler=scheduler)
+
+async def _load_concurrency_limits(tenant_id: str, api_key: str) -> dict:
+    response = await api.get(f"/tenant/{tenant_id}", api_key=api_key)
+    response.raise_for_status()
+    return response_json(response).get("concurrency_limits")
+
+# Bounds the backend jobs a tenant has running by its own concurrency_limits
+limiter = TenantLimiter(_load_concurrency_limits, metrics=metrics)
+
+# Shared polling loops for the wait_for_* tools, and for following started jobs to their end
+waiter = Waiter()
+
+# Completed generations and finished compasses kept on disk across restarts
+store = ResultStore()
+
+# Open WebSocket connections of brand conversations, one per conversation token
+chat = ChatPool()
+
+# Whether progress notifications can carry a message (mcp>=1.10)
+_PROGRESS_MESSAGES = "message" in inspect.signature(Context.report_progress).parameters
+
+# Read-through cache for get/list tools, invalidated by the matching write tools
+cache = ResponseCache(store=store, api=api)
+
+async def _stored_get(resource: str, tenant_id: str, api_key: str, path: str, params: dict = None,
+                      generation: int = None) -> any:
+    """
+    GET path through the persistent store
+    A fresh stored entry is returned as is, a stale one is revalidated with its ETag/Last-Modified.
+    COMPLETED generation versions are kept for good. A finished generation (its latest version,
+    which feedback replaces) and a finished compass are kept for the store's max_age, and other
+    responses only when the API sent validators for them
+    generation: cache.generation() taken before the read; nothing is stored if a write to path
+    was invalidated since, as the response may predate it
+    """
+    if generation is None:
+        generation = cache.generation()
+    entry = await asyncio.to_thread(store.get, api_key, path, params)
+    if entry is not None and entry.fresh:
+        return entry.value
+    headers = entry.conditional_headers() if entry is not None else None
+    response = await api.get(path, params=params, api_key=api_key, headers=headers or None)
+    if response.status_code == 304 and entry is not None:
+        await asyncio.to_thread(store.refresh, api_key, path, params)
+        return entry.value
+    response.raise_for_status()
+    data = response_json(response)
+    if cache.changed_since(tenant_id, path, generation):
+        return data
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    status = data.get("status") if isinstance(data, dict) else None
+    if resource == "generation_version" and status == "COMPLETED":
+        await asyncio.to_thread(store.put, tenant_id, api_key, path, params, response.content, etag, last_modified)
+    elif resource in ("generation", "compass") and status is not None and not is_pending(data):
+        await asyncio.to_thread(store.put, tenant_id, api_key, path, params, response.content, etag, last_modified,
+                                store.max_age)
+    elif etag or last_modified:
+        await asyncio.to_thread(store.put, tenant_id, api_key, path, params, response.content, etag, last_modified, 0)
+    return data
+
+async def _cached_get(resource: str, tenant_id: str, api_key: str, path: str, params: dict = None) -> any:
+    """GET path through the response cache, storing the decoded body under resource's TTL"""
+    cached = cache.get(resource, api_key, tenant_id, path, params)
+    if cached is not MISSING:
+        return cached
+    generation = cache.generation()
+    data = await _stored_get(resource, tenant_id, api_key, path, params, generation)
+    # A response that started before a write to path finished must not outlive it in the cache
+    if not cache.changed_since(tenant_id, path, generation):
+        # A compass that is still being built changes from one poll to the next
+        ttl = 5 if resource == "compass" and is_pending(data) else None
+        cache.set(resource, api_key, tenant_id, path, params, data, ttl)
+    return data
+
+async def _job_finished(path: str, api_key: str) -> None:
+    """Return once the job at path leaves the pending statuses; shares the poll of any wait_for_* call"""
+    async def fetch():
+        response = await api.get(path, api_key=api_key, priority="bulk")
+        response.raise_for_status()
+        return response_json(response)
+
+    await waiter.wait((api_key, path), fetch, math.inf)
+
+async def _start_job(tenant_id: str, api_key: str, content_type: str, start, job_path) -> any:
+    """
+    Start a backend job within the tenant's concurrency limit for content_type
+    start sends the request and returns the response; job_path maps the started job to the path
+    it is polled at, or None. The slot is kept until the job leaves the pending statuses, so the
+    limit bounds the tenant's running jobs rather than its start requests
+    """
+    lease = await limiter.acquire(tenant_id, api_key, content_type or "TEXT")
+    try:
+        response = await start()
+        response.raise_for_status()
+        job = response_json(response)
+        path = job_path(job) if isinstance(job, dict) and (is_pending(job) or "status" not in job) else None
+    except BaseException:
+        lease.release()
+        raise
+    if path:
+        limiter.hold(lease, _job_finished(path, api_key))
+    else:
+        lease.release()
+    return job
+
+async def _wait_for(path: str, api_key: str, timeout: float, label: str, ctx: Context = None) -> any:
+    """Poll path until it leaves QUEUED/PROCESSING, returning the terminal state or a timeout error"""
+    async def fetch():
+        response = await api.get(path, api_key=api_key)
+        response.raise_for_status()
+        return response_json(response)
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+
+    async def report_progress(state):
+        if ctx is not None:
+            await ctx.report_progress(loop.time() - started, timeout)
+
+    finished, state = await waiter.wait((api_key, path), fetch, timeout, report_progress)
+    if finished:
+        return state
+    return {
+        "status": "error",
+        "message": f"Timed out after {timeout}s waiting for {label}",
+        "error": "timeout",
+        "last_state": state,
+    }
+
+@mcp.tool()
+async def use_tenant(tenant_id: str = None, api_key: str = None, brand_id: str = None, ctx: Context = None) -> any:
+    """
+    Select the tenant, and optionally the brand, that this session works with
+    Later tool calls can then leave out tenant_id, api_key and brand_id
+    api_key is only needed once, and not at all for tenants whose key the server holds;
+    tenant_id defaults to the server's configured tenant
+    """
+    forwarded = request_token(ctx)
+    session = contexts.get(ctx.request_context.session, forwarded)
+    tenant_id = tenant_id or session.tenant_id or contexts.default_tenant(forwarded)
+    if not tenant_id:
+        error = {"status": "error", "message": "No tenant_id given and no default tenant configured",
+                 "error": "missing tenant_id"}
+        if contexts.authenticated(forwarded):
+            error["known_tenants"] = credentials.tenant_ids()
+        return error
+    # Registry keys are only resolved for sessions allowed to use them
+    key = api_key or contexts.api_key(session, tenant_id, forwarded)
+    if not key:
+        return {"status": "error", "message": f"No API key for tenant {tenant_id}",
+                "error": "Pass api_key, or register the key with the server (SOCIAL_TOOLKIT_API_KEYS)"}
+    brand_id = brand_id or contexts.brand_id(session, tenant_id, forwarded)
+    try:
+        # Validates the key, and binds the tenant's concurrency limits before its first job starts
+        tenant = await _cached_get("tenant", tenant_id, key, f"/tenant/{tenant_id}")
+        limiter.set_limits(tenant_id, tenant.get("concurrency_limits"))
+        brand = await _cached_get("brand", tenant_id, key, f"/tenant/{tenant_id}/brand/{brand_id}") if brand_id else {}
+    except Exception as e:
+        error_msg = f"Failed to select tenant {tenant_id}"
+        logger.error("%s: %s", error_msg, e)
+        return {"status": "error", "message": error_msg, "error": str(e)}
+    session.tenant_id, session.brand_id = tenant_id, brand_id
+    # Only a key passed here is kept; otherwise it is looked up again on each call
+    session.api_key = api_key
+    return {"status": "success", "tenant_id": tenant_id, "tenant_name": tenant.get("name"),
+            "brand_id": brand_id, "brand_name": brand.get("name")}
 
-API_URL = "https://social-toolkit.ti.trilogy.com"
+@mcp.tool()
+async def use_brand(brand_id: str, ctx: Context = None) -> any:
+    """
+    Select the brand that later tool calls of this session use when they leave out brand_id
+    Needs a tenant, selected with use_tenant or configured on the server
+    """
+    forwarded = request_token(ctx)
+    session = contexts.get(ctx.request_context.session, forwarded)
+    if not session.tenant_id:
+        return {"status": "error", "message": "No tenant selected", "error": "Call use_tenant first"}
+    tenant_id = session.tenant_id
+    key = contexts.api_key(session, tenant_id, forwarded)
+    try:
+        brand = await _cached_get("brand", tenant_id, key, f"/tenant/{tenant_id}/brand/{brand_id}")
+    except Exception as e:
+        error_msg = f"Failed to select brand {brand_id}"
+        logger.error("%s: %s", error_msg, e)
+        return {"status": "error", "message": error_msg, "error": str(e)}
+    session.brand_id = brand_id
+    return {"status": "success", "tenant_id": tenant_id, "brand_id": brand_id, "brand_name": brand.get("name")}
 
 @mcp.tool()
-def create_tenant(name: str, description: str = None, settings: dict = None, concurrency_limits: dict = None) -> any:
+async def create_tenant(name: str, description: str = None, settings: dict = None, concurrency_limits: dict = None) -> any:
     """
     Create a new tenant with the specified parameters (Public API)
     Returns api_key in response which should be used as bearer token for subsequent requests
@@ -20,208 +346,236 @@ def create_tenant(name: str, description: str = None, settings: dict = None, con
             "settings": settings or {},
             "concurrency_limits": concurrency_limits
         }
-        response = requests.post(f"{API_URL}/tenant", json=payload)
+        response = await api.post("/tenant", json=payload)
         response.raise_for_status()
-        return response.json()
+        tenant = response_json(response)
+        limiter.set_limits(tenant.get("tenant_id"), tenant.get("concurrency_limits"))
+        return tenant
     except Exception as e:
-        print(f"Failed to create tenant: {e}")
+        logger.error("Failed to create tenant: %s", e)
         return {"status": "error", "message": "Failed to create tenant", "error": str(e)}
 
 @mcp.tool()
-def list_tenants(admin_token: str) -> any:
+async def list_tenants(admin_token: str) -> any:
     """
     List Tenants (Admin API)
     Requires admin bearer token
     """
     try:
-        headers = {"Authorization": f"Bearer {admin_token}"}
-        response = requests.get(f"{API_URL}/tenant", headers=headers)
+        response = await api.get("/tenant", api_key=admin_token)
         response.raise_for_status()
-        return response.json()
+        return response_json(response)
     except Exception as e:
         error_msg = "Failed to list tenants"
-        print(f"{error_msg}: {e}")
+        logger.error("%s: %s", error_msg, e)
         return {"status": "error", "message": error_msg, "error": str(e)}
 
 @mcp.tool()
-def get_tenant(tenant_id: str, api_key: str) -> any:
+async def get_tenant(tenant_id: str, api_key: str) -> any:
     """
     Get Tenant details (Tenant-specific API)
     Requires tenant api_key as bearer token
     """
     try:
-        headers = {"Authorization": f"Bearer {api_key}"}
-        response = requests.get(f"{API_URL}/tenant/{tenant_id}", headers=headers)
-        response.raise_for_status()
-        return response.json()
+        tenant = await _cached_get("tenant", tenant_id, api_key, f"/tenant/{tenant_id}")
+        limiter.set_limits(tenant_id, tenant.get("concurrency_limits"))
+        return tenant
     except Exception as e:
         error_msg = f"Failed to get tenant {tenant_id}"
-        print(f"{error_msg}: {e}")
+        logger.error("%s: %s", error_msg, e)
         return {"status": "error", "message": error_msg, "error": str(e)}
 
 @mcp.tool()
-def update_tenant(tenant_id: str, api_key: str, updates: dict) -> any:
+async def update_tenant(tenant_id: str, api_key: str, updates: dict) -> any:
     """
     Update an existing tenant's details (Tenant-specific API)
     Requires tenant api_key as bearer token
     """
     try:
-        headers = {"Authorization": f"Bearer {api_key}"}
-        response = requests.put(f"{API_URL}/tenant/{tenant_id}", json=updates, headers=headers)
+        response = await api.put(f"/tenant/{tenant_id}", json=updates, api_key=api_key)
+        await cache.invalidate(tenant_id, f"/tenant/{tenant_id}")
         response.raise_for_status()
-        return response.json()
+        tenant = response_json(response)
+        limiter.set_limits(tenant_id, tenant.get("concurrency_limits"))
+        return tenant
     except Exception as e:
         error_msg = f"Failed to update tenant {tenant_id}"
-        print(error_msg, e)
+        logger.error("%s: %s", error_msg, e)
         return {"status": "error", "message": error_msg, "error": str(e)}
 
 @mcp.tool()
-def delete_tenant(tenant_id: str, api_key: str) -> any:
+async def delete_tenant(tenant_id: str, api_key: str) -> any:
     """
     Delete a tenant (Tenant-specific API)
     Requires tenant api_key as bearer token
     """
     try:
-        headers = {"Authorization": f"Bearer {api_key}"}
-        response = requests.delete(f"{API_URL}/tenant/{tenant_id}", headers=headers)
+        response = await api.delete(f"/tenant/{tenant_id}", api_key=api_key)
+        await cache.invalidate(tenant_id, f"/tenant/{tenant_id}", subtree=True)
         response.raise_for_status()
         return {"status": "success", "message": f"Tenant {tenant_id} deleted"}
     except Exception as e:
         error_msg = f"Failed to delete tenant {tenant_id}"
-        print(error_msg, e)
+        logger.error("%s: %s", error_msg, e)
         return {"status": "error", "message": error_msg, "error": str(e)}
 
 @mcp.tool()
-def create_brand(tenant_id: str, api_key: str, name: str, description: str = None, settings: dict = None) -> any:
+async def create_brand(tenant_id: str, api_key: str, name: str, description: str = None, settings: dict = None) -> any:
     """
     Create a new brand for a tenant (Tenant-specific API)
     Requires tenant api_key as bearer token
     """
     try:
-        headers = {"Authorization": f"Bearer {api_key}"}
         payload = {
             "name": name,
             "description": description,
             "settings": settings or {}
         }
-        response = requests.post(f"{API_URL}/tenant/{tenant_id}/brand", json=payload, headers=headers)
+        response = await api.post(f"/tenant/{tenant_id}/brand", json=payload, api_key=api_key)
+        await cache.invalidate(tenant_id, f"/tenant/{tenant_id}/brand")
         response.raise_for_status()
-        return response.json()
+        return response_json(response)
     except Exception as e:
         error_msg = f"Failed to create brand for tenant {tenant_id}"
-        print(error_msg, e)
+        logger.error("%s: %s", error_msg, e)
         return {"status": "error", "message": error_msg, "error": str(e)}
 
 @mcp.tool()
-def get_brand(tenant_id: str, api_key: str, brand_id: str) -> any:
+async def get_brand(tenant_id: str, api_key: str, brand_id: str) -> any:
     """
     Get brand details (Tenant-specific API)
     Requires tenant api_key as bearer token
     """
     try:
-        headers = {"Authorization": f"Bearer {api_key}"}
-        response = requests.get(f"{API_URL}/tenant/{tenant_id}/brand/{brand_id}", headers=headers)
-        response.raise_for_status()
-        return response.json()
+        return await _cached_get("brand", tenant_id, api_key, f"/tenant/{tenant_id}/brand/{brand_id}")
     except Exception as e:
         error_msg = f"Failed to get brand {brand_id}"
-        print(error_msg, e)
+        logger.error("%s: %s", error_msg, e)
         return {"status": "error", "message": error_msg, "error": str(e)}
 
 @mcp.tool()
-def list_brands(tenant_id: str, api_key: str) -> any:
+async def list_brands(tenant_id: str, api_key: str, fields: list = None, max_items: int = None,
+                      summary: bool = False) -> any:
     """
     List all active brands for a tenant (Tenant-specific API)
     Requires tenant api_key as bearer token
+    Optional output shaping:
+    - fields: only return these fields of each item, e.g. ["brand_id", "name"]
+    - max_items: return at most this many items, plus the total count
+    - summary: only identifying fields and statuses, long text truncated
     """
     try:
-        headers = {"Authorization": f"Bearer {api_key}"}
-        response = requests.get(f"{API_URL}/tenant/{tenant_id}/brand", headers=headers)
-        response.raise_for_status()
-        return response.json()
+        brands = await _cached_get("brands", tenant_id, api_key, f"/tenant/{tenant_id}/brand")
+        return compact(brands, fields, max_items, summary)
     except Exception as e:
         error_msg = f"Failed to list brands for tenant {tenant_id}"
-        print(error_msg, e)
+        logger.error("%s: %s", error_msg, e)
         return {"status": "error", "message": error_msg, "error": str(e)}
 
 @mcp.tool()
-def update_brand(tenant_id: str, api_key: str, brand_id: str, updates: dict) -> any:
+async def update_brand(tenant_id: str, api_key: str, brand_id: str, updates: dict) -> any:
     """
     Update brand details (Tenant-specific API)
     Requires tenant api_key as bearer token
     """
     try:
-        headers = {"Authorization": f"Bearer {api_key}"}
-        response = requests.put(f"{API_URL}/tenant/{tenant_id}/brand/{brand_id}", json=updates, headers=headers)
+        response = await api.put(f"/tenant/{tenant_id}/brand/{brand_id}", json=updates, api_key=api_key)
+        await cache.invalidate(tenant_id, f"/tenant/{tenant_id}/brand/{brand_id}")
+        await cache.invalidate(tenant_id, f"/tenant/{tenant_id}/brand")
         response.raise_for_status()
-        return response.json()
+        return response_json(response)
     except Exception as e:
         error_msg = f"Failed to update brand {brand_id}"
-        print(error_msg, e)
+        logger.error("%s: %s", error_msg, e)
         return {"status": "error", "message": error_msg, "error": str(e)}
 
 @mcp.tool()
-def delete_brand(tenant_id: str, api_key: str, brand_id: str) -> any:
+async def delete_brand(tenant_id: str, api_key: str, brand_id: str) -> any:
     """
     Delete a brand (Tenant-specific API)
     Requires tenant api_key as bearer token
     """
     try:
-        headers = {"Authorization": f"Bearer {api_key}"}
-        response = requests.delete(f"{API_URL}/tenant/{tenant_id}/brand/{brand_id}", headers=headers)
+        response = await api.delete(f"/tenant/{tenant_id}/brand/{brand_id}", api_key=api_key)
+        await cache.invalidate(tenant_id, f"/tenant/{tenant_id}/brand/{brand_id}", subtree=True)
+        await cache.invalidate(tenant_id, f"/tenant/{tenant_id}/brand")
         response.raise_for_status()
         return {"status": "success", "message": f"Brand {brand_id} deleted"}
     except Exception as e:
         error_msg = f"Failed to delete brand {brand_id}"
-        print(error_msg, e)
+        logger.error("%s: %s", error_msg, e)
         return {"status": "error", "message": error_msg, "error": str(e)}
 
 @mcp.tool()
-def trigger_brand_compass(tenant_id: str, api_key: str, brand_id: str) -> any:
+async def trigger_brand_compass(tenant_id: str, api_key: str, brand_id: str) -> any:
     """
     Trigger the generation of a brand compass (Tenant-specific API)
     Requires tenant api_key as bearer token
     """
     try:
-        headers = {"Authorization": f"Bearer {api_key}"}
-        response = requests.post(f"{API_URL}/tenant/{tenant_id}/brand/{brand_id}/compass/trigger", headers=headers)
-        response.raise_for_status()
-        return response.json()
+        path = f"/tenant/{tenant_id}/brand/{brand_id}/compass"
+
+        async def start():
+            response = await api.post(f"{path}/trigger", api_key=api_key)
+            await cache.invalidate(tenant_id, path)
+            return response
+
+        return await _start_job(tenant_id, api_key, "TEXT", start, lambda compass: path)
     except Exception as e:
         error_msg = f"Failed to trigger brand compass for brand {brand_id}"
-        print(error_msg, e)
+        logger.error("%s: %s", error_msg, e)
         return {"status": "error", "message": error_msg, "error": str(e)}
 
 @mcp.tool()
-def get_brand_compass(tenant_id: str, api_key: str, brand_id: str) -> any:
+async def get_brand_compass(tenant_id: str, api_key: str, brand_id: str, fields: list = None,
+                            max_items: int = None, summary: bool = False) -> any:
     """
     Get the latest brand compass (Tenant-specific API)
     Requires tenant api_key as bearer token
+    Optional output shaping:
+    - fields: only return these fields, e.g. ["status", "progress", "generations.result.content"]
+    - max_items: return at most this many generations, plus the total count
+    - summary: only statuses and identifiers of the generations, without their content
     """
     try:
-        headers = {"Authorization": f"Bearer {api_key}"}
-        response = requests.get(f"{API_URL}/tenant/{tenant_id}/brand/{brand_id}/compass", headers=headers)
-        response.raise_for_status()
-        return response.json()
+        compass = await _cached_get("compass", tenant_id, api_key, f"/tenant/{tenant_id}/brand/{brand_id}/compass")
+        return compact(compass, fields, max_items, summary)
     except Exception as e:
         error_msg = f"Failed to get brand compass for brand {brand_id}"
-        print(error_msg, e)
+        logger.error("%s: %s", error_msg, e)
+        return {"status": "error", "message": error_msg, "error": str(e)}
+
+@mcp.tool()
+async def wait_for_brand_compass(tenant_id: str, api_key: str, brand_id: str, timeout: float = 600, ctx: Context = None) -> any:
+    """
+    Wait until the brand compass finishes processing and return it (Tenant-specific API)
+    Requires tenant api_key as bearer token
+    Polls the API server-side with backoff, so there is no need to call get_brand_compass repeatedly.
+    Returns the compass once its status is COMPLETED or FAILED, or an error after timeout seconds
+    """
+    try:
+        return await _wait_for(f"/tenant/{tenant_id}/brand/{brand_id}/compass", api_key, timeout,
+                               f"brand compass for brand {brand_id}", ctx)
+    except Exception as e:
+        error_msg = f"Failed to wait for brand compass for brand {brand_id}"
+        logger.error("%s: %s", error_msg, e)
         return {"status": "error", "message": error_msg, "error": str(e)}
 
 @mcp.tool()
-def create_source(tenant_id: str, api_key: str, brand_id: str, name: str, source_type: str, 
+async def create_source(tenant_id: str, api_key: str, brand_id: str, name: str, source_type: str, 
                  content_type: str = None, description: str = None, 
-                 file_path: str = None, url: str = None, text: str = None) -> any:
+                 file_path: str = None, url: str = None, text: str = None, retry: bool = False,
+                 ctx: Context = None) -> any:
     """
     Create a new source for a brand (Tenant-specific API)
     Requires tenant api_key as bearer token
     Must provide one of: file_path, url, or text.
     source_type must be one of: KNOWLEDGE, GUIDELINES, SAMPLE
     content_type must be one of: VIDEO, AUDIO, TEXT, IMAGE
+    Files are streamed from disk in chunks, with upload progress reported to the client
+    retry: retry on throttling or transient errors, sending an Idempotency-Key (default: false)
     """
     try:
-        headers = {"Authorization": f"Bearer {api_key}"}
-        files = {}
         data = {
             "name": name,
             "source_type": source_type,
@@ -232,107 +586,387 @@ def create_source(tenant_id: str, api_key: str, brand_id: str, name: str, source
             data["content_type"] = content_type
             
         if file_path:
-            with open(file_path, 'rb') as f:
-                files = {'file': f}
+            async def report_progress(sent, total):
+                if ctx is not None:
+                    await ctx.report_progress(sent, total)
+
+            upload = MultipartFileUpload(data, "file", file_path, on_progress=report_progress)
+            request_kwargs = {"content": upload, "headers": upload.headers}
+            slot_content_type = content_type or content_type_for(file_path)
         elif url:
             data["url"] = url
+            request_kwargs = {"data": data}
+            slot_content_type = content_type
         elif text:
             data["text"] = text
+            request_kwargs = {"data": data}
+            slot_content_type = "TEXT"
         else:
             raise ValueError("Must provide one of: file_path, url, or text")
 
-        response = requests.post(
-            f"{API_URL}/tenant/{tenant_id}/brand/{brand_id}/source",
-            data=data,
-            files=files,
-            headers=headers
-        )
-        response.raise_for_status()
-        return response.json()
+        path = f"/tenant/{tenant_id}/brand/{brand_id}/source"
+
+        async def start():
+            response = await api.post(path, api_key=api_key, retry=retry, **request_kwargs)
+            await cache.invalidate(tenant_id, path)
+            return response
+
+        def source_path(source):
+            return f"{path}/{source['source_id']}" if source.get("source_id") else None
+
+        return await _start_job(tenant_id, api_key, slot_content_type, start, source_path)
     except Exception as e:
         error_msg = f"Failed to create source for brand {brand_id}"
-        print(error_msg, e)
+        logger.error("%s: %s", error_msg, e)
+        return {"status": "error", "message": error_msg, "error": str(e)}
+
+async def _run_bounded(items: list, worker, max_workers: int, on_done=None) -> list:
+    """
+    Run the async worker over items with at most max_workers in flight, keeping input order
+    on_done, when given, is awaited with the number of finished items after each one
+    """
+    results = [None] * len(items)
+    queue = asyncio.Queue()
+    for index, item in enumerate(items):
+        queue.put_nowait((index, item))
+    done = 0
+
+    async def run_worker():
+        nonlocal done
+        while not queue.empty():
+            index, item = queue.get_nowait()
+            results[index] = await worker(item)
+            done += 1
+            if on_done is not None:
+                await on_done(done)
+
+    await asyncio.gather(*[run_worker() for _ in range(max(1, min(max_workers, len(items))))])
+    return results
+
+def _batch_source_items(directory: str = None, glob: str = "*", file_paths: list = None,
+                        urls: list = None, texts: list = None) -> list:
+    items = []
+    if directory:
+        root = Path(directory).expanduser()
+        if not root.is_dir():
+            raise ValueError(f"Not a directory: {directory}")
+        items += [{"name": path.name, "file_path": str(path)} for path in sorted(root.glob(glob or "*")) if path.is_file()]
+    for file_path in file_paths or []:
+        items.append({"name": os.path.basename(file_path), "file_path": file_path})
+    for url in urls or []:
+        items.append({"name": url, "url": url})
+    for index, text in enumerate(texts or [], start=1):
+        items.append({"name": f"Text {index}", "text": text})
+    return items
+
+@mcp.tool()
+async def create_sources_batch(tenant_id: str, api_key: str, brand_id: str, source_type: str,
+                               directory: str = None, glob: str = "*", file_paths: list = None,
+                               urls: list = None, texts: list = None, description: str = None,
+                               max_workers: int = 8, retry: bool = False, ctx: Context = None) -> any:
+    """
+    Create many sources for a brand in one call (Tenant-specific API)
+    Requires tenant api_key as bearer token
+    Sources can be given as any mix of:
+    - directory: every file in the directory matching glob (e.g. "*.md", or "**/*" to recurse)
+    - file_paths: list of file paths
+    - urls: list of URLs
+    - texts: list of text contents
+    source_type must be one of: KNOWLEDGE, GUIDELINES, SAMPLE
+    Content type is detected from each file's extension. Uploads run concurrently with up to
+    max_workers in flight; a new one only starts while the tenant has fewer sources of its content
+    type processing than its concurrency_limits allow.
+    retry: retry each upload on throttling or transient errors, sending an Idempotency-Key (default: false)
+    Returns counts, the created source_id per item and the failures
+    """
+    try:
+        items = _batch_source_items(directory, glob, file_paths, urls, texts)
+        if not items:
+            raise ValueError("No sources found: provide directory, file_paths, urls or texts")
+
+        async def create(item):
+            content_type = content_type_for(item["file_path"]) if "file_path" in item else None
+            return await create_source(tenant_id, api_key, brand_id, item["name"], source_type,
+                                       content_type=content_type, description=description,
+                                       file_path=item.get("file_path"), url=item.get("url"), text=item.get("text"),
+                                       retry=retry)
+
+        async def report_progress(done):
+            if ctx is not None:
+                await ctx.report_progress(done, len(items))
+
+        results = await _run_bounded(items, create, max_workers, report_progress)
+
+        source_ids = {}
+        failures = []
+        for item, result in zip(items, results):
+            label = item.get("file_path") or item["name"]
+            if isinstance(result, dict) and result.get("source_id"):
+                source_ids[label] = result["source_id"]
+            else:
+                error = result.get("error") if isinstance(result, dict) else None
+                failures.append({"item": label, "error": error or str(result)})
+        return {
+            "status": "success" if not failures else ("error" if not source_ids else "partial"),
+            "total": len(items),
+            "created": len(source_ids),
+            "failed": len(failures),
+            "source_ids": source_ids,
+            "failures": failures,
+        }
+    except Exception as e:
+        error_msg = f"Failed to create sources for brand {brand_id}"
+        logger.error("%s: %s", error_msg, e)
         return {"status": "error", "message": error_msg, "error": str(e)}
 
 @mcp.tool()
-def get_source(tenant_id: str, api_key: str, brand_id: str, source_id: str) -> any:
+async def sync_sources_directory(tenant_id: str, api_key: str, brand_id: str, source_type: str, directory: str,
+                                 glob: str = "**/*", description: str = None, delete_removed: bool = True,
+                                 dry_run: bool = False, rehash: bool = False, max_workers: int = 8,
+                                 retry: bool = False, ctx: Context = None) -> any:
+    """
+    Bring a brand's sources in line with a local directory, doing only the work that changed (Tenant-specific API)
+    Requires tenant api_key as bearer token
+    Files are matched by SHA-256 content hash against a local manifest of the previous sync of this
+    directory to this brand:
+    - new content is uploaded once, even if several files hold it; moved or renamed files keep their source
+    - a changed file is uploaded again and its old source deleted
+    - sources of removed files are deleted (unless delete_removed is false); files that glob does
+      not match are left alone, so a sync with a narrower glob does not delete the others' sources
+    - sources that failed processing are reprocessed, and sources deleted on the server are uploaded again
+    source_type must be one of: KNOWLEDGE, GUIDELINES, SAMPLE; it applies to new uploads
+    glob selects files below directory (default "**/*", every file recursively)
+    dry_run: only report what would be done. rehash: re-read every file instead of trusting
+    unchanged size and modification time. Uploads run with up to max_workers in flight.
+    Returns counts per action, the failures and the manifest path
+    """
+    try:
+        path = manifest_path(tenant_id, brand_id, directory)
+        previous = await asyncio.to_thread(load_manifest, path)
+        files = await asyncio.to_thread(scan_directory, directory, glob)
+        local, files_read = await hash_files(files, previous, rehash)
+
+        remote = {}
+        async for source in _iter_sources(tenant_id, api_key, brand_id):
+            remote[source.get("source_id")] = source.get("status")
+        plan = plan_sync(local, previous, remote, delete_removed, glob)
+        summary = {
+            "files": len(local),
+            "files_hashed": files_read,
+            "unchanged": len(plan["keep"]),
+            "uploaded": len(plan["upload"]),
+            "replaced": len(plan["replaced"]),
+            "reprocessed": len(plan["reprocess"]),
+            "deleted": len(plan["delete"]),
+        }
+        if dry_run:
+            return {"status": "success", "dry_run": True, **summary,
+                    "upload": sorted(paths[0] for paths in plan["upload"].values()),
+                    "replace": plan["replaced"], "reprocess": plan["reprocess"], "delete": plan["delete"],
+                    "manifest_path": path}
+
+        async def upload(paths):
+            file_path = files[paths[0]][0]
+            return await create_source(tenant_id, api_key, brand_id, paths[0], source_type,
+                                       content_type=content_type_for(file_path), description=description,
+                                       file_path=file_path, retry=retry)
+
+        async def report_progress(done):
+            if ctx is not None:
+                await ctx.report_progress(done, len(plan["upload"]))
+
+        uploads = list(plan["upload"].values())
+        created = await _run_bounded(uploads, upload, max_workers, report_progress)
+
+        # Files outside glob keep their entries, so a narrower sync neither deletes nor forgets them
+        manifest = dict(plan["untouched"])
+        manifest.update({relative: {**local[relative], "source_id": source_id}
+                         for relative, source_id in plan["keep"].items()})
+        failures = []
+        for paths, result in zip(uploads, created):
+            if isinstance(result, dict) and result.get("source_id"):
+                for relative in paths:
+                    manifest[relative] = {**local[relative], "source_id": result["source_id"]}
+            else:
+                error = result.get("error") if isinstance(result, dict) else None
+                failure = {"item": paths[0], "action": "upload", "error": error or str(result)}
+                if len(paths) > 1:
+                    failure["same_content"] = paths[1:]
+                failures.append(failure)
+                # Keep what the previous sync recorded, so the next run tries again
+                manifest.update({relative: previous[relative] for relative in paths if relative in previous})
+
+        referenced = {entry["source_id"] for entry in manifest.values()}
+        to_delete = [source_id for source_id in plan["delete"] if source_id not in referenced]
+
+        async def delete(source_id):
+            return await delete_source(tenant_id, api_key, brand_id, source_id)
+
+        async def reprocess(source_id):
+            return await reprocess_source(tenant_id, api_key, brand_id, source_id)
+
+        for action, source_ids, worker in (("delete", to_delete, delete), ("reprocess", plan["reprocess"], reprocess)):
+            for source_id, result in zip(source_ids, await _run_bounded(source_ids, worker, max_workers)):
+                if isinstance(result, dict) and result.get("status") == "error":
+                    failures.append({"item": source_id, "action": action, "error": result.get("error")})
+        await asyncio.to_thread(save_manifest, path, directory, manifest)
+
+        summary["uploaded"] -= sum(1 for failure in failures if failure["action"] == "upload")
+        summary["deleted"] = len(to_delete) - sum(1 for failure in failures if failure["action"] == "delete")
+        summary["reprocessed"] -= sum(1 for failure in failures if failure["action"] == "reprocess")
+        succeeded = summary["uploaded"] + summary["deleted"] + summary["reprocessed"]
+        return {
+            "status": "success" if not failures else ("error" if not succeeded else "partial"),
+            **summary,
+            "failed": len(failures),
+            "failures": failures,
+            "manifest_path": path,
+        }
+    except Exception as e:
+        error_msg = f"Failed to sync {directory} to brand {brand_id}"
+        logger.error("%s: %s", error_msg, e)
+        return {"status": "error", "message": error_msg, "error": str(e)}
+
+@mcp.tool()
+async def get_source(tenant_id: str, api_key: str, brand_id: str, source_id: str) -> any:
     """
     Get source details (Tenant-specific API)
     Requires tenant api_key as bearer token
     """
     try:
-        headers = {"Authorization": f"Bearer {api_key}"}
-        response = requests.get(f"{API_URL}/tenant/{tenant_id}/brand/{brand_id}/source/{source_id}", headers=headers)
+        response = await api.get(f"/tenant/{tenant_id}/brand/{brand_id}/source/{source_id}", api_key=api_key)
         response.raise_for_status()
-        return response.json()
+        return response_json(response)
     except Exception as e:
         error_msg = f"Failed to get source {source_id}"
-        print(error_msg, e)
+        logger.error("%s: %s", error_msg, e)
+        return {"status": "error", "message": error_msg, "error": str(e)}
+
+@mcp.tool()
+async def wait_for_source(tenant_id: str, api_key: str, brand_id: str, source_id: str, timeout: float = 600, ctx: Context = None) -> any:
+    """
+    Wait until a source finishes processing and return it (Tenant-specific API)
+    Requires tenant api_key as bearer token
+    Polls the API server-side with backoff, so there is no need to call get_source repeatedly.
+    Returns the source once its status is COMPLETED or FAILED, or an error after timeout seconds
+    """
+    try:
+        return await _wait_for(f"/tenant/{tenant_id}/brand/{brand_id}/source/{source_id}", api_key, timeout,
+                               f"source {source_id}", ctx)
+    except Exception as e:
+        error_msg = f"Failed to wait for source {source_id}"
+        logger.error("%s: %s", error_msg, e)
         return {"status": "error", "message": error_msg, "error": str(e)}
 
 @mcp.tool()
-def list_sources(tenant_id: str, api_key: str, brand_id: str, source_type: str = None, status: str = None) -> any:
+async def list_sources(tenant_id: str, api_key: str, brand_id: str, source_type: str = None, status: str = None,
+                       fields: list = None, max_items: int = None, summary: bool = False) -> any:
     """
     List sources for a brand (Tenant-specific API)
     Requires tenant api_key as bearer token
     Optional filters:
     - source_type: KNOWLEDGE, GUIDELINES, SAMPLE
     - status: QUEUED, PROCESSING, COMPLETED, FAILED
+    Optional output shaping:
+    - fields: only return these fields of each item, e.g. ["source_id", "name", "status"]
+    - max_items: return at most this many items, plus the total count
+    - summary: only identifying fields and statuses, long text truncated
     """
     try:
-        headers = {"Authorization": f"Bearer {api_key}"}
         params = {}
         if source_type:
             params['source_type'] = source_type
         if status:
             params['status'] = status
             
-        response = requests.get(
-            f"{API_URL}/tenant/{tenant_id}/brand/{brand_id}/source",
+        response = await api.get(
+            f"/tenant/{tenant_id}/brand/{brand_id}/source",
             params=params,
-            headers=headers
+            api_key=api_key
         )
         response.raise_for_status()
-        return response.json()
+        return compact(response_json(response), fields, max_items, summary)
     except Exception as e:
         error_msg = f"Failed to list sources for brand {brand_id}"
-        print(error_msg, e)
+        logger.error("%s: %s", error_msg, e)
         return {"status": "error", "message": error_msg, "error": str(e)}
 
+def _page_fetcher(resource: str, tenant_id: str, api_key: str, path: str):
+    """Fetch one API page of a collection, cached briefly so a cursor resumes on the same data"""
+    async def fetch(params):
+        return await _cached_get(resource, tenant_id, api_key, path, params)
+    return fetch
+
+async def _iter_sources(tenant_id: str, api_key: str, brand_id: str, **filters):
+    """
+    Yield every source of a brand matching filters (source_type, status, created_after, created_before)
+    Only one API page is held at a time, so batch tools can walk any number of sources
+    """
+    fetch = _page_fetcher("source_pages", tenant_id, api_key, f"/tenant/{tenant_id}/brand/{brand_id}/source")
+    async for source, _ in iter_items(fetch, make_filters(**filters), api_filters=("source_type", "status")):
+        yield source
+
 @mcp.tool()
-def delete_source(tenant_id: str, api_key: str, brand_id: str, source_id: str) -> any:
+async def list_sources_page(tenant_id: str, api_key: str, brand_id: str, source_type: str = None,
+                            status: str = None, created_after: str = None, created_before: str = None,
+                            page_size: int = 50, cursor: str = None, fields: list = None,
+                            summary: bool = False) -> any:
+    """
+    List sources for a brand one page at a time (Tenant-specific API)
+    Requires tenant api_key as bearer token
+    Optional filters:
+    - source_type: KNOWLEDGE, GUIDELINES, SAMPLE
+    - status: one or more of QUEUED, PROCESSING, COMPLETED, FAILED (comma-separated)
+    - created_after / created_before: ISO 8601 timestamps
+    Returns page_size items and a next_cursor; pass it back as cursor to get the next page
+    (the filters are kept in the cursor). next_cursor is null on the last page.
+    fields / summary shape each item as in list_sources
+    """
+    try:
+        filters = make_filters(status, created_after, created_before, source_type=source_type)
+        fetch = _page_fetcher("source_pages", tenant_id, api_key, f"/tenant/{tenant_id}/brand/{brand_id}/source")
+        page = await read_page(fetch, filters, max(1, page_size), cursor, api_filters=("source_type", "status"))
+        page["items"] = compact(page["items"], fields, summary=summary)
+        return page
+    except Exception as e:
+        error_msg = f"Failed to list sources for brand {brand_id}"
+        logger.error("%s: %s", error_msg, e)
+        return {"status": "error", "message": error_msg, "error": str(e)}
+
+@mcp.tool()
+async def delete_source(tenant_id: str, api_key: str, brand_id: str, source_id: str) -> any:
     """
     Delete a source and its associated data (Tenant-specific API)
     Requires tenant api_key as bearer token
     """
     try:
-        headers = {"Authorization": f"Bearer {api_key}"}
-        response = requests.delete(f"{API_URL}/tenant/{tenant_id}/brand/{brand_id}/source/{source_id}", headers=headers)
+        response = await api.delete(f"/tenant/{tenant_id}/brand/{brand_id}/source/{source_id}", api_key=api_key)
+        await cache.invalidate(tenant_id, f"/tenant/{tenant_id}/brand/{brand_id}/source")
         response.raise_for_status()
         return {"status": "success", "message": f"Source {source_id} deleted"}
     except Exception as e:
         error_msg = f"Failed to delete source {source_id}"
-        print(error_msg, e)
+        logger.error("%s: %s", error_msg, e)
         return {"status": "error", "message": error_msg, "error": str(e)}
 
 @mcp.tool()
-def reprocess_source(tenant_id: str, api_key: str, brand_id: str, source_id: str) -> any:
+async def reprocess_source(tenant_id: str, api_key: str, brand_id: str, source_id: str) -> any:
     """
     Trigger reprocessing of a source (Tenant-specific API)
     Requires tenant api_key as bearer token
     """
     try:
-        headers = {"Authorization": f"Bearer {api_key}"}
-        response = requests.post(f"{API_URL}/tenant/{tenant_id}/brand/{brand_id}/source/{source_id}/reprocess", headers=headers)
+        response = await api.post(f"/tenant/{tenant_id}/brand/{brand_id}/source/{source_id}/reprocess", api_key=api_key)
+        await cache.invalidate(tenant_id, f"/tenant/{tenant_id}/brand/{brand_id}/source")
         response.raise_for_status()
-        return response.json()
+        return response_json(response)
     except Exception as e:
         error_msg = f"Failed to reprocess source {source_id}"
-        print(error_msg, e)
+        logger.error("%s: %s", error_msg, e)
         return {"status": "error", "message": error_msg, "error": str(e)}
 
 @mcp.tool()
-def create_prompt(tenant_id: str, api_key: str, name: str, content_type: str, prompt_text: str, 
+async def create_prompt(tenant_id: str, api_key: str, name: str, content_type: str, prompt_text: str, 
                  description: str = None, settings: dict = None) -> any:
     """
     Create a new prompt for a tenant (Tenant-specific API)
@@ -340,7 +974,6 @@ def create_prompt(tenant_id: str, api_key: str, name: str, content_type: str, pr
     content_type must be one of: VIDEO, AUDIO, TEXT, IMAGE
     """
     try:
-        headers = {"Authorization": f"Bearer {api_key}"}
         payload = {
             "name": name,
             "content_type": content_type,
@@ -348,32 +981,30 @@ def create_prompt(tenant_id: str, api_key: str, name: str, content_type: str, pr
             "description": description,
             "settings": settings or {}
         }
-        response = requests.post(f"{API_URL}/tenant/{tenant_id}/prompt", json=payload, headers=headers)
+        response = await api.post(f"/tenant/{tenant_id}/prompt", json=payload, api_key=api_key)
+        await cache.invalidate(tenant_id, f"/tenant/{tenant_id}/prompt")
         response.raise_for_status()
-        return response.json()
+        return response_json(response)
     except Exception as e:
         error_msg = "Failed to create prompt"
-        print(error_msg, e)
+        logger.error("%s: %s", error_msg, e)
         return {"status": "error", "message": error_msg, "error": str(e)}
 
 @mcp.tool()
-def get_prompt(tenant_id: str, api_key: str, prompt_id: str) -> any:
+async def get_prompt(tenant_id: str, api_key: str, prompt_id: str) -> any:
     """
     Get prompt details (Tenant-specific API)
     Requires tenant api_key as bearer token
     """
     try:
-        headers = {"Authorization": f"Bearer {api_key}"}
-        response = requests.get(f"{API_URL}/tenant/{tenant_id}/prompt/{prompt_id}", headers=headers)
-        response.raise_for_status()
-        return response.json()
+        return await _cached_get("prompt", tenant_id, api_key, f"/tenant/{tenant_id}/prompt/{prompt_id}")
     except Exception as e:
         error_msg = f"Failed to get prompt {prompt_id}"
-        print(error_msg, e)
+        logger.error("%s: %s", error_msg, e)
         return {"status": "error", "message": error_msg, "error": str(e)}
 
 @mcp.tool()
-def list_prompts(tenant_id: str, api_key: str, content_type: str = None) -> any:
+async def list_prompts(tenant_id: str, api_key: str, content_type: str = None) -> any:
     """
     List all active prompts for a tenant (Tenant-specific API)
     Requires tenant api_key as bearer token
@@ -381,21 +1012,18 @@ def list_prompts(tenant_id: str, api_key: str, content_type: str = None) -> any:
     - content_type: VIDEO, AUDIO, TEXT, IMAGE
     """
     try:
-        headers = {"Authorization": f"Bearer {api_key}"}
         params = {}
         if content_type:
             params['content_type'] = content_type
             
-        response = requests.get(f"{API_URL}/tenant/{tenant_id}/prompt", params=params, headers=headers)
-        response.raise_for_status()
-        return response.json()
+        return await _cached_get("prompts", tenant_id, api_key, f"/tenant/{tenant_id}/prompt", params)
     except Exception as e:
         error_msg = f"Failed to list prompts for tenant {tenant_id}"
-        print(error_msg, e)
+        logger.error("%s: %s", error_msg, e)
         return {"status": "error", "message": error_msg, "error": str(e)}
 
 @mcp.tool()
-def update_prompt(tenant_id: str, api_key: str, prompt_id: str, updates: dict) -> any:
+async def update_prompt(tenant_id: str, api_key: str, prompt_id: str, updates: dict) -> any:
     """
     Update prompt details (Tenant-specific API)
     Requires tenant api_key as bearer token
@@ -406,72 +1034,71 @@ def update_prompt(tenant_id: str, api_key: str, prompt_id: str, updates: dict) -
     - settings: dict
     """
     try:
-        headers = {"Authorization": f"Bearer {api_key}"}
-        response = requests.put(f"{API_URL}/tenant/{tenant_id}/prompt/{prompt_id}", json=updates, headers=headers)
+        response = await api.put(f"/tenant/{tenant_id}/prompt/{prompt_id}", json=updates, api_key=api_key)
+        await cache.invalidate(tenant_id, f"/tenant/{tenant_id}/prompt/{prompt_id}")
+        await cache.invalidate(tenant_id, f"/tenant/{tenant_id}/prompt")
         response.raise_for_status()
-        return response.json()
+        return response_json(response)
     except Exception as e:
         error_msg = f"Failed to update prompt {prompt_id}"
-        print(error_msg, e)
+        logger.error("%s: %s", error_msg, e)
         return {"status": "error", "message": error_msg, "error": str(e)}
 
 @mcp.tool()
-def delete_prompt(tenant_id: str, api_key: str, prompt_id: str) -> any:
+async def delete_prompt(tenant_id: str, api_key: str, prompt_id: str) -> any:
     """
     Delete a prompt (Tenant-specific API)
     Requires tenant api_key as bearer token
     """
     try:
-        headers = {"Authorization": f"Bearer {api_key}"}
-        response = requests.delete(f"{API_URL}/tenant/{tenant_id}/prompt/{prompt_id}", headers=headers)
+        response = await api.delete(f"/tenant/{tenant_id}/prompt/{prompt_id}", api_key=api_key)
+        await cache.invalidate(tenant_id, f"/tenant/{tenant_id}/prompt/{prompt_id}")
+        await cache.invalidate(tenant_id, f"/tenant/{tenant_id}/prompt")
         response.raise_for_status()
         return {"status": "success", "message": f"Prompt {prompt_id} deleted"}
     except Exception as e:
         error_msg = f"Failed to delete prompt {prompt_id}"
-        print(error_msg, e)
+        logger.error("%s: %s", error_msg, e)
         return {"status": "error", "message": error_msg, "error": str(e)}
 
 @mcp.tool()
-def create_worker(tenant_id: str, api_key: str, output_type: str, prompt: str, name: str, description: str = None) -> any:
+async def create_worker(tenant_id: str, api_key: str, output_type: str, prompt: str, name: str, description: str = None) -> any:
     """
     Create a new worker for a tenant (Tenant-specific API)
     Requires tenant api_key as bearer token
     output_type must be one of: TEXT
     """
     try:
-        headers = {"Authorization": f"Bearer {api_key}"}
         payload = {
             "output_type": output_type,
             "prompt": prompt,
             "name": name,
             "description": description
         }
-        response = requests.post(f"{API_URL}/tenant/{tenant_id}/worker", json=payload, headers=headers)
+        response = await api.post(f"/tenant/{tenant_id}/worker", json=payload, api_key=api_key)
+        await cache.invalidate(tenant_id, f"/tenant/{tenant_id}/worker")
         response.raise_for_status()
-        return response.json()
+        return response_json(response)
     except Exception as e:
         error_msg = "Failed to create worker"
-        print(error_msg, e)
+        logger.error("%s: %s", error_msg, e)
         return {"status": "error", "message": error_msg, "error": str(e)}
 
 @mcp.tool()
-def get_worker(tenant_id: str, api_key: str, worker_id: str) -> any:
+async def get_worker(tenant_id: str, api_key: str, worker_id: str) -> any:
     """
     Get worker details (Tenant-specific API)
     Requires tenant api_key as bearer token
     """
     try:
-        headers = {"Authorization": f"Bearer {api_key}"}
-        response = requests.get(f"{API_URL}/tenant/{tenant_id}/worker/{worker_id}", headers=headers)
-        response.raise_for_status()
-        return response.json()
+        return await _cached_get("worker", tenant_id, api_key, f"/tenant/{tenant_id}/worker/{worker_id}")
     except Exception as e:
         error_msg = f"Failed to get worker {worker_id}"
-        print(error_msg, e)
+        logger.error("%s: %s", error_msg, e)
         return {"status": "error", "message": error_msg, "error": str(e)}
 
 @mcp.tool()
-def list_workers(tenant_id: str, api_key: str, output_type: str = None) -> any:
+async def list_workers(tenant_id: str, api_key: str, output_type: str = None) -> any:
     """
     List all workers for a tenant (Tenant-specific API)
     Requires tenant api_key as bearer token
@@ -479,21 +1106,18 @@ def list_workers(tenant_id: str, api_key: str, output_type: str = None) -> any:
     - output_type: TEXT
     """
     try:
-        headers = {"Authorization": f"Bearer {api_key}"}
         params = {}
         if output_type:
             params['output_type'] = output_type
             
-        response = requests.get(f"{API_URL}/tenant/{tenant_id}/worker", params=params, headers=headers)
-        response.raise_for_status()
-        return response.json()
+        return await _cached_get("workers", tenant_id, api_key, f"/tenant/{tenant_id}/worker", params)
     except Exception as e:
         error_msg = f"Failed to list workers for tenant {tenant_id}"
-        print(error_msg, e)
+        logger.error("%s: %s", error_msg, e)
         return {"status": "error", "message": error_msg, "error": str(e)}
 
 @mcp.tool()
-def update_worker(tenant_id: str, api_key: str, worker_id: str, updates: dict) -> any:
+async def update_worker(tenant_id: str, api_key: str, worker_id: str, updates: dict) -> any:
     """
     Update worker details (Tenant-specific API)
     Requires tenant api_key as bearer token
@@ -503,18 +1127,56 @@ def update_worker(tenant_id: str, api_key: str, worker_id: str, updates: dict) -
     - description: str
     """
     try:
-        headers = {"Authorization": f"Bearer {api_key}"}
-        response = requests.put(f"{API_URL}/tenant/{tenant_id}/worker/{worker_id}", json=updates, headers=headers)
+        response = await api.put(f"/tenant/{tenant_id}/worker/{worker_id}", json=updates, api_key=api_key)
+        await cache.invalidate(tenant_id, f"/tenant/{tenant_id}/worker/{worker_id}")
+        await cache.invalidate(tenant_id, f"/tenant/{tenant_id}/worker")
         response.raise_for_status()
-        return response.json()
+        return response_json(response)
     except Exception as e:
         error_msg = f"Failed to update worker {worker_id}"
-        print(error_msg, e)
+        logger.error("%s: %s", error_msg, e)
         return {"status": "error", "message": error_msg, "error": str(e)}
 
+def _generation_payload(context: str = None, source_ids: list = None, use_source_context: bool = True,
+                        metadata: dict = None) -> dict:
+    payload = {}
+    if context:
+        payload['context'] = context
+    if source_ids is not None:
+        payload['source_ids'] = source_ids
+    if use_source_context is not None:
+        payload['use_source_context'] = use_source_context
+    if metadata:
+        payload['metadata'] = metadata
+    return payload
+
+async def _worker_content_type(tenant_id: str, api_key: str, worker_id: str) -> str:
+    """Content type whose concurrency limit a worker's generations count against"""
+    worker = await _cached_get("worker", tenant_id, api_key, f"/tenant/{tenant_id}/worker/{worker_id}")
+    return "IMAGE" if worker.get("output_type") == "MULTI_MODAL" else "TEXT"
+
+async def _submit_generation(tenant_id: str, api_key: str, brand_id: str, worker_id: str, payload: dict,
+                             retry: bool, content_type: str) -> dict:
+    """
+    Start a generation within the tenant's concurrency limit for content_type and return it
+    content_type comes from _worker_content_type
+    """
+    path = f"/tenant/{tenant_id}/brand/{brand_id}/worker/{worker_id}/generation"
+
+    async def start():
+        response = await api.post(path, json=payload, api_key=api_key, retry=retry)
+        await cache.invalidate(tenant_id, path)
+        return response
+
+    def generation_path(generation):
+        return f"{path}/{generation['generation_id']}" if generation.get("generation_id") else None
+
+    return await _start_job(tenant_id, api_key, content_type, start, generation_path)
+
 @mcp.tool()
-def create_generation(tenant_id: str, api_key: str, brand_id: str, worker_id: str, 
-                     context: str = None, source_ids: list = None, use_source_context: bool = True) -> any:
+async def create_generation(tenant_id: str, api_key: str, brand_id: str, worker_id: str, 
+                     context: str = None, source_ids: list = None, use_source_context: bool = True,
+                     metadata: dict = None, retry: bool = False) -> any:
     """
     Start a new generation process (Tenant-specific API)
     Requires tenant api_key as bearer token
@@ -522,67 +1184,571 @@ def create_generation(tenant_id: str, api_key: str, brand_id: str, worker_id: st
     - context: Additional context for the generation
     - source_ids: Array of source IDs to include in full during generation
     - use_source_context: Whether to use source analysis in generation (default: true)
+    - metadata: Key/value pairs stored with the generation
+    - retry: Retry on throttling or transient errors, sending an Idempotency-Key so the
+      generation is only started once (default: false)
+    Use wait_for_generation to get the finished result
     """
     try:
-        headers = {"Authorization": f"Bearer {api_key}"}
-        payload = {}
-        if context:
-            payload['context'] = context
-        if source_ids is not None:
-            payload['source_ids'] = source_ids
-        if use_source_context is not None:
-            payload['use_source_context'] = use_source_context
-            
-        response = requests.post(
-            f"{API_URL}/tenant/{tenant_id}/brand/{brand_id}/worker/{worker_id}/generation",
-            json=payload,
-            headers=headers
-        )
-        response.raise_for_status()
-        return response.json()
+        payload = _generation_payload(context, source_ids, use_source_context, metadata)
+        content_type = await _worker_content_type(tenant_id, api_key, worker_id)
+        return await _submit_generation(tenant_id, api_key, brand_id, worker_id, payload, retry, content_type)
     except Exception as e:
         error_msg = "Failed to create generation"
-        print(error_msg, e)
+        logger.error("%s: %s", error_msg, e)
         return {"status": "error", "message": error_msg, "error": str(e)}
 
 @mcp.tool()
-def get_generation(tenant_id: str, api_key: str, brand_id: str, worker_id: str, generation_id: str) -> any:
+async def get_generation(tenant_id: str, api_key: str, brand_id: str, worker_id: str, generation_id: str,
+                         fields: list = None) -> any:
     """
     Get generation details (Tenant-specific API)
     Requires tenant api_key as bearer token
+    Optional fields: only return these fields, e.g. ["status", "result.content"]
     """
     try:
-        headers = {"Authorization": f"Bearer {api_key}"}
-        response = requests.get(
-            f"{API_URL}/tenant/{tenant_id}/brand/{brand_id}/worker/{worker_id}/generation/{generation_id}",
-            headers=headers
+        generation = await _stored_get(
+            "generation", tenant_id, api_key,
+            f"/tenant/{tenant_id}/brand/{brand_id}/worker/{worker_id}/generation/{generation_id}"
         )
-        response.raise_for_status()
-        return response.json()
+        return compact(generation, fields)
     except Exception as e:
         error_msg = f"Failed to get generation {generation_id}"
-        print(error_msg, e)
+        logger.error("%s: %s", error_msg, e)
+        return {"status": "error", "message": error_msg, "error": str(e)}
+
+@mcp.tool()
+async def get_generation_version(tenant_id: str, api_key: str, brand_id: str, worker_id: str, generation_id: str,
+                                 version_id: str, fields: list = None) -> any:
+    """
+    Get one version of a generation (Tenant-specific API)
+    Requires tenant api_key as bearer token
+    get_generation returns the latest version; each feedback starts a new one
+    Optional fields: only return these fields, e.g. ["status", "result.content"]
+    """
+    try:
+        version = await _stored_get(
+            "generation_version", tenant_id, api_key,
+            f"/tenant/{tenant_id}/brand/{brand_id}/worker/{worker_id}/generation/{generation_id}/version/{version_id}"
+        )
+        return compact(version, fields)
+    except Exception as e:
+        error_msg = f"Failed to get version {version_id} of generation {generation_id}"
+        logger.error("%s: %s", error_msg, e)
+        return {"status": "error", "message": error_msg, "error": str(e)}
+
+@mcp.tool()
+async def submit_generation_feedback(tenant_id: str, api_key: str, brand_id: str, worker_id: str,
+                                     generation_id: str, version_id: str, feedback: str,
+                                     output_index: int = None) -> any:
+    """
+    Submit feedback on a generation version, which starts a new version (Tenant-specific API)
+    Requires tenant api_key as bearer token
+    Optional output_index: 0-based output the feedback applies to, when the generation has
+    several; all outputs if omitted
+    Use wait_for_generation to get the new version once it is finished
+    """
+    try:
+        generations_path = f"/tenant/{tenant_id}/brand/{brand_id}/worker/{worker_id}/generation"
+        path = f"{generations_path}/{generation_id}"
+        payload = {"feedback": feedback}
+        if output_index is not None:
+            payload["output_index"] = output_index
+
+        async def start():
+            response = await api.post(f"{path}/version/{version_id}/feedback", json=payload, api_key=api_key)
+            # The generation now points at the new version; stored earlier versions stay valid
+            await cache.invalidate(tenant_id, path)
+            await cache.invalidate(tenant_id, f"{path}/version")
+            await cache.invalidate(tenant_id, generations_path)
+            return response
+
+        def version_path(version):
+            return f"{path}/version/{version['version_id']}" if version.get("version_id") else None
+
+        content_type = await _worker_content_type(tenant_id, api_key, worker_id)
+        return await _start_job(tenant_id, api_key, content_type, start, version_path)
+    except Exception as e:
+        error_msg = f"Failed to submit feedback on generation {generation_id}"
+        logger.error("%s: %s", error_msg, e)
         return {"status": "error", "message": error_msg, "error": str(e)}
 
 @mcp.tool()
-def list_generations(tenant_id: str, api_key: str, brand_id: str, worker_id: str) -> any:
+async def wait_for_generation(tenant_id: str, api_key: str, brand_id: str, worker_id: str, generation_id: str,
+                              timeout: float = 600, ctx: Context = None) -> any:
+    """
+    Wait until a generation finishes and return it (Tenant-specific API)
+    Requires tenant api_key as bearer token
+    Polls the API server-side with backoff, so there is no need to call get_generation repeatedly.
+    Returns the generation once its status is COMPLETED or FAILED, or an error after timeout seconds
+    """
+    try:
+        return await _wait_for(
+            f"/tenant/{tenant_id}/brand/{brand_id}/worker/{worker_id}/generation/{generation_id}",
+            api_key, timeout, f"generation {generation_id}", ctx
+        )
+    except Exception as e:
+        error_msg = f"Failed to wait for generation {generation_id}"
+        logger.error("%s: %s", error_msg, e)
+        return {"status": "error", "message": error_msg, "error": str(e)}
+
+@mcp.tool()
+async def list_generations(tenant_id: str, api_key: str, brand_id: str, worker_id: str,
+                           fields: list = None, max_items: int = None, summary: bool = False) -> any:
     """
     List all generations for a brand and worker (Tenant-specific API)
     Requires tenant api_key as bearer token
+    Optional output shaping:
+    - fields: only return these fields of each item, e.g. ["generation_id", "status", "result.content"]
+    - max_items: return at most this many items, plus the total count
+    - summary: only identifying fields and statuses, long text truncated
     """
     try:
-        headers = {"Authorization": f"Bearer {api_key}"}
-        response = requests.get(
-            f"{API_URL}/tenant/{tenant_id}/brand/{brand_id}/worker/{worker_id}/generation",
-            headers=headers
+        response = await api.get(
+            f"/tenant/{tenant_id}/brand/{brand_id}/worker/{worker_id}/generation",
+            api_key=api_key
         )
         response.raise_for_status()
-        return response.json()
+        return compact(response_json(response), fields, max_items, summary)
     except Exception as e:
         error_msg = f"Failed to list generations for worker {worker_id}"
-        print(f"{error_msg}: {e}")
+        logger.error("%s: %s", error_msg, e)
+        return {"status": "error", "message": error_msg, "error": str(e)}
+
+async def _iter_generations(tenant_id: str, api_key: str, brand_id: str, worker_id: str, **filters):
+    """
+    Yield every generation of a brand and worker matching filters (status, created_after, created_before)
+    Only one API page is held at a time, so batch tools can walk any number of generations
+    """
+    fetch = _page_fetcher("generation_pages", tenant_id, api_key,
+                          f"/tenant/{tenant_id}/brand/{brand_id}/worker/{worker_id}/generation")
+    async for generation, _ in iter_items(fetch, make_filters(**filters)):
+        yield generation
+
+@mcp.tool()
+async def list_generations_page(tenant_id: str, api_key: str, brand_id: str, worker_id: str,
+                                status: str = None, created_after: str = None, created_before: str = None,
+                                page_size: int = 50, cursor: str = None, fields: list = None,
+                                summary: bool = False) -> any:
+    """
+    List generations for a brand and worker one page at a time (Tenant-specific API)
+    Requires tenant api_key as bearer token
+    Optional filters:
+    - status: one or more of NOT_STARTED, QUEUED, PROCESSING, COMPLETED, FAILED (comma-separated)
+    - created_after / created_before: ISO 8601 timestamps
+    Returns page_size items and a next_cursor; pass it back as cursor to get the next page
+    (the filters are kept in the cursor). next_cursor is null on the last page.
+    fields / summary shape each item as in list_generations
+    """
+    try:
+        filters = make_filters(status, created_after, created_before)
+        fetch = _page_fetcher("generation_pages", tenant_id, api_key,
+                              f"/tenant/{tenant_id}/brand/{brand_id}/worker/{worker_id}/generation")
+        page = await read_page(fetch, filters, max(1, page_size), cursor)
+        page["items"] = compact(page["items"], fields, summary=summary)
+        return page
+    except Exception as e:
+        error_msg = f"Failed to list generations for worker {worker_id}"
+        logger.error("%s: %s", error_msg, e)
+        return {"status": "error", "message": error_msg, "error": str(e)}
+
+# Pending generations of one brand from which a batch polls the brand's generation list
+# instead of fetching each generation on its own
+BATCH_LIST_POLL_THRESHOLD = 5
+
+def _batch_generation_jobs(jobs: list, brand_id: str = None) -> list:
+    """Validate the jobs of create_generations_batch, filling in the default brand_id"""
+    if not jobs:
+        raise ValueError("No jobs given")
+    normalized = []
+    for index, job in enumerate(jobs):
+        if not isinstance(job, dict):
+            raise ValueError(f"Job {index} must be an object with brand_id, context, source_ids, metadata")
+        job_brand_id = job.get("brand_id") or brand_id
+        if not job_brand_id:
+            raise ValueError(f"Job {index} has no brand_id and no default brand_id was given")
+        normalized.append({
+            "brand_id": job_brand_id,
+            "payload": _generation_payload(job.get("context"), job.get("source_ids"),
+                                           job.get("use_source_context", True), job.get("metadata")),
+        })
+    return normalized
+
+class _BatchOutput:
+    """Per-job results of a generation batch, kept in memory or appended to a JSONL file as they finish"""
+
+    def __init__(self, output_path: str = None):
+        self.results = {}
+        self.path = None
+        self._file = None
+        if output_path:
+            self.path = str(Path(output_path).expanduser())
+            self._file = open(self.path, "w", encoding="utf-8")
+
+    def add(self, index: int, result: dict) -> None:
+        result = {"index": index, **result}
+        if self._file is not None:
+            self._file.write(dumps(result) + "\n")
+            self._file.flush()
+            # Only keep what the summary needs
+            result = {key: result[key] for key in ("index", "brand_id", "generation_id", "status", "error")
+                      if key in result}
+        self.results[index] = result
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+
+async def _track_generations(tenant_id: str, api_key: str, worker_id: str, pending: dict, timeout: float,
+                             max_workers: int, on_finished) -> dict:
+    """
+    Poll submitted generations until each is COMPLETED or FAILED, or timeout seconds pass
+    pending maps job index to (brand_id, generation_id). Every round fetches all pending
+    generations: one list walk for a brand with many of them, single gets otherwise. Rounds
+    are spaced like the waiter's polls. on_finished is awaited with (index, generation).
+    Returns the latest state of the jobs still pending at the timeout
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    latest = {}
+    delay = waiter.initial_delay
+
+    async def poll_brand(brand_jobs):
+        brand_id = brand_jobs[0][1][0]
+        path = f"/tenant/{tenant_id}/brand/{brand_id}/worker/{worker_id}/generation"
+        wanted = {generation_id: index for index, (_, generation_id) in brand_jobs}
+        states = {}
+        try:
+            if len(wanted) >= BATCH_LIST_POLL_THRESHOLD:
+                async def fetch(params):
+                    response = await api.get(path, params=params, api_key=api_key, priority="bulk")
+                    response.raise_for_status()
+                    return response_json(response)
+
+                async for generation, _ in iter_items(fetch):
+                    index = wanted.get(generation.get("generation_id")) if isinstance(generation, dict) else None
+                    if index is not None:
+                        states[index] = generation
+                        if len(states) == len(wanted):
+                            break
+            else:
+                for generation_id, index in wanted.items():
+                    response = await api.get(f"{path}/{generation_id}", api_key=api_key, priority="bulk")
+                    response.raise_for_status()
+                    states[index] = response_json(response)
+        except Exception as e:
+            # Polling errors are retried in the next round, until the timeout
+            logger.warning("Polling generations of brand %s failed: %s", brand_id, e)
+        return states
+
+    while pending:
+        by_brand = {}
+        for index, job in pending.items():
+            by_brand.setdefault(job[0], []).append((index, job))
+        # Brands with few pending generations are split so their gets run in parallel
+        groups = []
+        for brand_jobs in by_brand.values():
+            if len(brand_jobs) >= BATCH_LIST_POLL_THRESHOLD:
+                groups.append(brand_jobs)
+            else:
+                groups += [[job] for job in brand_jobs]
+        for states in await _run_bounded(groups, poll_brand, max_workers):
+            for index, state in states.items():
+                latest[index] = state
+                if not is_pending(state):
+                    del pending[index]
+                    await on_finished(index, state)
+        remaining = deadline - loop.time()
+        if not pending or remaining <= 0:
+            break
+        await asyncio.sleep(min(remaining, delay * random.uniform(1 - waiter.jitter, 1 + waiter.jitter)))
+        delay = min(delay * waiter.multiplier, waiter.max_delay)
+    return {index: latest.get(index) for index in pending}
+
+@mcp.tool()
+async def create_generations_batch(tenant_id: str, api_key: str, worker_id: str, jobs: list,
+                                   brand_id: str = None, max_workers: int = 8, wait: bool = True,
+                                   timeout: float = 1800, output_path: str = None, fields: list = None,
+                                   retry: bool = True, ctx: Context = None) -> any:
+    """
+    Run one worker over many brands or contexts in one call (Tenant-specific API)
+    Requires tenant api_key as bearer token
+    jobs is a list of objects, each with:
+    - brand_id: brand to generate for (defaults to the brand_id argument)
+    - context, source_ids, use_source_context, metadata: as in create_generation
+    Generations are started with up to max_workers in flight, and no more running at once than the
+    tenant's concurrency_limits allow for the worker's output type. With wait (default: true) they are then
+    tracked server-side until COMPLETED or FAILED, or until timeout seconds pass.
+    retry: retry each start on throttling or transient errors, sending an Idempotency-Key (default: true)
+    Returns counts and one result per job, in job order, with its generation_id, status and the
+    generation or the error. fields: only keep these fields of each generation, e.g. ["status", "result.content"]
+    output_path: write one JSON line per job to this file as it finishes and return only counts and failures
+    """
+    output = None
+    try:
+        items = _batch_generation_jobs(jobs, brand_id)
+        content_type = await _worker_content_type(tenant_id, api_key, worker_id)
+        output = _BatchOutput(output_path)
+        total = len(items)
+        finished = 0
+
+        async def report_progress():
+            if ctx is not None:
+                await ctx.report_progress(finished, total)
+
+        async def submit(item):
+            try:
+                return await _submit_generation(tenant_id, api_key, item["brand_id"], worker_id, item["payload"],
+                                                retry, content_type)
+            except Exception as e:
+                return e
+
+        submitted = await _run_bounded(items, submit, max_workers)
+
+        pending = {}
+        for index, (item, result) in enumerate(zip(items, submitted)):
+            generation_id = result.get("generation_id") if isinstance(result, dict) else None
+            if generation_id is None:
+                finished += 1
+                output.add(index, {"brand_id": item["brand_id"], "status": "error",
+                                   "error": f"Failed to create generation: {result}"})
+            elif wait and is_pending(result):
+                pending[index] = (item["brand_id"], generation_id)
+            else:
+                finished += 1
+                output.add(index, {"brand_id": item["brand_id"], "generation_id": generation_id,
+                                   "status": result.get("status"), "generation": compact(result, fields)})
+        await report_progress()
+
+        async def on_finished(index, generation):
+            nonlocal finished
+            finished += 1
+            brand, generation_id = pending_jobs[index]
+            output.add(index, {"brand_id": brand, "generation_id": generation_id,
+                               "status": generation.get("status"), "generation": compact(generation, fields)})
+            await report_progress()
+
+        pending_jobs = dict(pending)
+        if pending:
+            timed_out = await _track_generations(tenant_id, api_key, worker_id, pending, timeout,
+                                                 max_workers, on_finished)
+            for index, state in timed_out.items():
+                brand, generation_id = pending_jobs[index]
+                output.add(index, {"brand_id": brand, "generation_id": generation_id, "status": "error",
+                                   "error": f"Timed out after {timeout}s",
+                                   "last_state": compact(state, fields)})
+
+        results = [output.results[index] for index in range(total)]
+        failures = [result for result in results
+                    if result["status"] in ("error", "FAILED")]
+        created = sum(1 for result in results if result.get("generation_id"))
+        summary = {
+            "status": "success" if not failures else ("error" if len(failures) == total else "partial"),
+            "total": total,
+            "created": created,
+            "completed": sum(1 for result in results if result["status"] == "COMPLETED"),
+            "failed": len(failures),
+        }
+        if output.path:
+            return {**summary, "output_path": output.path, "failures": failures}
+        return {**summary, "results": results}
+    except Exception as e:
+        error_msg = f"Failed to run generation batch for worker {worker_id}"
+        logger.error("%s: %s", error_msg, e)
+        return {"status": "error", "message": error_msg, "error": str(e)}
+    finally:
+        if output is not None:
+            output.close()
+
+def _remember_conversation_token(tenant_id: str, api_key: str, conversation: dict) -> None:
+    if isinstance(conversation, dict) and conversation.get("token"):
+        path = f"/tenant/{tenant_id}/brand/{conversation.get('brand_id')}/conversation/{conversation.get('conversation_id')}"
+        cache.set("conversation_token", api_key, tenant_id, path, None, conversation["token"])
+
+@mcp.tool()
+async def create_conversation(tenant_id: str, api_key: str, brand_id: str, name: str = None,
+                              metadata: dict = None) -> any:
+    """
+    Start a new conversation with a brand (Tenant-specific API)
+    Requires tenant api_key as bearer token
+    Optional:
+    - name: Name for the conversation (default: New Chat <timestamp>)
+    - metadata: Key/value pairs stored with the conversation
+    Use send_message to chat in it
+    """
+    try:
+        payload = {}
+        if name:
+            payload["name"] = name
+        if metadata:
+            payload["metadata"] = metadata
+        response = await api.post(f"/tenant/{tenant_id}/brand/{brand_id}/conversation", json=payload, api_key=api_key)
+        await cache.invalidate(tenant_id, f"/tenant/{tenant_id}/brand/{brand_id}/conversation")
+        response.raise_for_status()
+        conversation = response_json(response)
+        _remember_conversation_token(tenant_id, api_key, conversation)
+        return conversation
+    except Exception as e:
+        error_msg = f"Failed to create conversation for brand {brand_id}"
+        logger.error("%s: %s", error_msg, e)
+        return {"status": "error", "message": error_msg, "error": str(e)}
+
+@mcp.tool()
+async def get_conversation(tenant_id: str, api_key: str, brand_id: str, conversation_id: str,
+                           fields: list = None, max_items: int = None) -> any:
+    """
+    Get a conversation with its metadata and messages (Tenant-specific API)
+    Requires tenant api_key as bearer token
+    Optional output shaping:
+    - fields: only return these fields, e.g. ["name", "chat_messages"]
+    - max_items: return at most this many messages, plus the total count
+    """
+    try:
+        response = await api.get(f"/tenant/{tenant_id}/brand/{brand_id}/conversation/{conversation_id}", api_key=api_key)
+        response.raise_for_status()
+        conversation = response_json(response)
+        _remember_conversation_token(tenant_id, api_key, conversation)
+        return compact(conversation, fields, max_items)
+    except Exception as e:
+        error_msg = f"Failed to get conversation {conversation_id}"
+        logger.error("%s: %s", error_msg, e)
         return {"status": "error", "message": error_msg, "error": str(e)}
 
+@mcp.tool()
+async def list_conversations(tenant_id: str, api_key: str, brand_id: str, fields: list = None,
+                             max_items: int = None, summary: bool = False) -> any:
+    """
+    List the conversations of a brand, without their messages (Tenant-specific API)
+    Requires tenant api_key as bearer token
+    Optional output shaping:
+    - fields: only return these fields of each item, e.g. ["conversation_id", "name", "updated_at"]
+    - max_items: return at most this many items, plus the total count
+    - summary: only identifying fields, long text truncated
+    """
+    try:
+        response = await api.get(f"/tenant/{tenant_id}/brand/{brand_id}/conversation", api_key=api_key)
+        response.raise_for_status()
+        return compact(response_json(response), fields, max_items, summary)
+    except Exception as e:
+        error_msg = f"Failed to list conversations for brand {brand_id}"
+        logger.error("%s: %s", error_msg, e)
+        return {"status": "error", "message": error_msg, "error": str(e)}
+
+async def _report_chunk(ctx: Context, count: int, text: str) -> None:
+    """Stream one reply chunk to a client that asked for progress"""
+    meta = ctx.request_context.meta
+    if meta is None or meta.progressToken is None:
+        return
+    if _PROGRESS_MESSAGES:
+        await ctx.report_progress(count, None, message=text)
+    else:
+        # Progress notifications carry no text before mcp 1.10; the chunk goes out as a log message
+        await ctx.report_progress(count)
+        await ctx.log("info", text, logger_name="chat_stream")
+
+@mcp.tool()
+async def send_message(tenant_id: str, api_key: str, brand_id: str, conversation_id: str, message: str,
+                       conversation_token: str = None, timeout: float = 120, ctx: Context = None) -> any:
+    """
+    Send a message in a conversation and return the brand's reply (Tenant-specific API)
+    Requires tenant api_key as bearer token
+    The reply is streamed over a WebSocket kept open for the conversation and reused by its later
+    messages. Each chat_stream chunk is sent to clients that asked for progress as it arrives.
+    conversation_token: the conversation's token, looked up with the api_key when not given
+    Returns the full reply, its chunk count and the time to the first chunk
+    """
+    try:
+        if not conversation_token:
+            path = f"/tenant/{tenant_id}/brand/{brand_id}/conversation/{conversation_id}"
+            conversation_token = cache.get("conversation_token", api_key, tenant_id, path)
+            if conversation_token is MISSING:
+                response = await api.get(path, api_key=api_key)
+                response.raise_for_status()
+                conversation = response_json(response)
+                _remember_conversation_token(tenant_id, api_key, conversation)
+                conversation_token = conversation.get("token")
+            if not conversation_token:
+                raise ValueError(f"Conversation {conversation_id} has no token")
+
+        async def on_chunk(count, text):
+            if ctx is not None:
+                await _report_chunk(ctx, count, text)
+
+        payload = {"message": message, "conversation_id": conversation_id, "tenant_id": tenant_id,
+                   "brand_id": brand_id}
+        reply = await chat.send(conversation_token, payload, on_chunk, timeout)
+        return {"status": "success", "conversation_id": conversation_id, **reply}
+    except Exception as e:
+        error_msg = f"Failed to send message in conversation {conversation_id}"
+        logger.error("%s: %s", error_msg, e)
+        return {"status": "error", "message": error_msg, "error": str(e)}
+
+@mcp.tool()
+async def read_result(result_handle: str, fields: list = None, offset: int = 0, max_items: int = 50,
+                      summary: bool = False) -> any:
+    """
+    Read part of a result that was too large to return in full
+    result_handle is the handle returned in place of the result (status "spilled")
+    - fields: only return these fields of each item
+    - offset, max_items: window of items to return, for list results; the window is
+      shrunk if the items would still be too large
+    - summary: only identifying fields and statuses, long text truncated
+    """
+    try:
+        value = await asyncio.to_thread(load_spilled, result_handle)
+        if isinstance(value, list):
+            items = compact(value[offset:offset + max_items], fields, summary=summary)
+            while len(items) > 1 and not fits_result_limit(items):
+                items = items[:len(items) // 2]
+            return {"total": len(value), "offset": offset, "returned": len(items), "items": items}
+        return compact(value, fields, max_items, summary)
+    except Exception as e:
+        error_msg = f"Failed to read result {result_handle}"
+        logger.error("%s: %s", error_msg, e)
+        return {"status": "error", "message": error_msg, "error": str(e)}
+
+@mcp.tool()
+async def cache_stats() -> any:
+    """
+    Get hit/miss counters of the server's response cache
+    Covers get/list tools for tenants, brands, brand compasses, prompts and workers.
+    persistent reports the on-disk store of completed generations and finished compasses
+    """
+    return {**cache.stats(), "persistent": await asyncio.to_thread(store.stats)}
+
+@mcp.tool()
+async def server_metrics(output_format: str = "json") -> any:
+    """
+    Get per-tool and per-upstream-route call counts, error rates and p50/p95/p99 latencies
+    Upstream routes also report status codes, retries, coalesced requests and bytes sent/received
+    queue_wait holds the time calls waited for admission, per scheduler lane or content type and tenant
+    output_format: "json" (default, also includes cache stats, chat connection counters, scheduler
+    queue depths, per-tenant slot usage and the API circuit breaker state)
+    or "prometheus" (text exposition format)
+    """
+    if output_format == "prometheus":
+        return metrics.prometheus()
+    return {**metrics.snapshot(), "coalesced_requests": api.coalesced, "cache": cache.stats(),
+            "chat": chat.stats(), "scheduler": scheduler.snapshot(), "limits": limiter.snapshot(),
+            "circuit": api.breaker.state(api.client.base_url.host)}
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Social Toolkit MCP server")
+    parser.add_argument("--transport", choices=TRANSPORTS,
+                        default=os.environ.get("SOCIAL_TOOLKIT_TRANSPORT") or "stdio")
+    parser.add_argument("--host", default=os.environ.get("SOCIAL_TOOLKIT_HOST") or "127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("SOCIAL_TOOLKIT_PORT") or 8000))
+    args = parser.parse_args()
+
+    # Export metrics to a file and/or local port if configured
+    metrics.start_exporters()
     # Initialize and run the server
-    mcp.run(transport='stdio')
\ No newline at end of file
+    if args.transport == "stdio":
+        mcp.run(transport='stdio')
+    else:
+        # Anyone who reaches the port can connect; keys the server holds need SOCIAL_TOOLKIT_SERVER_TOKEN
+        contexts.remote = True
+        if (len(credentials) or credentials.admin_token) and not credentials.server_token:
+            logger.warning("Serving %s without SOCIAL_TOOLKIT_SERVER_TOKEN: the API keys and admin token "
+                           "the server holds will not be used", args.transport)
+        run_http(mcp, args.transport, args.host, args.port)
\ No newline at end of file
@@ -0,0 +1,273 @@
+# stub_api.py
+"""
+Local stand-in for the Social Toolkit API, used by bench.py so the MCP server
+can be measured without touching the real service.
+
+Every route answers with a small JSON echo of the request, unless a fixed
+body was registered for its path in `routes`. Two knobs shape
+the timing:
+- latency: seconds added to every request
+- connect_latency: seconds added once per new TCP connection, standing in for
+  the TCP+TLS handshake a real HTTPS endpoint costs
+
+With stateful=True (--stateful) the documented routes are served by an
+in-memory model of the API instead, see stub_store.py. Tenants, brands,
+sources, prompts, workers, generations and brand compasses are created,
+read, updated and deleted as in the real API, and jobs move through
+QUEUED -> PROCESSING -> COMPLETED over queue_time and process_time seconds.
+Successful GETs carry an ETag and are answered 304 Not Modified when
+If-None-Match still matches.
+
+With compress=True (--compress) JSON responses of at least 1 KB are sent
+gzip or br encoded when the request's Accept-Encoding allows it, as the
+API's CDN does. Request bodies with a Content-Encoding are decoded either way.
+
+Faults can be injected to exercise retries and the circuit breaker:
+- fail_rate: fraction of requests answered with fail_status instead (default 503)
+- retry_after: value of the Retry-After header sent with injected failures
+- drop_rate: fraction of requests whose connection is closed without a response
+
+Run standalone with:
+    python stub_api.py --port 8080 --latency 0.01 --connect-latency 0.1 --fail-rate 0.2 --fail-status 429
+    python stub_api.py --port 8080 --stateful --queue-time 0.5 --process-time 2 --job-fail-rate 0.1
+    python stub_api.py --port 8080 --stateful --chat-port 8765
+    python stub_api.py --port 8080 --stateful --compress
+and point the server at it with SOCIAL_TOOLKIT_API_URL=http://127.0.0.1:8080
+(and SOCIAL_TOOLKIT_WS_URL=ws://127.0.0.1:8765/api/ for conversations)
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+from codec import HAS_BROTLI, compress, decompress
+from stub_store import ApiError, ApiStore, parse_body
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this Nagle plus
+    # delayed ACK adds ~40 ms to every keep-alive response
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        # One handler instance serves one connection, so this runs once per handshake
+        time.sleep(self.server.connect_latency)
+        super().setup()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_body(self, keep: int = 1024 * 1024) -> tuple:
+        """
+        Read the request body in chunks so multi-GB uploads are never held in memory
+        Returns (size, body) where body holds at most the first `keep` bytes
+        """
+        remaining = int(self.headers.get("Content-Length") or 0)
+        size, kept = 0, []
+        while remaining:
+            chunk = self.rfile.read(min(remaining, 1024 * 1024))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            if size < keep:
+                kept.append(chunk[:keep - size])
+            size += len(chunk)
+        return size, b"".join(kept)
+
+    def _response_encoding(self, size: int) -> str:
+        if not self.server.compress or size < 1024:
+            return None
+        accepted = {value.split(";")[0].strip().lower()
+                    for value in (self.headers.get("Accept-Encoding") or "").split(",")}
+        if "br" in accepted and HAS_BROTLI:
+            return "br"
+        return "gzip" if "gzip" in accepted else None
+
+    def _send_json(self, status: int, body, headers: dict = None, cache_key=None) -> None:
+        """Send body as JSON; with a cache_key the encoded and compressed payload is reused, like a CDN would"""
+        payload = self.server.encoded.get(cache_key) if cache_key is not None else None
+        if payload is None:
+            payload = body if isinstance(body, bytes) else b"" if body is None else json.dumps(body).encode()
+            if cache_key is not None:
+                self.server.encoded[cache_key] = payload
+        encoding = self._response_encoding(len(payload))
+        if encoding:
+            compressed = self.server.encoded.get((cache_key, encoding)) if cache_key is not None else None
+            if compressed is None:
+                compressed = compress(payload, encoding)
+                if cache_key is not None:
+                    self.server.encoded[(cache_key, encoding)] = compressed
+            payload = compressed
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _inject_fault(self) -> bool:
+        """Answer with an injected fault if one is drawn; returns True when the request was handled"""
+        server = self.server
+        if random.random() < server.drop_rate:
+            self.close_connection = True
+            return True
+        if random.random() < server.fail_rate:
+            headers = {"Retry-After": str(server.retry_after)} if server.retry_after is not None else None
+            self._send_json(server.fail_status, {"detail": "Injected fault"}, headers)
+            return True
+        return False
+
+    def _handle(self):
+        size, body = self._read_body()
+        time.sleep(self.server.latency)
+        self.server.count_request(self.headers.get("Idempotency-Key"))
+        if self._inject_fault():
+            return
+        if self.headers.get("Content-Encoding"):
+            try:
+                body = decompress(body, self.headers["Content-Encoding"])
+            except (ValueError, OSError, EOFError):
+                self._send_json(400, {"detail": "Invalid Content-Encoding"})
+                return
+        if self.server.store is not None:
+            self._handle_stateful(body)
+            return
+        key = (self.command, self.path.split("?", 1)[0])
+        route = self.server.routes.get(key)
+        if route is not None:
+            self._send_json(200, route, cache_key=key)
+            return
+        self._send_json(200, {"method": self.command, "path": self.path, "received_bytes": size,
+                              "idempotency_key": self.headers.get("Idempotency-Key")})
+
+    def _handle_stateful(self, body: bytes) -> None:
+        url = urlsplit(self.path)
+        authorization = self.headers.get("Authorization") or ""
+        token = authorization[len("Bearer "):].strip() if authorization.startswith("Bearer ") else None
+        try:
+            fields = parse_body(self.headers, body)
+        except ApiError as e:
+            self._send_json(e.status, {"detail": e.detail})
+            return
+        status, payload = self.server.store.handle(self.command, url.path.rstrip("/") or "/",
+                                                   dict(parse_qsl(url.query)), token, fields)
+        if self.command != "GET" or status != 200 or payload is None:
+            self._send_json(status, payload)
+            return
+        # GETs carry an ETag and honour If-None-Match, like a CDN in front of the API would
+        etag = '"%s"' % hashlib.sha256(payload).hexdigest()[:32]
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self._send_json(status, payload, {"ETag": etag})
+
+    def do_HEAD(self):
+        self._read_body()
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    do_GET = _handle
+    do_POST = _handle
+    do_PUT = _handle
+    do_DELETE = _handle
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default listen backlog of 5 drops SYNs when many clients connect at
+    # once, and each dropped one costs a 1 s retransmit
+    request_queue_size = 128
+
+    def __init__(self, address, latency: float = 0.0, connect_latency: float = 0.0, fail_rate: float = 0.0,
+                 fail_status: int = 503, retry_after: float = None, drop_rate: float = 0.0, routes: dict = None,
+                 stateful: bool = False, queue_time: float = 0.2, process_time: float = 1.0,
+                 job_fail_rate: float = 0.0, compress: bool = False):
+        super().__init__(address, StubHandler)
+        # In-memory API model serving the documented routes, in stateful mode
+        self.store = ApiStore(queue_time, process_time, job_fail_rate) if stateful else None
+        # Fixed response bodies by (method, path)
+        self.routes = routes or {}
+        # Encoded (and compressed) bodies of the fixed routes
+        self.encoded = {}
+        self.latency = latency
+        self.connect_latency = connect_latency
+        self.fail_rate = fail_rate
+        self.fail_status = fail_status
+        self.retry_after = retry_after
+        self.drop_rate = drop_rate
+        self.compress = compress
+        # Requests received in total and per Idempotency-Key, to check retries from the outside
+        self.requests = 0
+        self.idempotency_keys = {}
+        self._counter_lock = threading.Lock()
+
+    def count_request(self, idempotency_key: str = None) -> None:
+        with self._counter_lock:
+            self.requests += 1
+            if idempotency_key:
+                self.idempotency_keys[idempotency_key] = self.idempotency_keys.get(idempotency_key, 0) + 1
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def start_stub(host: str = "127.0.0.1", port: int = 0, **kwargs) -> StubServer:
+    """
+    Start a stub server on a background thread and return it
+    port=0 picks a free port; read the address back from server.url
+    """
+    server = StubServer((host, port), **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local Social Toolkit API stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--connect-latency", type=float, default=0.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--fail-status", type=int, default=503)
+    parser.add_argument("--retry-after", type=float, default=None)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--stateful", action="store_true", help="serve the documented API from memory")
+    parser.add_argument("--queue-time", type=float, default=0.2)
+    parser.add_argument("--process-time", type=float, default=1.0)
+    parser.add_argument("--job-fail-rate", type=float, default=0.0)
+    parser.add_argument("--compress", action="store_true", help="gzip/br encode JSON responses clients accept")
+    parser.add_argument("--chat-port", type=int, default=None,
+                        help="also serve the chat WebSocket on this port, see stub_chat.py")
+    parser.add_argument("--chat-first-chunk-delay", type=float, default=0.2)
+    parser.add_argument("--chat-chunks", type=int, default=10)
+    parser.add_argument("--chat-idle-close", type=float, default=0.0)
+    parser.add_argument("--chat-connect-latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = StubServer((args.host, args.port), latency=args.latency, connect_latency=args.connect_latency,
+                        fail_rate=args.fail_rate, fail_status=args.fail_status,
+                        retry_after=args.retry_after, drop_rate=args.drop_rate, stateful=args.stateful,
+                        queue_time=args.queue_time, process_time=args.process_time,
+                        job_fail_rate=args.job_fail_rate, compress=args.compress)
+    print(f"Stub API listening on {server.url}", flush=True)
+    if args.chat_port is not None:
+        from stub_chat import start_chat_stub
+
+        chat = start_chat_stub(args.host, args.chat_port, store=server.store,
+                               first_chunk_delay=args.chat_first_chunk_delay, chunks=args.chat_chunks,
+                               idle_close=args.chat_idle_close, connect_latency=args.chat_connect_latency)
+        print(f"Chat stub listening on {chat.url}", flush=True)
+    server.serve_forever()
@@ -0,0 +1,139 @@
+# stub_chat.py
+"""
+Local stand-in for the Social Toolkit chat WebSocket, used by bench.py to
+measure conversations without touching the real service.
+
+Clients connect with the conversation token in the Authorization header and
+send {"message", "conversation_id", "tenant_id", "brand_id"}. Each message
+is answered with `chunks` chat_stream messages, the first after
+first_chunk_delay seconds and the rest chunk_interval seconds apart,
+followed by a {"type": "chat_end"} message unless end_message is off.
+
+With a stateful ApiStore (stub_api.py --stateful --chat-port) tokens are
+checked against its conversations and both sides of the chat are recorded
+in them. Without one any non-empty token is accepted.
+
+Like the API Gateway in front of the real endpoint, the stub closes
+connections that stay silent for idle_close seconds (0 keeps them open).
+connect_latency seconds are added once per new connection, standing in for
+the TCP+TLS handshake of a real wss:// endpoint.
+
+Run standalone with:
+    python stub_chat.py --port 8765 --first-chunk-delay 0.3 --chunks 20 --chunk-interval 0.02
+Needs the `websockets` package.
+"""
+import argparse
+import asyncio
+import json
+import threading
+
+from websockets.asyncio.server import serve
+
+
+class ChatStub:
+    def __init__(self, store=None, first_chunk_delay: float = 0.2, chunks: int = 10,
+                 chunk_interval: float = 0.02, end_message: bool = True, idle_close: float = 0.0,
+                 connect_latency: float = 0.0):
+        self.store = store
+        self.connect_latency = connect_latency
+        self.first_chunk_delay = first_chunk_delay
+        self.chunks = chunks
+        self.chunk_interval = chunk_interval
+        self.end_message = end_message
+        self.idle_close = idle_close
+        self.connections = 0
+        self.messages = 0
+        self.url = None
+
+    def _conversation(self, token: str):
+        if not token:
+            return None
+        if self.store is None:
+            return {"token": token}
+        return self.store.conversation_for_token(token)
+
+    async def _reply(self, websocket, conversation: dict, request: dict) -> None:
+        text = request.get("message")
+        if not text or (self.store is not None and request.get("conversation_id") != conversation["conversation_id"]):
+            await websocket.send(json.dumps({"message": "Invalid message", "status": "error",
+                                             "source": "assistant", "type": "chat_stream"}))
+            return
+        self.messages += 1
+        if self.store is not None:
+            self.store.add_chat_message(conversation["conversation_id"], "user", text)
+        words = [f"word{index} " for index in range(self.chunks)]
+        await asyncio.sleep(self.first_chunk_delay)
+        for index, word in enumerate(words):
+            if index:
+                await asyncio.sleep(self.chunk_interval)
+            await websocket.send(json.dumps({"message": word, "status": "success", "source": "assistant",
+                                             "type": "chat_stream"}))
+        if self.end_message:
+            await websocket.send(json.dumps({"message": "", "status": "success", "source": "assistant",
+                                             "type": "chat_end"}))
+        if self.store is not None:
+            self.store.add_chat_message(conversation["conversation_id"], "assistant", "".join(words))
+
+    async def _handle(self, websocket) -> None:
+        conversation = self._conversation(websocket.request.headers.get("Authorization"))
+        if conversation is None:
+            await websocket.close(4401, "Unauthorized")
+            return
+        self.connections += 1
+        # Stands in for the TCP+TLS handshake and upgrade a real wss:// endpoint costs
+        await asyncio.sleep(self.connect_latency)
+        while True:
+            try:
+                if self.idle_close:
+                    raw = await asyncio.wait_for(websocket.recv(), self.idle_close)
+                else:
+                    raw = await websocket.recv()
+            except asyncio.TimeoutError:
+                await websocket.close(1001, "Idle timeout")
+                return
+            except Exception:
+                return
+            try:
+                request = json.loads(raw)
+            except ValueError:
+                request = {}
+            await self._reply(websocket, conversation, request)
+
+    async def serve(self, host: str, port: int, ready: threading.Event = None) -> None:
+        async with serve(self._handle, host, port) as server:
+            bound_host, bound_port = server.sockets[0].getsockname()[:2]
+            self.url = f"ws://{bound_host}:{bound_port}/api/"
+            if ready is not None:
+                ready.set()
+            await server.serve_forever()
+
+
+def start_chat_stub(host: str = "127.0.0.1", port: int = 0, **kwargs) -> ChatStub:
+    """
+    Start a chat stub on a background thread with its own event loop and return it
+    port=0 picks a free port; read the address back from stub.url
+    """
+    stub = ChatStub(**kwargs)
+    ready = threading.Event()
+    threading.Thread(target=lambda: asyncio.run(stub.serve(host, port, ready)), daemon=True).start()
+    ready.wait(10)
+    return stub
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local Social Toolkit chat WebSocket stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--first-chunk-delay", type=float, default=0.2)
+    parser.add_argument("--chunks", type=int, default=10)
+    parser.add_argument("--chunk-interval", type=float, default=0.02)
+    parser.add_argument("--no-end-message", action="store_true", help="end replies by silence only")
+    parser.add_argument("--idle-close", type=float, default=0.0)
+    parser.add_argument("--connect-latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    stub = ChatStub(first_chunk_delay=args.first_chunk_delay, chunks=args.chunks, chunk_interval=args.chunk_interval,
+                    end_message=not args.no_end_message, idle_close=args.idle_close,
+                    connect_latency=args.connect_latency)
+    print(f"Chat stub listening on ws://{args.host}:{args.port}/api/", flush=True)
+    asyncio.run(stub.serve(args.host, args.port))
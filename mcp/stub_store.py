@@ -0,0 +1,657 @@
+# stub_store.py
+"""
+In-memory model of the documented Social Toolkit REST API, served by
+stub_api.py in stateful mode (--stateful).
+
+It covers the tenant, brand, source, prompt, worker, generation (with
+versions and feedback), brand compass and conversation routes of
+website/docs/reference/api.md, and stub_chat.py serves the chat WebSocket
+from the same conversations. Everything lives in memory and is gone when
+the stub stops.
+
+Processing follows a timeline instead of running anything:
+- a generation version is QUEUED for queue_time seconds after it is
+  created, then PROCESSING for process_time seconds, then COMPLETED, or
+  FAILED for a job_fail_rate share of them
+- a source is PROCESSING for queue_time + process_time seconds, then
+  COMPLETED or FAILED the same way; reprocessing starts it over
+- a brand compass runs one generation per compass worker and is COMPLETED
+  once all of them have finished
+
+Tenant routes check the bearer token against the tenant's api_key (401 when
+missing, 403 when wrong), GET /tenant expects the admin token, and unknown
+IDs answer 404, all with a {"detail": ...} body like the real API.
+"""
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from urllib.parse import parse_qsl
+
+from limits import DEFAULT_CONCURRENCY_LIMITS
+
+DEFAULT_ADMIN_TOKEN = "sk-admin-stub"
+
+# Multipart file MIME type -> content_type, as the API detects it
+_CONTENT_TYPES = {"text": "TEXT", "image": "IMAGE", "video": "VIDEO", "audio": "AUDIO"}
+
+# Query parameters that page through a list rather than filter it
+_PAGING_PARAMS = {"limit", "cursor"}
+
+
+class ApiError(Exception):
+    def __init__(self, status: int, detail: str):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+def _new_id(prefix: str) -> str:
+    return f"{prefix}-{uuid.uuid4().hex[:12]}"
+
+
+def _iso(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat() if timestamp else None
+
+
+def _public(record: dict) -> dict:
+    """A stored record without its private bookkeeping fields"""
+    return {key: value for key, value in record.items() if not key.startswith("_")}
+
+
+def parse_body(headers, body: bytes) -> dict:
+    """
+    Decode a JSON, urlencoded or multipart/form-data request body into a dict
+    Multipart file parts are reduced to {"filename", "mime_type"}, so a body
+    that was cut short after the first megabyte still parses
+    """
+    content_type = headers.get("Content-Type") or ""
+    if not body:
+        return {}
+    if content_type.startswith("application/json"):
+        try:
+            return json.loads(body)
+        except ValueError:
+            raise ApiError(400, "Invalid JSON body") from None
+    if content_type.startswith("application/x-www-form-urlencoded"):
+        return dict(parse_qsl(body.decode(errors="replace")))
+    if content_type.startswith("multipart/form-data"):
+        match = re.search(r'boundary="?([^";]+)"?', content_type)
+        if not match:
+            raise ApiError(400, "Missing multipart boundary")
+        fields = {}
+        for part in body.split(b"--" + match.group(1).encode())[1:]:
+            head, _, value = part.partition(b"\r\n\r\n")
+            name = re.search(rb'name="([^"]*)"', head)
+            if not name:
+                continue
+            filename = re.search(rb'filename="([^"]*)"', head)
+            if filename:
+                mime_type = re.search(rb"Content-Type:\s*([^\r\n]+)", head, re.IGNORECASE)
+                fields[name.group(1).decode()] = {
+                    "filename": filename.group(1).decode(),
+                    "mime_type": mime_type.group(1).decode().strip() if mime_type else "application/octet-stream",
+                }
+            else:
+                fields[name.group(1).decode()] = value.rsplit(b"\r\n", 1)[0].decode(errors="replace")
+        return fields
+    raise ApiError(415, f"Unsupported content type: {content_type}")
+
+
+class ApiStore:
+    """
+    Thread-safe in-memory state behind the stateful stub
+    handle() takes a parsed request and returns (status, JSON-encoded body); body None means no content
+    """
+
+    # (method, path pattern, handler method name); IDs are captured by name
+    ROUTES = [
+        ("POST", r"/tenant", "create_tenant"),
+        ("GET", r"/tenant", "list_tenants"),
+        ("GET", r"/tenant/(?P<tenant_id>[^/]+)", "get_tenant"),
+        ("PUT", r"/tenant/(?P<tenant_id>[^/]+)", "update_tenant"),
+        ("DELETE", r"/tenant/(?P<tenant_id>[^/]+)", "delete_tenant"),
+        ("POST", r"/tenant/(?P<tenant_id>[^/]+)/brand", "create_brand"),
+        ("GET", r"/tenant/(?P<tenant_id>[^/]+)/brand", "list_brands"),
+        ("GET", r"/tenant/(?P<tenant_id>[^/]+)/brand/(?P<brand_id>[^/]+)", "get_brand"),
+        ("PUT", r"/tenant/(?P<tenant_id>[^/]+)/brand/(?P<brand_id>[^/]+)", "update_brand"),
+        ("DELETE", r"/tenant/(?P<tenant_id>[^/]+)/brand/(?P<brand_id>[^/]+)", "delete_brand"),
+        ("POST", r"/tenant/(?P<tenant_id>[^/]+)/brand/(?P<brand_id>[^/]+)/compass/trigger", "trigger_compass"),
+        ("GET", r"/tenant/(?P<tenant_id>[^/]+)/brand/(?P<brand_id>[^/]+)/compass", "get_compass"),
+        ("POST", r"/tenant/(?P<tenant_id>[^/]+)/brand/(?P<brand_id>[^/]+)/conversation", "create_conversation"),
+        ("GET", r"/tenant/(?P<tenant_id>[^/]+)/brand/(?P<brand_id>[^/]+)/conversation", "list_conversations"),
+        ("GET", r"/tenant/(?P<tenant_id>[^/]+)/brand/(?P<brand_id>[^/]+)/conversation/(?P<conversation_id>[^/]+)",
+         "get_conversation"),
+        ("POST", r"/tenant/(?P<tenant_id>[^/]+)/brand/(?P<brand_id>[^/]+)/source", "create_source"),
+        ("GET", r"/tenant/(?P<tenant_id>[^/]+)/brand/(?P<brand_id>[^/]+)/source", "list_sources"),
+        ("GET", r"/tenant/(?P<tenant_id>[^/]+)/brand/(?P<brand_id>[^/]+)/source/(?P<source_id>[^/]+)",
+         "get_source"),
+        ("DELETE", r"/tenant/(?P<tenant_id>[^/]+)/brand/(?P<brand_id>[^/]+)/source/(?P<source_id>[^/]+)",
+         "delete_source"),
+        ("POST", r"/tenant/(?P<tenant_id>[^/]+)/brand/(?P<brand_id>[^/]+)/source/(?P<source_id>[^/]+)/reprocess",
+         "reprocess_source"),
+        ("POST", r"/tenant/(?P<tenant_id>[^/]+)/prompt", "create_prompt"),
+        ("GET", r"/tenant/(?P<tenant_id>[^/]+)/prompt", "list_prompts"),
+        ("GET", r"/tenant/(?P<tenant_id>[^/]+)/prompt/(?P<prompt_id>[^/]+)", "get_prompt"),
+        ("PUT", r"/tenant/(?P<tenant_id>[^/]+)/prompt/(?P<prompt_id>[^/]+)", "update_prompt"),
+        ("DELETE", r"/tenant/(?P<tenant_id>[^/]+)/prompt/(?P<prompt_id>[^/]+)", "delete_prompt"),
+        ("POST", r"/tenant/(?P<tenant_id>[^/]+)/worker", "create_worker"),
+        ("GET", r"/tenant/(?P<tenant_id>[^/]+)/worker", "list_workers"),
+        ("GET", r"/tenant/(?P<tenant_id>[^/]+)/worker/(?P<worker_id>[^/]+)", "get_worker"),
+        ("PUT", r"/tenant/(?P<tenant_id>[^/]+)/worker/(?P<worker_id>[^/]+)", "update_worker"),
+        ("DELETE", r"/tenant/(?P<tenant_id>[^/]+)/worker/(?P<worker_id>[^/]+)", "delete_worker"),
+        ("POST", r"/tenant/(?P<tenant_id>[^/]+)/brand/(?P<brand_id>[^/]+)/worker/(?P<worker_id>[^/]+)/generation",
+         "create_generation"),
+        ("GET", r"/tenant/(?P<tenant_id>[^/]+)/brand/(?P<brand_id>[^/]+)/worker/(?P<worker_id>[^/]+)/generation",
+         "list_generations"),
+        ("GET", r"/tenant/(?P<tenant_id>[^/]+)/brand/(?P<brand_id>[^/]+)/worker/(?P<worker_id>[^/]+)"
+                r"/generation/(?P<generation_id>[^/]+)", "get_generation"),
+        ("GET", r"/tenant/(?P<tenant_id>[^/]+)/brand/(?P<brand_id>[^/]+)/worker/(?P<worker_id>[^/]+)"
+                r"/generation/(?P<generation_id>[^/]+)/version", "list_versions"),
+        ("GET", r"/tenant/(?P<tenant_id>[^/]+)/brand/(?P<brand_id>[^/]+)/worker/(?P<worker_id>[^/]+)"
+                r"/generation/(?P<generation_id>[^/]+)/version/(?P<version_id>[^/]+)", "get_version"),
+        ("POST", r"/tenant/(?P<tenant_id>[^/]+)/brand/(?P<brand_id>[^/]+)/worker/(?P<worker_id>[^/]+)"
+                 r"/generation/(?P<generation_id>[^/]+)/version/(?P<version_id>[^/]+)/feedback", "submit_feedback"),
+    ]
+
+    def __init__(self, queue_time: float = 0.2, process_time: float = 1.0, job_fail_rate: float = 0.0,
+                 admin_token: str = DEFAULT_ADMIN_TOKEN):
+        self.queue_time = queue_time
+        self.process_time = process_time
+        self.job_fail_rate = job_fail_rate
+        self.admin_token = admin_token
+        self.tenants = {}
+        self.brands = {}
+        self.sources = {}
+        self.prompts = {}
+        self.workers = {}
+        self.generations = {}
+        self.compasses = {}
+        self.conversations = {}
+        self._routes = [(method, re.compile(pattern + "$"), name) for method, pattern, name in self.ROUTES]
+        self._lock = threading.Lock()
+
+    def handle(self, method: str, path: str, query: dict, token: str, body: dict) -> tuple:
+        for route_method, pattern, name in self._routes:
+            match = pattern.match(path)
+            if match and route_method == method:
+                break
+        else:
+            return 404, json.dumps({"detail": "Not Found"}).encode()
+        ids = match.groupdict()
+        try:
+            with self._lock:
+                if "tenant_id" in ids:
+                    self._authorize(ids["tenant_id"], token)
+                elif name == "list_tenants" and token != self.admin_token:
+                    raise ApiError(401 if not token else 403, "Admin authorization required")
+                status, result = getattr(self, f"_{name}")(query=query, body=body, **ids)
+                # Encoded under the lock, as other requests may change the stored records meanwhile
+                return status, None if result is None else json.dumps(result).encode()
+        except ApiError as e:
+            return e.status, json.dumps({"detail": e.detail}).encode()
+
+    def _authorize(self, tenant_id: str, token: str) -> None:
+        tenant = self._get(self.tenants, tenant_id, "Tenant")
+        if not token:
+            raise ApiError(401, "Not authenticated")
+        if token not in (tenant["api_key"], self.admin_token):
+            raise ApiError(403, "Invalid API key for this tenant")
+
+    @staticmethod
+    def _get(collection: dict, item_id: str, kind: str, **scope) -> dict:
+        item = collection.get(item_id)
+        if item is None or any(item.get(key) != value for key, value in scope.items()):
+            raise ApiError(404, f"{kind} {item_id} not found")
+        return item
+
+    @staticmethod
+    def _filter(items: list, query: dict) -> list:
+        filters = {key: value for key, value in query.items() if key not in _PAGING_PARAMS}
+        return [item for item in items if all(str(item.get(key)) == value for key, value in filters.items())]
+
+    @staticmethod
+    def _require(body: dict, *fields) -> None:
+        missing = [field for field in fields if not body.get(field)]
+        if missing:
+            raise ApiError(422, f"Missing required fields: {', '.join(missing)}")
+
+    def _update(self, record: dict, body: dict, fields: tuple) -> dict:
+        for field in fields:
+            if field in body and body[field] is not None:
+                record[field] = body[field]
+        record["updated_at"] = _iso(time.time())
+        return record
+
+    # Simulated processing
+
+    def _start_job(self, record: dict) -> None:
+        record["_started"] = time.time()
+        record["_outcome"] = "FAILED" if random.random() < self.job_fail_rate else "COMPLETED"
+
+    def _job_status(self, record: dict) -> str:
+        elapsed = time.time() - record["_started"]
+        if elapsed < self.queue_time:
+            return "QUEUED"
+        if elapsed < self.queue_time + self.process_time:
+            return "PROCESSING"
+        return record["_outcome"]
+
+    def _finished_at(self, record: dict) -> float:
+        return record["_started"] + self.queue_time + self.process_time
+
+    # Tenants
+
+    def _create_tenant(self, query: dict, body: dict) -> tuple:
+        self._require(body, "name")
+        now = _iso(time.time())
+        tenant = {
+            "tenant_id": _new_id("t"),
+            "api_key": f"sk-tenant-{uuid.uuid4().hex}",
+            "name": body["name"],
+            "description": body.get("description"),
+            "parent_tenant_id": body.get("parent_tenant_id"),
+            "settings": body.get("settings") or {},
+            "concurrency_limits": {**DEFAULT_CONCURRENCY_LIMITS, **(body.get("concurrency_limits") or {})},
+            "brand_compass_worker_ids": body.get("brand_compass_worker_ids") or [],
+            "created_at": now,
+            "updated_at": now,
+        }
+        self.tenants[tenant["tenant_id"]] = tenant
+        return 201, tenant
+
+    def _list_tenants(self, query: dict, body: dict) -> tuple:
+        return 200, self._filter(list(self.tenants.values()), query)
+
+    def _get_tenant(self, query: dict, body: dict, tenant_id: str) -> tuple:
+        return 200, self.tenants[tenant_id]
+
+    def _update_tenant(self, query: dict, body: dict, tenant_id: str) -> tuple:
+        tenant = self.tenants[tenant_id]
+        if body.get("concurrency_limits"):
+            body = {**body, "concurrency_limits": {**tenant["concurrency_limits"], **body["concurrency_limits"]}}
+        return 200, self._update(tenant, body, ("name", "description", "settings", "concurrency_limits",
+                                                "brand_compass_worker_ids"))
+
+    def _delete_tenant(self, query: dict, body: dict, tenant_id: str) -> tuple:
+        del self.tenants[tenant_id]
+        for collection in (self.brands, self.sources, self.prompts, self.workers, self.generations,
+                           self.conversations):
+            for item_id in [key for key, item in collection.items() if item["tenant_id"] == tenant_id]:
+                del collection[item_id]
+        for brand_key in [key for key in self.compasses if key[0] == tenant_id]:
+            del self.compasses[brand_key]
+        return 204, None
+
+    # Brands
+
+    def _create_brand(self, query: dict, body: dict, tenant_id: str) -> tuple:
+        self._require(body, "name")
+        now = _iso(time.time())
+        brand = {
+            "brand_id": _new_id("b"),
+            "tenant_id": tenant_id,
+            "name": body["name"],
+            "description": body.get("description"),
+            "settings": body.get("settings") or {},
+            "created_at": now,
+            "updated_at": now,
+        }
+        self.brands[brand["brand_id"]] = brand
+        return 201, brand
+
+    def _list_brands(self, query: dict, body: dict, tenant_id: str) -> tuple:
+        return 200, self._filter([b for b in self.brands.values() if b["tenant_id"] == tenant_id], query)
+
+    def _get_brand(self, query: dict, body: dict, tenant_id: str, brand_id: str) -> tuple:
+        return 200, self._get(self.brands, brand_id, "Brand", tenant_id=tenant_id)
+
+    def _update_brand(self, query: dict, body: dict, tenant_id: str, brand_id: str) -> tuple:
+        brand = self._get(self.brands, brand_id, "Brand", tenant_id=tenant_id)
+        return 200, self._update(brand, body, ("name", "description", "settings"))
+
+    def _delete_brand(self, query: dict, body: dict, tenant_id: str, brand_id: str) -> tuple:
+        self._get(self.brands, brand_id, "Brand", tenant_id=tenant_id)
+        del self.brands[brand_id]
+        for collection in (self.sources, self.generations, self.conversations):
+            for item_id in [key for key, item in collection.items() if item["brand_id"] == brand_id]:
+                del collection[item_id]
+        self.compasses.pop((tenant_id, brand_id), None)
+        return 204, None
+
+    # Sources
+
+    def _render_source(self, source: dict) -> dict:
+        status = self._job_status(source)
+        return {**_public(source), "status": "PROCESSING" if status == "QUEUED" else status}
+
+    def _create_source(self, query: dict, body: dict, tenant_id: str, brand_id: str) -> tuple:
+        self._get(self.brands, brand_id, "Brand", tenant_id=tenant_id)
+        self._require(body, "name", "source_type")
+        if body["source_type"] not in ("SAMPLE", "GUIDELINES", "KNOWLEDGE"):
+            raise ApiError(422, "source_type must be one of SAMPLE, GUIDELINES, KNOWLEDGE")
+        file_part = body.get("file") if isinstance(body.get("file"), dict) else None
+        if file_part:
+            content_type = _CONTENT_TYPES.get(file_part["mime_type"].split("/", 1)[0])
+            filename = file_part["filename"]
+        elif body.get("url"):
+            content_type = body.get("content_type") or "TEXT"
+            filename = body["url"].rstrip("/").rsplit("/", 1)[-1] or "url"
+        elif body.get("text"):
+            content_type = "TEXT"
+            filename = "text.txt"
+        else:
+            raise ApiError(400, "Must provide one of: file, url, or text")
+        if content_type is None:
+            raise ApiError(400, f"Unsupported file type: {file_part['mime_type']}")
+        if body["source_type"] != "SAMPLE" and content_type != "TEXT":
+            raise ApiError(400, f"{body['source_type']} sources must be TEXT content")
+        now = _iso(time.time())
+        source = {
+            "source_id": _new_id("src"),
+            "tenant_id": tenant_id,
+            "brand_id": brand_id,
+            "name": body["name"],
+            "description": body.get("description"),
+            "source_type": body["source_type"],
+            "content_type": content_type,
+            "created_at": now,
+            "updated_at": now,
+            "location": f"s3://stub-bucket/sources/tenant={tenant_id}/brand={brand_id}/{uuid.uuid4().hex}_{filename}",
+        }
+        self._start_job(source)
+        self.sources[source["source_id"]] = source
+        return 201, self._render_source(source)
+
+    def _list_sources(self, query: dict, body: dict, tenant_id: str, brand_id: str) -> tuple:
+        self._get(self.brands, brand_id, "Brand", tenant_id=tenant_id)
+        sources = [self._render_source(s) for s in self.sources.values() if s["brand_id"] == brand_id]
+        return 200, self._filter(sources, query)
+
+    def _get_source(self, query: dict, body: dict, tenant_id: str, brand_id: str, source_id: str) -> tuple:
+        return 200, self._render_source(self._get(self.sources, source_id, "Source", brand_id=brand_id))
+
+    def _delete_source(self, query: dict, body: dict, tenant_id: str, brand_id: str, source_id: str) -> tuple:
+        self._get(self.sources, source_id, "Source", brand_id=brand_id)
+        del self.sources[source_id]
+        return 204, None
+
+    def _reprocess_source(self, query: dict, body: dict, tenant_id: str, brand_id: str, source_id: str) -> tuple:
+        source = self._get(self.sources, source_id, "Source", brand_id=brand_id)
+        self._start_job(source)
+        source["updated_at"] = _iso(time.time())
+        return 200, self._render_source(source)
+
+    # Prompts
+
+    def _create_prompt(self, query: dict, body: dict, tenant_id: str) -> tuple:
+        self._require(body, "name", "prompt_text")
+        now = _iso(time.time())
+        prompt = {
+            "prompt_id": _new_id("p"),
+            "tenant_id": tenant_id,
+            "name": body["name"],
+            "description": body.get("description"),
+            "content_type": body.get("content_type") or "TEXT",
+            "prompt_text": body["prompt_text"],
+            "settings": body.get("settings") or {},
+            "created_at": now,
+            "updated_at": now,
+        }
+        self.prompts[prompt["prompt_id"]] = prompt
+        return 201, prompt
+
+    def _list_prompts(self, query: dict, body: dict, tenant_id: str) -> tuple:
+        return 200, self._filter([p for p in self.prompts.values() if p["tenant_id"] == tenant_id], query)
+
+    def _get_prompt(self, query: dict, body: dict, tenant_id: str, prompt_id: str) -> tuple:
+        return 200, self._get(self.prompts, prompt_id, "Prompt", tenant_id=tenant_id)
+
+    def _update_prompt(self, query: dict, body: dict, tenant_id: str, prompt_id: str) -> tuple:
+        prompt = self._get(self.prompts, prompt_id, "Prompt", tenant_id=tenant_id)
+        return 200, self._update(prompt, body, ("name", "description", "prompt_text", "settings"))
+
+    def _delete_prompt(self, query: dict, body: dict, tenant_id: str, prompt_id: str) -> tuple:
+        self._get(self.prompts, prompt_id, "Prompt", tenant_id=tenant_id)
+        del self.prompts[prompt_id]
+        return 204, None
+
+    # Workers
+
+    def _create_worker(self, query: dict, body: dict, tenant_id: str) -> tuple:
+        self._require(body, "name", "prompt")
+        output_type = body.get("output_type") or "TEXT"
+        if output_type not in ("TEXT", "MULTI_MODAL"):
+            raise ApiError(422, "output_type must be TEXT or MULTI_MODAL")
+        now = _iso(time.time())
+        worker = {
+            "worker_id": _new_id("w"),
+            "tenant_id": tenant_id,
+            "name": body["name"],
+            "description": body.get("description"),
+            "output_type": output_type,
+            "prompt": body["prompt"],
+            "created_at": now,
+            "updated_at": now,
+        }
+        self.workers[worker["worker_id"]] = worker
+        return 201, worker
+
+    def _list_workers(self, query: dict, body: dict, tenant_id: str) -> tuple:
+        return 200, self._filter([w for w in self.workers.values() if w["tenant_id"] == tenant_id], query)
+
+    def _get_worker(self, query: dict, body: dict, tenant_id: str, worker_id: str) -> tuple:
+        return 200, self._get(self.workers, worker_id, "Worker", tenant_id=tenant_id)
+
+    def _update_worker(self, query: dict, body: dict, tenant_id: str, worker_id: str) -> tuple:
+        worker = self._get(self.workers, worker_id, "Worker", tenant_id=tenant_id)
+        return 200, self._update(worker, body, ("name", "description", "prompt"))
+
+    def _delete_worker(self, query: dict, body: dict, tenant_id: str, worker_id: str) -> tuple:
+        self._get(self.workers, worker_id, "Worker", tenant_id=tenant_id)
+        del self.workers[worker_id]
+        return 204, None
+
+    # Generations
+
+    def _result(self, generation: dict, version: dict, status: str):
+        if status == "FAILED":
+            return {"status": "error", "error": "Simulated generation failure"}
+        if status != "COMPLETED":
+            return None
+        if version["output_type"] == "IMAGE":
+            return {"status": "success", "image_url": f"https://stub.invalid/{version['version_id']}.png",
+                    "image_description": f"Image for {generation['context'] or 'the brand'}"}
+        content = f"Stub generation {version['version_id']} for: {generation['context'] or generation['prompt']}"
+        if version["feedback"]:
+            content += f" (revised after feedback: {version['feedback']})"
+        if generation["generate_multiple"]:
+            return {"status": "success", "content": [f"{content} [{index}]" for index in range(1, 4)]}
+        return {"status": "success", "content": content}
+
+    def _render_version(self, generation: dict, version: dict) -> dict:
+        status = self._job_status(version)
+        return {**_public(version), "status": status, "result": self._result(generation, version, status)}
+
+    def _render_generation(self, generation: dict) -> dict:
+        current = generation["_versions"][generation["current_version_id"]]
+        version = self._render_version(generation, current)
+        return {**_public(generation), "status": version["status"], "result": version["result"],
+                "output_type": current["output_type"], "updated_at": current["created_at"]}
+
+    def _new_version(self, generation: dict, feedback: str = None, previous_version_id: str = None) -> dict:
+        version = {
+            "version_id": _new_id("v"),
+            "generation_id": generation["generation_id"],
+            "previous_version_id": previous_version_id,
+            "feedback": feedback,
+            "output_type": generation["_output_type"],
+            "created_at": _iso(time.time()),
+        }
+        self._start_job(version)
+        generation["_versions"][version["version_id"]] = version
+        generation["current_version_id"] = version["version_id"]
+        return version
+
+    def _create_generation_record(self, tenant_id: str, brand_id: str, worker: dict, body: dict) -> dict:
+        source_ids = body.get("source_ids") or []
+        for source_id in source_ids:
+            self._get(self.sources, source_id, "Source", brand_id=brand_id)
+        generation = {
+            "generation_id": _new_id("g"),
+            "tenant_id": tenant_id,
+            "brand_id": brand_id,
+            "worker_id": worker["worker_id"],
+            "prompt": worker["prompt"],
+            "context": body.get("context"),
+            "source_ids": source_ids,
+            "use_source_context": body.get("use_source_context", True),
+            "generate_multiple": bool(body.get("generate_multiple")),
+            "metadata": body.get("metadata"),
+            "created_at": _iso(time.time()),
+            "current_version_id": None,
+            "_output_type": "IMAGE" if worker["output_type"] == "MULTI_MODAL" else "TEXT",
+            "_versions": {},
+        }
+        self._new_version(generation)
+        self.generations[generation["generation_id"]] = generation
+        return generation
+
+    def _generation(self, tenant_id: str, brand_id: str, worker_id: str, generation_id: str) -> dict:
+        return self._get(self.generations, generation_id, "Generation", tenant_id=tenant_id, brand_id=brand_id,
+                         worker_id=worker_id)
+
+    def _create_generation(self, query: dict, body: dict, tenant_id: str, brand_id: str, worker_id: str) -> tuple:
+        self._get(self.brands, brand_id, "Brand", tenant_id=tenant_id)
+        worker = self._get(self.workers, worker_id, "Worker", tenant_id=tenant_id)
+        return 201, self._render_generation(self._create_generation_record(tenant_id, brand_id, worker, body))
+
+    def _list_generations(self, query: dict, body: dict, tenant_id: str, brand_id: str, worker_id: str) -> tuple:
+        generations = [self._render_generation(g) for g in self.generations.values()
+                       if g["brand_id"] == brand_id and g["worker_id"] == worker_id]
+        return 200, self._filter(generations, query)
+
+    def _get_generation(self, query: dict, body: dict, tenant_id: str, brand_id: str, worker_id: str,
+                        generation_id: str) -> tuple:
+        return 200, self._render_generation(self._generation(tenant_id, brand_id, worker_id, generation_id))
+
+    def _list_versions(self, query: dict, body: dict, tenant_id: str, brand_id: str, worker_id: str,
+                       generation_id: str) -> tuple:
+        generation = self._generation(tenant_id, brand_id, worker_id, generation_id)
+        return 200, [self._render_version(generation, v) for v in generation["_versions"].values()]
+
+    def _get_version(self, query: dict, body: dict, tenant_id: str, brand_id: str, worker_id: str,
+                     generation_id: str, version_id: str) -> tuple:
+        generation = self._generation(tenant_id, brand_id, worker_id, generation_id)
+        version = self._get(generation["_versions"], version_id, "Version")
+        return 200, self._render_version(generation, version)
+
+    def _submit_feedback(self, query: dict, body: dict, tenant_id: str, brand_id: str, worker_id: str,
+                         generation_id: str, version_id: str) -> tuple:
+        self._require(body, "feedback")
+        generation = self._generation(tenant_id, brand_id, worker_id, generation_id)
+        previous = self._get(generation["_versions"], version_id, "Version")
+        if self._job_status(previous) not in ("COMPLETED", "FAILED"):
+            raise ApiError(409, f"Version {version_id} is still being generated")
+        version = self._new_version(generation, body["feedback"], version_id)
+        return 200, self._render_version(generation, version)
+
+    # Brand compass
+
+    def _trigger_compass(self, query: dict, body: dict, tenant_id: str, brand_id: str) -> tuple:
+        self._get(self.brands, brand_id, "Brand", tenant_id=tenant_id)
+        worker_ids = self.tenants[tenant_id]["brand_compass_worker_ids"] or [
+            w["worker_id"] for w in self.workers.values() if w["tenant_id"] == tenant_id]
+        if not worker_ids:
+            raise ApiError(400, "No brand compass workers configured for this tenant")
+        workers = [self._get(self.workers, worker_id, "Worker", tenant_id=tenant_id) for worker_id in worker_ids]
+        generations = [self._create_generation_record(tenant_id, brand_id, worker, {}) for worker in workers]
+        compass = {"triggered_at": time.time(), "generation_ids": [g["generation_id"] for g in generations]}
+        self.compasses[(tenant_id, brand_id)] = compass
+        return 200, {
+            "status": "PROCESSING",
+            "triggered_at": _iso(compass["triggered_at"]),
+            "generation_version_tuples": [
+                {"generation_id": g["generation_id"], "version_id": g["current_version_id"]} for g in generations
+            ],
+        }
+
+    def _get_compass(self, query: dict, body: dict, tenant_id: str, brand_id: str) -> tuple:
+        self._get(self.brands, brand_id, "Brand", tenant_id=tenant_id)
+        compass = self.compasses.get((tenant_id, brand_id))
+        if compass is None:
+            return 200, {"status": "NOT_STARTED", "generations": [], "triggered_at": None, "completed_at": None}
+        generations = [self.generations[g] for g in compass["generation_ids"] if g in self.generations]
+        versions = [(g, g["_versions"][g["current_version_id"]]) for g in generations]
+        rendered = [self._render_version(g, v) for g, v in versions]
+        finished = [v for v in rendered if v["status"] in ("COMPLETED", "FAILED")]
+        body = {"generations": rendered, "triggered_at": _iso(compass["triggered_at"]), "completed_at": None}
+        if len(finished) < len(rendered):
+            body["status"] = "PROCESSING"
+            body["progress"] = {
+                "total_workers": len(rendered),
+                "completed_workers": len(finished),
+                "percent_complete": round(100 * len(finished) / len(rendered)),
+            }
+        else:
+            all_failed = rendered and all(v["status"] == "FAILED" for v in rendered)
+            body["status"] = "FAILED" if all_failed else "COMPLETED"
+            body["completed_at"] = _iso(max((self._finished_at(v) for _, v in versions), default=time.time()))
+        return 200, body
+
+    # Conversations
+
+    def _create_conversation(self, query: dict, body: dict, tenant_id: str, brand_id: str) -> tuple:
+        self._get(self.brands, brand_id, "Brand", tenant_id=tenant_id)
+        now = time.time()
+        conversation = {
+            "conversation_id": _new_id("c"),
+            "tenant_id": tenant_id,
+            "brand_id": brand_id,
+            "name": body.get("name") or f"New Chat {datetime.fromtimestamp(now, timezone.utc):%Y-%m-%d %H:%M:%S}",
+            "metadata": body.get("metadata"),
+            "current_leaf_message_id": None,
+            "chat_messages": [],
+            "token": f"conv-{uuid.uuid4().hex}",
+            "created_at": _iso(now),
+            "updated_at": _iso(now),
+        }
+        self.conversations[conversation["conversation_id"]] = conversation
+        return 201, conversation
+
+    def _list_conversations(self, query: dict, body: dict, tenant_id: str, brand_id: str) -> tuple:
+        self._get(self.brands, brand_id, "Brand", tenant_id=tenant_id)
+        conversations = [c for c in self.conversations.values()
+                         if c["tenant_id"] == tenant_id and c["brand_id"] == brand_id]
+        return 200, [{key: value for key, value in c.items() if key not in ("chat_messages", "token")}
+                     for c in self._filter(conversations, query)]
+
+    def _get_conversation(self, query: dict, body: dict, tenant_id: str, brand_id: str,
+                          conversation_id: str) -> tuple:
+        return 200, self._get(self.conversations, conversation_id, "Conversation",
+                              tenant_id=tenant_id, brand_id=brand_id)
+
+    def conversation_for_token(self, token: str) -> dict:
+        """The conversation a chat token belongs to, or None"""
+        with self._lock:
+            return next((dict(c) for c in self.conversations.values() if c["token"] == token), None)
+
+    def add_chat_message(self, conversation_id: str, role: str, text: str) -> None:
+        """Append a message to a conversation, as the chat endpoint does for both sides"""
+        with self._lock:
+            conversation = self.conversations.get(conversation_id)
+            if conversation is None:
+                return
+            message = {
+                "message_id": _new_id("m"),
+                "role": role,
+                "content": text,
+                "parent_message_id": conversation["current_leaf_message_id"],
+                "created_at": _iso(time.time()),
+            }
+            conversation["chat_messages"].append(message)
+            conversation["current_leaf_message_id"] = message["message_id"]
+            conversation["updated_at"] = message["created_at"]
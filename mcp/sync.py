@@ -0,0 +1,182 @@
+# sync.py
+"""
+Incremental sync of a local directory to the sources of a brand.
+
+Re-running onboarding with create_sources_batch uploads every file again and
+each upload is processed again by the backend. A sync instead compares the
+directory with a manifest of the previous sync and does only what changed:
+- new content is uploaded once, however many files hold it
+- a file that was moved or renamed keeps its source
+- a changed file gets a new source and its old one is deleted
+- a source whose file was removed is deleted
+- a source that failed processing is reprocessed
+
+Files are hashed with SHA-256, read in chunks in a thread pool, so large
+media trees are scanned in parallel with flat memory use. A file whose size
+and modification time match the manifest is not read again.
+
+Manifests are JSON files kept per brand and directory under
+SOCIAL_TOOLKIT_SYNC_DIR (default ~/.cache/social-toolkit/sync). Each maps
+the relative path of every synced file to its hash and source_id. A sync
+with a narrower glob than an earlier one only judges the files its glob
+matches: files outside it keep their entries and sources, whether or not
+they are still on disk.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path, PurePosixPath
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+MANIFEST_VERSION = 1
+
+# Source statuses after which reprocessing is worth a try
+RETRY_STATUSES = {"FAILED"}
+
+
+def _sync_dir() -> str:
+    return os.environ.get("SOCIAL_TOOLKIT_SYNC_DIR") or os.path.join(
+        os.path.expanduser("~"), ".cache", "social-toolkit", "sync")
+
+
+def manifest_path(tenant_id: str, brand_id: str, directory: str) -> str:
+    """Manifest file for syncing directory to a brand"""
+    root = str(Path(directory).expanduser().resolve())
+    name = re.sub(r"[^A-Za-z0-9_.-]", "_", f"{tenant_id}-{brand_id}")
+    digest = hashlib.sha256(root.encode()).hexdigest()[:16]
+    return os.path.join(_sync_dir(), f"{name}-{digest}.json")
+
+
+def load_manifest(path: str) -> dict:
+    """Files of the previous sync, by relative path; empty if there was none"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return {}
+    return manifest.get("files", {}) if manifest.get("version") == MANIFEST_VERSION else {}
+
+
+def save_manifest(path: str, directory: str, files: dict) -> None:
+    """Write the manifest atomically, so an interrupted sync leaves the previous one intact"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    manifest = {"version": MANIFEST_VERSION, "directory": str(Path(directory).expanduser().resolve()),
+                "files": files}
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(temporary, path)
+
+
+def hash_file(file_path: str, chunk_size: int = HASH_CHUNK_SIZE) -> str:
+    # hashlib releases the GIL on large updates, so threads hash in parallel
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def scan_directory(directory: str, glob: str = "**/*") -> dict:
+    """Files under directory matching glob: relative path -> (absolute path, size, mtime_ns)"""
+    root = Path(directory).expanduser()
+    if not root.is_dir():
+        raise ValueError(f"Not a directory: {directory}")
+    files = {}
+    for path in sorted(root.glob(glob or "**/*")):
+        if path.is_file():
+            stat = path.stat()
+            files[path.relative_to(root).as_posix()] = (str(path), stat.st_size, stat.st_mtime_ns)
+    return files
+
+
+def in_scope(relative: str, glob: str = "**/*") -> bool:
+    """Whether scan_directory with glob would list the file at relative (a manifest path) if it existed"""
+    return PurePosixPath(relative).full_match(glob or "**/*")
+
+
+async def hash_files(files: dict, previous: dict, rehash: bool = False, max_workers: int = None) -> tuple:
+    """
+    Hash the files returned by scan_directory, reusing the hash from previous (a manifest)
+    when size and mtime are unchanged, unless rehash is set
+    Returns ({relative path: {"hash", "size", "mtime_ns"}}, number of files read)
+    """
+    loop = asyncio.get_running_loop()
+    hashed = {}
+    to_read = []
+    for relative, (_, size, mtime_ns) in files.items():
+        entry = previous.get(relative)
+        if not rehash and entry and entry.get("size") == size and entry.get("mtime_ns") == mtime_ns:
+            hashed[relative] = {"hash": entry["hash"], "size": size, "mtime_ns": mtime_ns}
+        else:
+            to_read.append(relative)
+    if to_read:
+        pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sync-hash")
+        try:
+            digests = await asyncio.gather(*[loop.run_in_executor(pool, hash_file, files[relative][0])
+                                             for relative in to_read])
+        finally:
+            # Exiting a with block would block the event loop until files being read are done;
+            # a cancelled sync returns at once, dropping queued files and leaving the rest to finish
+            pool.shutdown(wait=False, cancel_futures=True)
+        for relative, digest in zip(to_read, digests):
+            _, size, mtime_ns = files[relative]
+            hashed[relative] = {"hash": digest, "size": size, "mtime_ns": mtime_ns}
+    return hashed, len(to_read)
+
+
+def plan_sync(local: dict, previous: dict, remote: dict = None, delete_removed: bool = True,
+              glob: str = None) -> dict:
+    """
+    Work needed to bring a brand's sources in line with local, given the previous manifest
+    remote maps the brand's source_ids to their status; sources missing from it are
+    uploaded again. Pass None to trust the manifest.
+    glob is the pattern local was scanned with; previous files it does not match are left
+    alone rather than taken as removed. None takes every previous file as in scope.
+    Returns:
+    - keep: relative path -> source_id of files whose content already has a source
+    - upload: hash -> relative paths of content that needs a new source
+    - reprocess: source_ids to reprocess
+    - delete: source_ids no longer referenced once the uploads succeed
+    - replaced: relative paths whose content changed
+    - untouched: relative path -> previous entry of the files outside glob, to carry over
+    """
+    def alive(source_id):
+        return source_id and (remote is None or source_id in remote)
+
+    # Content that already has a live source, whichever path it was synced from
+    by_hash = {}
+    for relative, entry in sorted(previous.items()):
+        if alive(entry.get("source_id")):
+            by_hash.setdefault(entry["hash"], entry["source_id"])
+
+    keep, upload, replaced = {}, {}, []
+    for relative, entry in local.items():
+        source_id = by_hash.get(entry["hash"])
+        if source_id:
+            keep[relative] = source_id
+        else:
+            upload.setdefault(entry["hash"], []).append(relative)
+            if relative in previous:
+                replaced.append(relative)
+
+    untouched = {relative: entry for relative, entry in previous.items()
+                 if glob is not None and relative not in local and not in_scope(relative, glob)}
+    kept = set(keep.values())
+    reprocess = sorted(source_id for source_id in kept
+                       if remote is not None and remote.get(source_id) in RETRY_STATUSES)
+    # Sources still held by files outside glob stay, even if an in-scope file with the same content went away
+    protected = kept | {entry.get("source_id") for entry in untouched.values()}
+    delete = set()
+    for relative, entry in previous.items():
+        source_id = entry.get("source_id")
+        if relative in untouched or not alive(source_id) or source_id in protected:
+            continue
+        if relative in local or delete_removed:
+            delete.add(source_id)
+    return {"keep": keep, "upload": upload, "reprocess": reprocess, "delete": sorted(delete),
+            "replaced": sorted(replaced), "untouched": untouched}
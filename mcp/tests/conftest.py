@@ -0,0 +1,6 @@
+# conftest.py
+import sys
+from pathlib import Path
+
+# The server's modules are imported by their plain names, as server.py does
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,131 @@
+# test_api_client.py
+import asyncio
+
+import httpx
+import pytest
+
+from api_client import ApiClient
+from resilience import CircuitBreaker, CircuitOpenError, RetryPolicy
+
+
+def _client(handler, **kwargs) -> ApiClient:
+    api = ApiClient(base_url="http://api.test", prewarm=False, **kwargs)
+    api._client = httpx.AsyncClient(base_url=api.base_url, transport=httpx.MockTransport(handler))
+    return api
+
+
+def test_concurrent_identical_gets_are_coalesced():
+    calls = []
+
+    async def handler(request):
+        calls.append(request.url.path)
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json={"n": len(calls)})
+
+    async def run():
+        api = _client(handler)
+        responses = await asyncio.gather(*[api.get("/tenant/t-1") for _ in range(5)])
+        return api, responses
+
+    api, responses = asyncio.run(run())
+    assert calls == ["/tenant/t-1"]
+    assert api.coalesced == 4
+    assert all(response.json() == {"n": 1} for response in responses)
+
+
+def test_get_after_forget_is_not_coalesced_onto_older_flight():
+    calls = []
+
+    async def run():
+        first_sent = asyncio.Event()
+        gate = asyncio.Event()
+
+        async def handler(request):
+            calls.append(request.url.path)
+            if len(calls) == 1:
+                first_sent.set()
+                await gate.wait()
+                return httpx.Response(200, json={"version": "old"})
+            return httpx.Response(200, json={"version": "new"})
+
+        api = _client(handler)
+        older = asyncio.create_task(api.get("/tenant/t-1/prompt"))
+        await first_sent.wait()
+        # A write to the path happens here
+        api.forget("/tenant/t-1", subtree=True)
+        newer = await api.get("/tenant/t-1/prompt")
+        gate.set()
+        return (await older).json(), newer.json()
+
+    older, newer = asyncio.run(run())
+    assert older == {"version": "old"}
+    assert newer == {"version": "new"}
+    assert len(calls) == 2
+
+
+def _resilient_client(handler, threshold: int = 5, max_retries: int = 3) -> ApiClient:
+    return _client(handler, retry_policy=RetryPolicy(max_retries=max_retries, base_delay=0.001, max_delay=0.01),
+                   breaker=CircuitBreaker(threshold=threshold, reset_timeout=30))
+
+
+def test_get_is_retried_on_transient_status():
+    statuses = [503, 429, 200]
+
+    def handler(request):
+        return httpx.Response(statuses.pop(0), json={})
+
+    response = asyncio.run(_resilient_client(handler).get("/tenant/t-1"))
+    assert response.status_code == 200 and statuses == []
+
+
+def test_get_is_not_retried_on_other_errors():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(500, json={})
+
+    assert asyncio.run(_resilient_client(handler).get("/tenant/t-1")).status_code == 500
+    assert len(calls) == 1
+
+
+def test_post_is_only_retried_when_asked_with_one_idempotency_key():
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(503 if len(requests) % 3 else 201, json={})
+
+    api = _resilient_client(handler)
+    assert asyncio.run(api.post("/tenant/t-1/prompt", json={})).status_code == 503
+    assert len(requests) == 1 and "Idempotency-Key" not in requests[0].headers
+    requests.clear()
+    assert asyncio.run(api.post("/tenant/t-1/prompt", json={"a": 1}, retry=True)).status_code == 201
+    keys = {request.headers["Idempotency-Key"] for request in requests}
+    assert len(requests) == 3 and len(keys) == 1
+    assert len({request.content for request in requests}) == 1
+
+
+def test_connection_errors_are_retried_and_open_the_breaker():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        raise httpx.ConnectError("refused", request=request)
+
+    api = _resilient_client(handler, threshold=2, max_retries=5)
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(api.get("/tenant/t-1"))
+    assert len(calls) == 2
+    assert api.breaker.state("api.test") == "open"
+
+
+def test_local_errors_do_not_count_against_the_breaker():
+    def handler(request):
+        raise ValueError("bad body")
+
+    api = _resilient_client(handler, threshold=1)
+    for _ in range(3):
+        with pytest.raises(ValueError):
+            asyncio.run(api.post("/tenant/t-1/prompt", json={}))
+    assert api.breaker.state("api.test") == "closed"
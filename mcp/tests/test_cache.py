@@ -0,0 +1,87 @@
+# test_cache.py
+import asyncio
+import os
+import stat
+
+from cache import MISSING, ResponseCache
+from result_store import ResultStore
+
+
+def test_entries_expire_after_their_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("cache.time.monotonic", lambda: now[0])
+    cache = ResponseCache(ttls={"tenant": 10})
+    cache.set("tenant", "key", "t-1", "/tenant/t-1", None, {"name": "a"})
+    assert cache.get("tenant", "key", "t-1", "/tenant/t-1") == {"name": "a"}
+    now[0] += 11
+    assert cache.get("tenant", "key", "t-1", "/tenant/t-1") is MISSING
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResponseCache(max_size=2)
+    cache.set("tenant", "key", "t-1", "/a", None, 1)
+    cache.set("tenant", "key", "t-1", "/b", None, 2)
+    cache.get("tenant", "key", "t-1", "/a")
+    cache.set("tenant", "key", "t-1", "/c", None, 3)
+    assert cache.get("tenant", "key", "t-1", "/b") is MISSING
+    assert cache.get("tenant", "key", "t-1", "/a") == 1
+    assert cache.evictions == 1
+
+
+def test_invalidate_drops_subtree_and_stored_entries(tmp_path):
+    store = ResultStore(str(tmp_path / "store" / "results.sqlite3"))
+    cache = ResponseCache(store=store)
+    cache.set("brand", "key", "t-1", "/tenant/t-1/brand/b-1", None, {})
+    cache.set("compass", "key", "t-1", "/tenant/t-1/brand/b-1/compass", None, {})
+    store.put("t-1", "key", "/tenant/t-1/brand/b-1/compass", None, b"{}")
+    asyncio.run(cache.invalidate("t-1", "/tenant/t-1/brand/b-1", subtree=True))
+    assert cache.get("compass", "key", "t-1", "/tenant/t-1/brand/b-1/compass") is MISSING
+    assert cache.get("brand", "key", "t-1", "/tenant/t-1/brand/b-1") is MISSING
+    assert store.get("key", "/tenant/t-1/brand/b-1/compass") is None
+
+
+def test_store_is_private_to_the_user(tmp_path):
+    path = tmp_path / "store" / "results.sqlite3"
+    store = ResultStore(str(path))
+    store.put("t-1", "key", "/tenant/t-1", None, b"{}")
+    assert stat.S_IMODE(os.stat(path.parent).st_mode) == 0o700
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+
+def test_changed_since_sees_invalidations_of_the_path_and_its_subtrees():
+    cache = ResponseCache()
+    before = cache.generation()
+    asyncio.run(cache.invalidate("t-1", "/tenant/t-1/prompt"))
+    assert cache.changed_since("t-1", "/tenant/t-1/prompt", before)
+    assert not cache.changed_since("t-1", "/tenant/t-1/prompt/p-1", before)
+    assert not cache.changed_since("t-2", "/tenant/t-1/prompt", before)
+    assert not cache.changed_since("t-1", "/tenant/t-1/prompt", cache.generation())
+    before = cache.generation()
+    asyncio.run(cache.invalidate("t-1", "/tenant/t-1/brand/b-1", subtree=True))
+    assert cache.changed_since("t-1", "/tenant/t-1/brand/b-1/compass", before)
+    assert not cache.changed_since("t-1", "/tenant/t-1/brand/b-10", before)
+
+
+def test_changed_since_is_conservative_past_its_history(monkeypatch):
+    monkeypatch.setattr("cache.INVALIDATION_HISTORY", 4)
+    cache = ResponseCache()
+    before = cache.generation()
+    for index in range(10):
+        asyncio.run(cache.invalidate("t-1", f"/tenant/t-1/prompt/p-{index}"))
+    assert cache.changed_since("t-1", "/tenant/t-1/worker", before)
+    assert len(cache._invalidated) <= 4
+
+
+def test_store_drops_generations_kept_for_good_by_older_versions(tmp_path):
+    path = str(tmp_path / "results.sqlite3")
+    generation = "/tenant/t-1/brand/b-1/worker/w-1/generation/g-1"
+    store = ResultStore(path)
+    store.put("t-1", "key", generation, None, b"{}")
+    store.put("t-1", "key", f"{generation}/version/v-1", None, b"{}")
+    store.put("t-1", "key", "/tenant/t-1/brand/b-1/compass", None, b"{}", max_age=60)
+    store.db.execute("PRAGMA user_version = 0")
+    store.db.close()
+    store = ResultStore(path)
+    assert store.get("key", generation) is None
+    assert store.get("key", f"{generation}/version/v-1").fresh
+    assert store.get("key", "/tenant/t-1/brand/b-1/compass").fresh
@@ -0,0 +1,32 @@
+# test_chat.py
+import asyncio
+
+from chat import ChatPool
+from stub_chat import start_chat_stub
+
+
+def _exchange(pool: ChatPool, count: int) -> list:
+    async def run():
+        try:
+            return [await pool.send("token", {"message": f"m{index}"}, timeout=5) for index in range(count)]
+        finally:
+            await pool.close()
+
+    return asyncio.run(run())
+
+
+def test_connection_is_reused_after_an_end_frame():
+    stub = start_chat_stub(first_chunk_delay=0, chunks=3, chunk_interval=0)
+    pool = ChatPool(url=stub.url, ping_interval=0, end_idle=1)
+    replies = _exchange(pool, 2)
+    assert [reply["ended_by"] for reply in replies] == ["end_message", "end_message"]
+    assert pool.opened == 1 and pool.reused == 1
+
+
+def test_reply_ended_by_silence_does_not_leak_into_the_next_one():
+    stub = start_chat_stub(first_chunk_delay=0, chunks=3, chunk_interval=0.3, end_message=False)
+    pool = ChatPool(url=stub.url, ping_interval=0, end_idle=0.1)
+    replies = _exchange(pool, 2)
+    assert [reply["ended_by"] for reply in replies] == ["idle", "idle"]
+    assert [reply["reply"] for reply in replies] == ["word0 ", "word0 "]
+    assert pool.opened == 2
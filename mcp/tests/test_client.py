@@ -0,0 +1,133 @@
+# test_client.py
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from client import MCPClient
+from memory import ConversationMemory
+
+
+class Block(SimpleNamespace):
+    def model_dump(self, exclude_none: bool = False) -> dict:
+        return {key: value for key, value in vars(self).items() if value is not None or not exclude_none}
+
+
+def _tool_use(tool_use_id: str, name: str = "create_generation") -> Block:
+    return Block(type="tool_use", id=tool_use_id, name=name, input={"context": tool_use_id})
+
+
+class FakeStream:
+    def __init__(self, events: list, message, error: Exception = None):
+        self.events = events
+        self.message = message
+        self.error = error
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def __aiter__(self):
+        for event in self.events:
+            yield event
+            await asyncio.sleep(0)
+        if self.error is not None:
+            raise self.error
+
+    async def get_final_message(self):
+        return self.message
+
+
+def _client(streams: list) -> tuple:
+    client = MCPClient.__new__(MCPClient)
+    client.memory = ConversationMemory()
+    client._tools = [{"name": "create_generation"}]
+    client.anthropic = SimpleNamespace(messages=SimpleNamespace(stream=lambda **kwargs: streams.pop(0)))
+    calls = []
+
+    async def call_tool(tool_use):
+        calls.append(tool_use.id)
+        await asyncio.sleep(0.01)
+        return {"type": "tool_result", "tool_use_id": tool_use.id, "content": [{"type": "text", "text": "ok"}],
+                "is_error": False}
+
+    client._call_tool = call_tool
+    return client, calls
+
+
+def _message(content: list, stop_reason: str):
+    usage = SimpleNamespace(cache_read_input_tokens=0, cache_creation_input_tokens=0, input_tokens=1, output_tokens=1)
+    return SimpleNamespace(content=content, stop_reason=stop_reason, usage=usage)
+
+
+def _stop(block) -> SimpleNamespace:
+    return SimpleNamespace(type="content_block_stop", content_block=block)
+
+
+def test_tool_calls_of_a_cut_off_turn_are_awaited_and_paired():
+    started, cut_off = _tool_use("tu-1"), _tool_use("tu-2")
+    message = _message([started, cut_off], "max_tokens")
+    client, calls = _client([FakeStream([_stop(started)], message)])
+    _, results = asyncio.run(client._stream_turn([], client._tools, lambda: None))
+    assert calls == ["tu-1"]
+    assert [result["tool_use_id"] for result in results] == ["tu-1", "tu-2"]
+    assert not results[0]["is_error"] and results[1]["is_error"]
+
+
+def test_running_tool_calls_are_cancelled_and_awaited_when_the_stream_fails(monkeypatch):
+    started = _tool_use("tu-1")
+    client, calls = _client([FakeStream([_stop(started)], None, error=ConnectionError("dropped"))])
+    tasks = []
+    create_task = asyncio.create_task
+    monkeypatch.setattr(asyncio, "create_task", lambda coro: tasks.append(create_task(coro)) or tasks[-1])
+
+    async def run():
+        with pytest.raises(ConnectionError):
+            await client._stream_turn([], client._tools, lambda: None)
+        return [task.done() for task in tasks]
+
+    assert asyncio.run(run()) == [True]
+    assert calls == ["tu-1"]
+
+
+def _unanswered_tool_uses(messages: list) -> list:
+    """ids of tool_use blocks not answered by a tool_result in the next message"""
+    unanswered = []
+    for index, message in enumerate(messages):
+        if message["role"] != "assistant" or isinstance(message["content"], str):
+            continue
+        following = messages[index + 1]["content"] if index + 1 < len(messages) else []
+        answered = {block["tool_use_id"] for block in following
+                    if isinstance(block, dict) and block.get("type") == "tool_result"}
+        unanswered += [block["id"] for block in message["content"]
+                       if block["type"] == "tool_use" and block["id"] not in answered]
+    return unanswered
+
+
+def test_history_stays_valid_after_a_turn_cut_off_with_tool_calls():
+    started = _tool_use("tu-1")
+    sent = []
+    streams = [
+        FakeStream([_stop(started)], _message([Block(type="text", text="Starting"), started], "max_tokens")),
+        FakeStream([], _message([Block(type="text", text="Started")], "end_turn")),
+        FakeStream([], _message([Block(type="text", text="Hello")], "end_turn")),
+    ]
+    client, calls = _client(streams)
+
+    def stream(**kwargs):
+        sent.append([dict(message) for message in kwargs["messages"]])
+        return streams.pop(0)
+
+    client.anthropic.messages.stream = stream
+
+    async def run():
+        await client.process_query("generate")
+        await client.process_query("hi")
+
+    asyncio.run(run())
+    assert calls == ["tu-1"]
+    assert client.last_query_stats["model_calls"] == 1
+    assert _unanswered_tool_uses(sent[-1]) == []
+    assert _unanswered_tool_uses(client.memory.messages()) == []
@@ -0,0 +1,61 @@
+# test_compaction.py
+import os
+
+import pytest
+
+import compaction
+from compaction import load_spilled, spill_if_oversized
+
+
+@pytest.fixture
+def spill_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("SOCIAL_TOOLKIT_SPILL_DIR", str(tmp_path))
+    monkeypatch.setenv("SOCIAL_TOOLKIT_MAX_RESULT_BYTES", "1024")
+    monkeypatch.setattr(compaction, "_last_prune", None)
+    return tmp_path
+
+
+def _large(n: int = 100) -> list:
+    return [{"source_id": f"s-{i}", "status": "COMPLETED", "text": "x" * 100} for i in range(n)]
+
+
+def test_small_results_are_returned_as_is(spill_dir):
+    value = {"status": "success"}
+    assert spill_if_oversized(value) is value
+    assert not os.listdir(spill_dir)
+
+
+def test_oversized_result_is_spilled_privately_and_readable(spill_dir):
+    spilled = spill_if_oversized(_large(), "list_sources")
+    assert spilled["status"] == "spilled" and spilled["total"] == 100
+    assert spilled["by_status"] == {"COMPLETED": 100}
+    path = spill_dir / f"{spilled['result_handle']}.json"
+    assert path.stat().st_mode & 0o777 == 0o600
+    assert load_spilled(spilled["result_handle"]) == _large()
+
+
+def test_expired_results_are_swept_at_most_once_per_interval(spill_dir, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(compaction.time, "monotonic", lambda: now[0])
+    monkeypatch.setenv("SOCIAL_TOOLKIT_SPILL_TTL", "60")
+
+    def expire(handle):
+        path = spill_dir / f"{handle}.json"
+        os.utime(path, (0, 0))
+        return path
+
+    first = expire(spill_if_oversized(_large())["result_handle"])
+    # The first spill swept before writing; the next sweep waits for the interval
+    second = spill_if_oversized(_large())
+    assert first.exists()
+    now[0] += compaction.SPILL_PRUNE_INTERVAL
+    spill_if_oversized(_large())
+    assert not first.exists()
+    assert load_spilled(second["result_handle"]) == _large()
+
+
+def test_invalid_or_missing_handles_are_rejected(spill_dir):
+    with pytest.raises(ValueError):
+        load_spilled("../etc/passwd")
+    with pytest.raises(ValueError):
+        load_spilled("res-" + "0" * 32)
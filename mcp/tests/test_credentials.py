@@ -0,0 +1,57 @@
+# test_credentials.py
+from credentials import CredentialRegistry, SessionContext, SessionContexts
+
+
+class Session:
+    """Stands in for an MCP session, which SessionContexts holds weakly"""
+
+
+def _registry(**kwargs) -> CredentialRegistry:
+    return CredentialRegistry({"t-abc": {"api_key": "sk-abc", "brand_id": "b-1"}}, default_tenant="t-abc",
+                              admin_token="admin", **kwargs)
+
+
+def test_local_session_uses_registry():
+    contexts = SessionContexts(_registry())
+    context = contexts.get(Session())
+    assert (context.tenant_id, context.brand_id) == ("t-abc", "b-1")
+    assert contexts.api_key(context, "t-abc") == "sk-abc"
+    assert contexts.admin_token() == "admin"
+
+
+def test_remote_session_without_server_token_gets_nothing_from_registry():
+    contexts = SessionContexts(_registry(), remote=True)
+    session = Session()
+    context = contexts.get(session)
+    assert context.tenant_id is None
+    assert contexts.default_tenant() is None
+    assert contexts.api_key(context, "t-abc") is None
+    assert contexts.admin_token() is None
+    assert contexts.brand_id(context, "t-abc") is None
+    # Its own bearer token is still used
+    assert contexts.api_key(context, "t-abc", "sk-client") == "sk-client"
+    assert contexts.admin_token("sk-client") == "sk-client"
+
+
+def test_remote_session_with_wrong_token_gets_nothing_from_registry():
+    contexts = SessionContexts(_registry(server_token="secret"), remote=True)
+    context = contexts.get(Session(), "guess")
+    assert context.tenant_id is None
+    assert contexts.api_key(context, "t-abc", "guess") == "guess"
+    assert contexts.admin_token("guess") == "guess"
+
+
+def test_remote_session_with_server_token_uses_registry():
+    contexts = SessionContexts(_registry(server_token="secret"), remote=True)
+    context = contexts.get(Session(), "secret")
+    assert context.tenant_id == "t-abc"
+    # The server token itself is never sent as an API key
+    assert contexts.api_key(context, "t-abc", "secret") == "sk-abc"
+    assert contexts.admin_token("secret") == "admin"
+
+
+def test_key_given_to_use_tenant_wins():
+    contexts = SessionContexts(_registry())
+    context = SessionContext("t-abc", "sk-own", None)
+    assert contexts.api_key(context, "t-abc", "sk-header") == "sk-own"
+    assert contexts.api_key(context, "t-other", "sk-header") == "sk-header"
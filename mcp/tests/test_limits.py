@@ -0,0 +1,63 @@
+# test_limits.py
+import asyncio
+
+from limits import TenantLimiter
+
+
+def _limiter(**kwargs) -> TenantLimiter:
+    limiter = TenantLimiter(rate_period=0, **kwargs)
+    limiter.set_limits("t-1", {"TEXT": 2})
+    return limiter
+
+
+def test_slot_is_released_after_the_block():
+    async def run():
+        limiter = _limiter()
+        async with limiter.slot("t-1", "key"):
+            assert limiter.snapshot()["tenants"]["t-1"]["TEXT"]["in_use"] == 1
+        return limiter.snapshot()["tenants"]["t-1"]["TEXT"]["in_use"]
+
+    assert asyncio.run(run()) == 0
+
+
+def test_held_slots_bound_running_jobs_until_they_finish():
+    async def run():
+        limiter = _limiter()
+        finished = [asyncio.Event() for _ in range(3)]
+        for event in finished[:2]:
+            limiter.hold(await limiter.acquire("t-1", "key"), event.wait())
+        third = asyncio.create_task(limiter.acquire("t-1", "key"))
+        await asyncio.sleep(0.01)
+        blocked = not third.done()
+        finished[0].set()
+        lease = await asyncio.wait_for(third, 1)
+        lease.release()
+        return blocked
+
+    assert asyncio.run(run())
+
+
+def test_held_slot_is_released_on_timeout_and_error():
+    async def run():
+        limiter = _limiter(hold_timeout=0.01)
+
+        async def fail():
+            raise RuntimeError("poll failed")
+
+        limiter.hold(await limiter.acquire("t-1", "key"), asyncio.Event().wait())
+        limiter.hold(await limiter.acquire("t-1", "key"), fail())
+        await asyncio.sleep(0.05)
+        return limiter.snapshot()["tenants"]["t-1"]["TEXT"]["in_use"]
+
+    assert asyncio.run(run()) == 0
+
+
+def test_lease_is_released_once():
+    async def run():
+        limiter = _limiter()
+        lease = await limiter.acquire("t-1", "key")
+        lease.release()
+        lease.release()
+        return limiter.snapshot()["tenants"]["t-1"]["TEXT"]["in_use"]
+
+    assert asyncio.run(run()) == 0
@@ -0,0 +1,46 @@
+# test_memory.py
+import json
+
+from memory import ToolResultStore
+
+
+def _content(value) -> list:
+    return [{"type": "text", "text": json.dumps(value, separators=(",", ":"))}]
+
+
+def test_read_results_are_served_again_until_a_write():
+    store = ToolResultStore(result_ttl=60)
+    store.put("tu-1", "get_brand", {"brand_id": "b-1"}, _content({"name": "Brand"}), False)
+    assert store.lookup("tu-2", "get_brand", {"brand_id": "b-1"}) is not None
+    store.put("tu-3", "update_brand", {"brand_id": "b-1"}, _content({"name": "New"}), False)
+    assert store.lookup("tu-4", "get_brand", {"brand_id": "b-1"}) is None
+
+
+def test_pending_results_are_not_served_again():
+    store = ToolResultStore(result_ttl=60)
+    for index, status in enumerate(("NOT_STARTED", "QUEUED", "PROCESSING")):
+        arguments = {"generation_id": f"g-{index}"}
+        store.put(f"tu-{index}", "get_generation", arguments, _content({"status": status}), False)
+        assert store.lookup(f"tu-again-{index}", "get_generation", arguments) is None
+    store.put("tu-done", "get_generation", {"generation_id": "g-done"}, _content({"status": "COMPLETED"}), False)
+    assert store.lookup("tu-again", "get_generation", {"generation_id": "g-done"}) is not None
+
+
+def test_least_recently_used_results_are_evicted():
+    store = ToolResultStore(result_ttl=60, max_bytes=250)
+    refs = [store.put(f"tu-{index}", "get_prompt", {"prompt_id": f"p-{index}"},
+                      _content({"text": "x" * 90}), False) for index in range(2)]
+    # Recalling the first makes the second the least recently used
+    assert store.recall("tu-recall", refs[0]) is not None
+    store.put("tu-2", "get_prompt", {"prompt_id": "p-2"}, _content({"text": "x" * 90}), False)
+    assert store.get(refs[1]) is None
+    assert store.lookup("tu-again", "get_prompt", {"prompt_id": "p-1"}) is None
+    assert store.ref_for("tu-1") is None
+    assert store.get(refs[0]) is not None
+    assert store.size <= 250 and store.evictions == 1
+
+
+def test_newest_result_is_kept_even_if_larger_than_the_limit():
+    store = ToolResultStore(max_bytes=10)
+    ref = store.put("tu-1", "list_sources", {}, _content(["x" * 100]), False)
+    assert store.get(ref) is not None
@@ -0,0 +1,26 @@
+# test_metrics.py
+import threading
+import time
+
+from metrics import Metrics
+
+
+def test_file_exporter_keeps_running_after_a_failed_write(tmp_path, caplog):
+    metrics = Metrics()
+    metrics.record_tool("get_brand", 0.01)
+    path = tmp_path / "missing" / "metrics.prom"
+    stop = threading.Event()
+    exporter = threading.Thread(target=metrics._write_loop, args=(str(path), 0.01, stop), daemon=True)
+    exporter.start()
+    # Writes fail while the directory is missing, then succeed once it exists
+    time.sleep(0.05)
+    path.parent.mkdir()
+    for _ in range(100):
+        if path.exists():
+            break
+        time.sleep(0.01)
+    stop.set()
+    exporter.join(1)
+    assert not exporter.is_alive()
+    assert "get_brand" in path.read_text()
+    assert "Failed to write metrics" in caplog.text
@@ -0,0 +1,56 @@
+# test_pagination.py
+import asyncio
+
+import pytest
+
+from pagination import make_filters, matches, read_page
+
+
+def _dated(created_at) -> dict:
+    return {"id": "g-1", "status": "COMPLETED", "created_at": created_at}
+
+
+def test_created_range_is_half_open():
+    filters = make_filters(created_after="2024-01-01", created_before="2024-02-01T00:00:00Z")
+    assert matches(_dated("2024-01-01T00:00:00Z"), filters)
+    assert matches(_dated("2024-01-31T23:59:59"), filters)
+    assert not matches(_dated("2024-02-01T00:00:00+00:00"), filters)
+    assert not matches(_dated("2023-12-31T23:59:59Z"), filters)
+
+
+@pytest.mark.parametrize("created_at", [None, "", "garbage", "2024-13-45", 1704067200])
+def test_unreadable_timestamps_do_not_match_a_time_filter(created_at):
+    item = _dated(created_at)
+    assert not matches(item, make_filters(created_after="2024-01-01"))
+    assert not matches(item, make_filters(created_before="2030-01-01"))
+    assert matches(item, make_filters(status="completed"))
+
+
+def test_missing_timestamp_does_not_match_a_time_filter():
+    assert not matches({"id": "g-1"}, make_filters(created_after="2024-01-01"))
+    assert matches({"id": "g-1"}, {})
+
+
+def test_bad_filter_timestamp_fails_before_any_request():
+    with pytest.raises(ValueError):
+        make_filters(created_after="garbage")
+
+
+def test_read_page_skips_unreadable_items_and_resumes_from_its_cursor():
+    items = [_dated("2024-01-02"), _dated("garbage"), {"id": "g-x"}, _dated("2024-01-03"), _dated("2024-01-04")]
+
+    async def fetch(params):
+        start = int(params.get("cursor") or 0)
+        end = start + params["limit"]
+        return {"items": items[start:end], "next_cursor": str(end) if end < len(items) else None}
+
+    async def pages():
+        filters = make_filters(created_after="2024-01-01")
+        first = await read_page(fetch, filters, page_size=2)
+        second = await read_page(fetch, {}, page_size=2, cursor=first["next_cursor"])
+        return first, second
+
+    first, second = asyncio.run(pages())
+    assert [item["created_at"] for item in first["items"]] == ["2024-01-02", "2024-01-03"]
+    assert [item["created_at"] for item in second["items"]] == ["2024-01-04"]
+    assert second["next_cursor"] is None
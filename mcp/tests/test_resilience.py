@@ -0,0 +1,97 @@
+# test_resilience.py
+import email.utils
+import time
+
+import httpx
+import pytest
+
+from resilience import CircuitBreaker, CircuitOpenError, RetryPolicy, retry_after_seconds
+
+
+def _response(retry_after: str = None) -> httpx.Response:
+    headers = {"Retry-After": retry_after} if retry_after is not None else {}
+    return httpx.Response(503, headers=headers)
+
+
+def test_retry_after_seconds_and_http_date():
+    assert retry_after_seconds(_response("7")) == 7
+    assert retry_after_seconds(_response()) is None
+    assert retry_after_seconds(_response("soon")) is None
+    when = email.utils.formatdate(time.time() + 60, usegmt=True)
+    assert 55 <= retry_after_seconds(_response(when)) <= 60
+
+
+def test_retry_after_takes_precedence_and_is_capped():
+    policy = RetryPolicy(max_retries=3, base_delay=0.5, max_delay=10)
+    assert policy.delay(1, _response("2")) == 2
+    assert policy.delay(1, _response("3600")) == 10
+
+
+def test_backoff_grows_with_full_jitter_up_to_max_delay():
+    policy = RetryPolicy(max_retries=10, base_delay=0.5, max_delay=3)
+    for attempt, ceiling in ((1, 0.5), (2, 1), (3, 2), (8, 3)):
+        delays = [policy.delay(attempt, _response()) for _ in range(200)]
+        assert all(0 <= delay <= ceiling for delay in delays)
+        assert max(delays) > ceiling / 2
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("resilience.time.monotonic", lambda: now[0])
+    return now
+
+
+def test_breaker_opens_after_threshold_consecutive_failures(clock):
+    breaker = CircuitBreaker(threshold=3, reset_timeout=30)
+    for _ in range(2):
+        breaker.record("api", failed=True)
+    breaker.record("api", failed=False)
+    for _ in range(2):
+        breaker.record("api", failed=True)
+    assert breaker.state("api") == "closed"
+    breaker.record("api", failed=True)
+    assert breaker.state("api") == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request("api")
+    breaker.before_request("other")
+
+
+def test_half_open_breaker_lets_one_trial_through(clock):
+    breaker = CircuitBreaker(threshold=1, reset_timeout=30)
+    breaker.record("api", failed=True)
+    clock[0] += 31
+    assert breaker.state("api") == "half_open"
+    breaker.before_request("api")
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request("api")
+    breaker.record("api", failed=False)
+    assert breaker.state("api") == "closed"
+    breaker.before_request("api")
+
+
+def test_failed_trial_opens_the_breaker_again(clock):
+    breaker = CircuitBreaker(threshold=1, reset_timeout=30)
+    breaker.record("api", failed=True)
+    clock[0] += 31
+    breaker.before_request("api")
+    breaker.record("api", failed=True)
+    assert breaker.state("api") == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request("api")
+
+
+def test_abandoned_trial_frees_the_half_open_slot(clock):
+    breaker = CircuitBreaker(threshold=1, reset_timeout=30)
+    breaker.record("api", failed=True)
+    clock[0] += 31
+    breaker.before_request("api")
+    breaker.abandon("api")
+    breaker.before_request("api")
+
+
+def test_disabled_breaker_never_opens():
+    breaker = CircuitBreaker(threshold=0)
+    for _ in range(10):
+        breaker.record("api", failed=True)
+    breaker.before_request("api")
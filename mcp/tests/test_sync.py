@@ -0,0 +1,133 @@
+# test_sync.py
+import asyncio
+import time
+
+import pytest
+
+from sync import hash_files, in_scope, load_manifest, plan_sync, save_manifest, scan_directory
+
+
+def entry(digest: str, source_id: str = None) -> dict:
+    value = {"hash": digest, "size": 1, "mtime_ns": 1}
+    if source_id:
+        value["source_id"] = source_id
+    return value
+
+
+def test_unchanged_files_are_kept():
+    previous = {"a.md": entry("h1", "s1"), "b.md": entry("h2", "s2")}
+    plan = plan_sync({"a.md": entry("h1"), "b.md": entry("h2")}, previous)
+    assert plan["keep"] == {"a.md": "s1", "b.md": "s2"}
+    assert plan["upload"] == {} and plan["delete"] == [] and plan["replaced"] == []
+
+
+def test_moved_and_renamed_files_keep_their_source():
+    previous = {"a.md": entry("h1", "s1"), "docs/b.md": entry("h2", "s2")}
+    plan = plan_sync({"notes/a.md": entry("h1"), "docs/renamed.md": entry("h2")}, previous)
+    assert plan["keep"] == {"notes/a.md": "s1", "docs/renamed.md": "s2"}
+    assert plan["upload"] == {} and plan["delete"] == []
+
+
+def test_changed_file_is_replaced():
+    plan = plan_sync({"a.md": entry("h1-new")}, {"a.md": entry("h1", "s1")})
+    assert plan["upload"] == {"h1-new": ["a.md"]}
+    assert plan["replaced"] == ["a.md"]
+    assert plan["delete"] == ["s1"]
+
+
+def test_new_content_is_uploaded_once():
+    plan = plan_sync({"a.md": entry("h1"), "copy.md": entry("h1")}, {})
+    assert plan["upload"] == {"h1": ["a.md", "copy.md"]}
+
+
+def test_removed_file_is_deleted_unless_disabled():
+    previous = {"a.md": entry("h1", "s1"), "b.md": entry("h2", "s2")}
+    assert plan_sync({"a.md": entry("h1")}, previous)["delete"] == ["s2"]
+    assert plan_sync({"a.md": entry("h1")}, previous, delete_removed=False)["delete"] == []
+
+
+def test_removed_copy_keeps_the_shared_source():
+    previous = {"a.md": entry("h1", "s1"), "copy.md": entry("h1", "s1")}
+    plan = plan_sync({"a.md": entry("h1")}, previous)
+    assert plan["keep"] == {"a.md": "s1"} and plan["delete"] == []
+
+
+def test_narrower_glob_leaves_other_files_alone():
+    previous = {"a.md": entry("h1", "s1"), "b.mp4": entry("h2", "s2")}
+    plan = plan_sync({"a.md": entry("h1")}, previous, glob="*.md")
+    assert plan["delete"] == []
+    assert plan["untouched"] == {"b.mp4": previous["b.mp4"]}
+
+
+def test_narrower_glob_still_deletes_removed_matching_files():
+    previous = {"a.md": entry("h1", "s1"), "gone.md": entry("h3", "s3"), "b.mp4": entry("h2", "s2")}
+    plan = plan_sync({"a.md": entry("h1")}, previous, glob="*.md")
+    assert plan["delete"] == ["s3"]
+
+
+def test_narrower_glob_protects_content_shared_with_files_outside_it():
+    previous = {"a.md": entry("h1", "s1"), "a.txt": entry("h1", "s1")}
+    plan = plan_sync({}, previous, glob="*.md")
+    assert plan["delete"] == []
+
+
+def test_sources_gone_from_the_server_are_uploaded_again():
+    previous = {"a.md": entry("h1", "s1"), "b.md": entry("h2", "s2")}
+    plan = plan_sync({"a.md": entry("h1"), "b.md": entry("h2")}, previous, remote={"s1": "COMPLETED"})
+    assert plan["keep"] == {"a.md": "s1"}
+    assert plan["upload"] == {"h2": ["b.md"]}
+    assert plan["delete"] == []
+
+
+def test_failed_sources_are_reprocessed():
+    plan = plan_sync({"a.md": entry("h1")}, {"a.md": entry("h1", "s1")}, remote={"s1": "FAILED"})
+    assert plan["reprocess"] == ["s1"]
+
+
+@pytest.mark.parametrize("relative, glob, expected", [
+    ("a.md", "**/*", True),
+    ("docs/a.md", "**/*", True),
+    ("a.md", "*.md", True),
+    ("docs/a.md", "*.md", False),
+    ("docs/a.md", "**/*.md", True),
+    ("b.mp4", "*.md", False),
+])
+def test_in_scope_matches_scan_directory(tmp_path, relative, glob, expected):
+    assert in_scope(relative, glob) is expected
+    (tmp_path / relative).parent.mkdir(parents=True, exist_ok=True)
+    (tmp_path / relative).write_text("x")
+    assert (relative in scan_directory(str(tmp_path), glob)) is expected
+
+
+def test_manifest_round_trip_and_hash_reuse(tmp_path):
+    (tmp_path / "a.md").write_text("hello")
+    files = scan_directory(str(tmp_path))
+    local, read = asyncio.run(hash_files(files, {}))
+    assert read == 1
+    path = str(tmp_path / "sync" / "manifest.json")
+    save_manifest(path, str(tmp_path), {"a.md": {**local["a.md"], "source_id": "s1"}})
+    previous = load_manifest(path)
+    assert previous["a.md"]["source_id"] == "s1"
+    assert asyncio.run(hash_files(files, previous))[1] == 0
+
+
+def test_cancelled_hashing_does_not_wait_for_files_being_read(tmp_path, monkeypatch):
+    def slow_hash(file_path):
+        time.sleep(0.5)
+        return "digest"
+
+    monkeypatch.setattr("sync.hash_file", slow_hash)
+    for index in range(8):
+        (tmp_path / f"{index}.md").write_text(str(index))
+    files = scan_directory(str(tmp_path))
+
+    async def run():
+        task = asyncio.create_task(hash_files(files, {}, max_workers=4))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        started = time.perf_counter()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return time.perf_counter() - started
+
+    assert asyncio.run(run()) < 0.25
@@ -0,0 +1,49 @@
+# test_waiters.py
+import asyncio
+
+from waiters import Waiter
+
+
+def _fetcher(states: list, calls: list, delay: float = 0.0):
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return states.pop(0) if len(states) > 1 else states[0]
+    return fetch
+
+
+def test_concurrent_waits_share_one_poll():
+    calls = []
+    fetch = _fetcher([{"status": "QUEUED"}, {"status": "PROCESSING"}, {"status": "COMPLETED"}], calls)
+
+    async def run():
+        waiter = Waiter(initial_delay=0.01, max_delay=0.01)
+        return await asyncio.gather(*[waiter.wait("g-1", fetch, 5) for _ in range(3)])
+
+    results = asyncio.run(run())
+    assert results == [(True, {"status": "COMPLETED"})] * 3
+    assert len(calls) == 3
+
+
+def test_timeout_returns_the_latest_state():
+    calls = []
+
+    async def run():
+        waiter = Waiter(initial_delay=0.01, max_delay=0.01, heartbeat=0.01)
+        return await waiter.wait("g-1", _fetcher([{"status": "QUEUED"}], calls), 0.05)
+
+    assert asyncio.run(run()) == (False, {"status": "QUEUED"})
+
+
+def test_waiter_arriving_as_the_last_one_leaves_gets_a_fresh_poll():
+    calls = []
+    fetch = _fetcher([{"status": "COMPLETED"}], calls, delay=0.05)
+
+    async def run():
+        waiter = Waiter(initial_delay=0.01)
+        # Times out and cancels the shared poll, which has not unwound yet when the next wait starts
+        assert (await waiter.wait("g-1", fetch, 0.01))[0] is False
+        return await waiter.wait("g-1", fetch, 1)
+
+    assert asyncio.run(run()) == (True, {"status": "COMPLETED"})
+    assert len(calls) == 2
@@ -0,0 +1,93 @@
+# transport.py
+"""
+Network transports for running server.py as a long-lived service.
+
+Over stdio every client launches its own server process, with a cold
+connection pool and an empty cache. Over HTTP one process serves any number
+of clients, and they all share the warm pool, cache, waiters and limiters:
+- sse: the SSE transport, served at /sse with messages posted to /messages/
+- streamable-http: served at /mcp (needs mcp>=1.8)
+
+A client may send `Authorization: Bearer <key>` when it connects. That key is
+used for every tool call of the session whose api_key (or admin_token)
+argument is left empty, so the key never has to pass through the model.
+Keys held by the server itself are only used for sessions whose bearer
+token is SOCIAL_TOOLKIT_SERVER_TOKEN (see credentials.py).
+
+GET /healthz answers 200 once the server accepts connections.
+"""
+from contextvars import ContextVar
+
+# Bearer token sent by the client of the current SSE session
+forwarded_token: ContextVar = ContextVar("forwarded_token", default=None)
+
+TRANSPORTS = ("stdio", "sse", "streamable-http")
+
+
+def bearer_token(headers) -> str:
+    authorization = headers.get("authorization") or ""
+    scheme, _, token = authorization.partition(" ")
+    return token.strip() if scheme.lower() == "bearer" and token.strip() else None
+
+
+def request_token(context) -> str:
+    """Bearer token forwarded by the client of the tool call behind context, if any"""
+    token = forwarded_token.get()
+    if token is None:
+        # Streamable HTTP sessions expose the HTTP request of each call (mcp>=1.8)
+        request = getattr(getattr(context, "request_context", None), "request", None)
+        if request is not None and hasattr(request, "headers"):
+            token = bearer_token(request.headers)
+    return token
+
+
+def _healthz(request):
+    from starlette.responses import PlainTextResponse
+    return PlainTextResponse("ok\n")
+
+
+def sse_app(server):
+    """
+    Starlette app serving server over SSE, like FastMCP's own, but keeping the
+    Authorization header of each SSE connection for that session's tool calls
+    """
+    from mcp.server.sse import SseServerTransport
+    from starlette.applications import Starlette
+    from starlette.routing import Mount, Route
+
+    sse = SseServerTransport("/messages/")
+
+    async def handle_sse(request):
+        # Tool calls of this session run in tasks started below, which inherit the token
+        forwarded_token.set(bearer_token(request.headers))
+        async with sse.connect_sse(request.scope, request.receive, request._send) as streams:
+            await server._mcp_server.run(streams[0], streams[1], server._mcp_server.create_initialization_options())
+
+    return Starlette(
+        debug=server.settings.debug,
+        routes=[
+            Route("/healthz", endpoint=_healthz),
+            Route("/sse", endpoint=handle_sse),
+            Mount("/messages/", app=sse.handle_post_message),
+        ],
+    )
+
+
+def streamable_http_app(server):
+    if not hasattr(server, "streamable_http_app"):
+        raise RuntimeError("The streamable-http transport needs mcp>=1.8, use sse instead")
+    from starlette.routing import Route
+
+    app = server.streamable_http_app()
+    app.router.routes.append(Route("/healthz", endpoint=_healthz))
+    return app
+
+
+def run_http(server, transport: str, host: str, port: int) -> None:
+    import uvicorn
+
+    app = sse_app(server) if transport == "sse" else streamable_http_app(server)
+    # SSE streams stay open until clients go away; don't let them hold up shutdown
+    config = uvicorn.Config(app, host=host, port=port, log_level=server.settings.log_level.lower(),
+                            timeout_graceful_shutdown=5)
+    uvicorn.Server(config).run()
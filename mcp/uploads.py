@@ -0,0 +1,91 @@
+# uploads.py
+"""
+Streaming multipart/form-data bodies for source file uploads.
+
+The file part is read from disk in fixed-size chunks while the request is
+being sent, so only one chunk is held in memory at a time and RSS stays flat
+whatever the file size (multi-GB VIDEO/AUDIO sources included). Reads run in
+a worker thread so they never block the event loop.
+
+Chunk size can be tuned with SOCIAL_TOOLKIT_UPLOAD_CHUNK_SIZE (bytes, default 1 MiB).
+"""
+import asyncio
+import mimetypes
+import os
+import uuid
+
+CHUNK_SIZE = int(os.environ.get("SOCIAL_TOOLKIT_UPLOAD_CHUNK_SIZE") or 1024 * 1024)
+
+# Top-level MIME type -> Social Toolkit content_type
+_CONTENT_TYPES = {"text": "TEXT", "image": "IMAGE", "video": "VIDEO", "audio": "AUDIO"}
+
+
+def content_type_for(file_path: str) -> str:
+    """
+    Best-effort Social Toolkit content_type (TEXT, IMAGE, VIDEO, AUDIO) for a file, from its extension
+    Returns None when the extension is unknown
+    """
+    mime_type, _ = mimetypes.guess_type(file_path)
+    if not mime_type:
+        return None
+    return _CONTENT_TYPES.get(mime_type.split("/", 1)[0])
+
+
+def _quote(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', "%22").replace("\r", "%0D").replace("\n", "%0A")
+
+
+class MultipartFileUpload:
+    """
+    multipart/form-data body made of plain form fields plus one file part streamed from disk
+    Pass it as `content=` with `headers=upload.headers`; it can be iterated more than once,
+    each pass re-reading the file from the start
+    on_progress, when given, is awaited with (bytes_sent, total_bytes) after every chunk
+    """
+
+    def __init__(self, fields: dict, file_field: str, file_path: str, chunk_size: int = None, on_progress=None):
+        self.file_path = file_path
+        self.file_size = os.path.getsize(file_path)
+        self.chunk_size = chunk_size or CHUNK_SIZE
+        self.on_progress = on_progress
+        self.boundary = uuid.uuid4().hex
+
+        parts = []
+        for name, value in fields.items():
+            if value is None:
+                continue
+            parts.append(
+                f'--{self.boundary}\r\nContent-Disposition: form-data; name="{_quote(name)}"\r\n\r\n{value}\r\n'
+            )
+        mime_type = mimetypes.guess_type(file_path)[0] or "application/octet-stream"
+        parts.append(
+            f'--{self.boundary}\r\nContent-Disposition: form-data; name="{_quote(file_field)}"; '
+            f'filename="{_quote(os.path.basename(file_path))}"\r\nContent-Type: {mime_type}\r\n\r\n'
+        )
+        self._head = "".join(parts).encode()
+        self._tail = f"\r\n--{self.boundary}--\r\n".encode()
+
+    @property
+    def content_length(self) -> int:
+        return len(self._head) + self.file_size + len(self._tail)
+
+    @property
+    def headers(self) -> dict:
+        return {
+            "Content-Type": f"multipart/form-data; boundary={self.boundary}",
+            "Content-Length": str(self.content_length),
+        }
+
+    async def __aiter__(self):
+        yield self._head
+        sent = 0
+        with open(self.file_path, "rb") as f:
+            while True:
+                chunk = await asyncio.to_thread(f.read, self.chunk_size)
+                if not chunk:
+                    break
+                sent += len(chunk)
+                yield chunk
+                if self.on_progress is not None:
+                    await self.on_progress(sent, self.file_size)
+        yield self._tail
@@ -0,0 +1,98 @@
+# waiters.py
+"""
+Server-side waiting for asynchronous Social Toolkit resources.
+
+Sources, generations and brand compasses move through NOT_STARTED / QUEUED /
+PROCESSING before ending in COMPLETED or FAILED. Rather than having the model
+call get_* in a loop, the waiter polls the API with exponential backoff and
+jitter and hands back the terminal state in one tool call. Concurrent waits
+on the same resource share a single polling loop.
+"""
+import asyncio
+import random
+
+PENDING_STATUSES = {"NOT_STARTED", "QUEUED", "PROCESSING"}
+
+
+def is_pending(state) -> bool:
+    return isinstance(state, dict) and state.get("status") in PENDING_STATUSES
+
+
+class _Poll:
+    def __init__(self):
+        self.latest = None
+        self.task = None
+        self.waiters = 0
+
+
+class Waiter:
+    """
+    Coalesced polling of resources until they leave the pending statuses
+    Delays start at initial_delay and grow by multiplier up to max_delay, each randomised by +/- jitter
+    """
+
+    def __init__(self, initial_delay: float = 1.0, max_delay: float = 15.0, multiplier: float = 1.6,
+                 jitter: float = 0.2, heartbeat: float = 5.0, max_errors: int = 3):
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.heartbeat = heartbeat
+        self.max_errors = max_errors
+        self._polls = {}
+
+    async def _run(self, key, poll: _Poll, fetch):
+        delay = self.initial_delay
+        errors = 0
+        try:
+            while True:
+                try:
+                    poll.latest = await fetch()
+                    errors = 0
+                except Exception:
+                    errors += 1
+                    if errors >= self.max_errors:
+                        raise
+                else:
+                    if not is_pending(poll.latest):
+                        return poll.latest
+                await asyncio.sleep(delay * random.uniform(1 - self.jitter, 1 + self.jitter))
+                delay = min(delay * self.multiplier, self.max_delay)
+        finally:
+            if self._polls.get(key) is poll:
+                del self._polls[key]
+
+    async def wait(self, key, fetch, timeout: float, on_progress=None) -> tuple:
+        """
+        Wait until the resource behind key is no longer pending, or timeout seconds pass
+        fetch is an async callable returning the resource state; it is only used if no
+        poll for key is already running. on_progress, when given, is awaited with the latest
+        state every heartbeat seconds while waiting.
+        Returns (finished, state) where state is the terminal state, or the latest one seen on timeout
+        """
+        poll = self._polls.get(key)
+        if poll is None:
+            poll = self._polls[key] = _Poll()
+            poll.task = asyncio.create_task(self._run(key, poll, fetch))
+        poll.waiters += 1
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        try:
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return False, poll.latest
+                done, _ = await asyncio.wait({poll.task}, timeout=min(remaining, self.heartbeat))
+                if done:
+                    return True, poll.task.result()
+                if on_progress is not None:
+                    await on_progress(poll.latest)
+        finally:
+            poll.waiters -= 1
+            if poll.waiters == 0 and not poll.task.done():
+                # The task only unwinds on its next step; forget it now so a waiter arriving
+                # before then starts a fresh poll instead of inheriting the cancellation
+                if self._polls.get(key) is poll:
+                    del self._polls[key]
+                poll.task.cancel()